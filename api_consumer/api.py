@@ -1,11 +1,44 @@
-import asyncio
 import logging
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait
 from functools import partial
-from typing import Optional, Union
-
-import requests
+from typing import TYPE_CHECKING, Callable, Optional, Sequence, Union
+from urllib.parse import urlsplit
 
+from .balancing import IDEMPOTENT_READS, ROUND_ROBIN, EndpointPool
+from .events import (
+    AFTER_RESPONSE,
+    BEFORE_REQUEST,
+    EVENTS,
+    ON_ERROR,
+    ON_RETRY,
+    RequestInfo,
+)
 from .exceptions import ApiConsumerException
+from .files import (
+    CHUNK_SIZE,
+    Progress,
+    Source,
+    Target,
+    Transfer,
+    Writer,
+    complete_part,
+    copy_response,
+    existing_size,
+    is_random_access,
+    split_ranges,
+    total_size,
+    upload_body,
+)
+from .pagination import NextLinkPaginator, Page, Paginator
+from .scheduler import BULK, INTERACTIVE, RequestScheduler
+from .transport import RequestsTransport, Transport
+from .urls import UrlBuilder
+
+if TYPE_CHECKING:
+    import requests
 
 logger = logging.getLogger(__name__)
 
@@ -14,11 +47,29 @@ class Api:
     """
     Base class to consume Django REST Framework APIs
 
-    url: Endpoint URL
+    url: Endpoint URL, or replicas of the API (a list or an EndpointPool)
     output: expected output format
     prev: URL to previous page
     next: URL to next page
     headers: headers for requests calls
+    transport: object sending the requests (network, record or replay)
+    hooks: callbacks by event name, called with a RequestInfo
+    count: total number of items given by the last paginated list
+    fields_param: querystring name of the fields projection (sparse fieldsets)
+    ordering_param, offset_param, limit_param: querystring names (DRF defaults)
+    page_size_param: querystring name of the page size, empty to never send it
+    max_page_size: biggest page size accepted by the API (0 if unknown)
+    adaptive_page_size: tune page size from measured page durations
+    paginator: reads pages of list responses (DRF next links by default)
+    max_workers: size of the thread pool shared by all instances
+    trailing_slash: slash after collections only (None), after instances too (True)
+        or never (False)
+    url_templates: path by item, with {parameters} for nested routes
+    path: values of the {parameters} of nested routes
+    endpoints: replicas sharing the requests, see EndpointPool
+    scheduler: queue of requests by priority and host, see use_scheduler
+    priority: of requests of the instance, bulk_priority for requests sent
+        from the shared pool (parallel pages, background refreshes...)
     """
 
     _url: str = ""
@@ -29,29 +80,296 @@ class Api:
         "user-agent": "Vb API Consumer",
         "content-type": "application/json; charset=utf8",
     }
+    _transport: Transport = RequestsTransport()
+    _hooks: dict = {}
+    _count: Optional[int] = None
+    _fields_param: str = "fields"
+    _ordering_param: str = "ordering"
+    _offset_param: str = "offset"
+    _limit_param: str = "limit"
+    _page_size_param: str = "limit"
+    _max_page_size: int = 0
+    _adaptive_page_size: bool = False
+    _page_bytes: int = 0
+    _paginator: Paginator = NextLinkPaginator()
+    _max_workers: int = 8
+    _pool: Optional[ThreadPoolExecutor] = None
+    _pool_lock = threading.Lock()
+    _trailing_slash: Optional[bool] = None
+    _url_templates: dict = {}
+    _urls: Optional[UrlBuilder] = None
+    _path: Optional[dict] = None
+    _endpoints: Optional[EndpointPool] = None
+    _scheduler: Optional[RequestScheduler] = None
+    _priority: int = INTERACTIVE
+    _bulk_priority: int = BULK
 
     def config(
         self,
-        url: str,
+        url: Union[str, Sequence[str], EndpointPool],
         output: str = "json",
         verbose=False,
+        transport: Optional[Transport] = None,
+        fields_param: Optional[str] = None,
+        paginator: Optional[Paginator] = None,
+        strategy: str = ROUND_ROBIN,
     ) -> None:
-        """Permit to change config on the fly if needed"""
+        """
+        Permit to change config on the fly if needed
+        strategy: balancing of requests when url lists replicas
+        """
+        if isinstance(url, (list, tuple)):
+            url = EndpointPool.shared(url, strategy)
+        if isinstance(url, EndpointPool):
+            self._endpoints = url
+            url = url.primary
+        elif self._endpoints is not None:
+            self._endpoints = None
         self._url = url
         self._output = output
         self._verbose = verbose
+        if transport is not None:
+            self._transport = transport
+        if fields_param is not None:
+            self._fields_param = fields_param
+        if paginator is not None:
+            self._paginator = paginator
         # reset prev/next URL
         self._prev = ""
         self._next = ""
+        if self._urls is not None:
+            self._urls = None
+
+    def warmup(
+        self,
+        connections: int = 4,
+        dns_ttl: Optional[float] = None,
+        timeout: float = 5.0,
+    ) -> int:
+        """
+        Prepare the first requests: open connections keep-alive connections
+        by host of the API (replicas too) in parallel.
+        dns_ttl: also resolve the hosts in a DNS cache kept dns_ttl seconds,
+            installed process wide (every socket.getaddrinfo call), opt-in
+        Return the number of connections opened.
+        """
+        from .resolver import DNS_CACHE
+
+        if connections <= 0:
+            return 0
+        if self._endpoints is not None:
+            urls = [endpoint.url for endpoint in self._endpoints.endpoints]
+        else:
+            urls = [self._url]
+        if dns_ttl:
+            DNS_CACHE.ttl = dns_ttl
+            DNS_CACHE.install()
+            for url in urls:
+                parts = urlsplit(url)
+                port = parts.port or (443 if parts.scheme == "https" else 80)
+                try:
+                    DNS_CACHE.resolve(parts.hostname, port)
+                except OSError as e:
+                    logger.error(f"DNS lookup of {parts.hostname} failed: {e}")
+        return sum(self._transport.warmup(url, connections, timeout) for url in urls)
+
+    @classmethod
+    def use_scheduler(cls, scheduler: Optional[RequestScheduler]) -> None:
+        """
+        Send requests of this class (all instances with Api) through
+        scheduler, None to send them at once
+        """
+        cls._scheduler = scheduler
 
     async def async_req(self, funct, **kargs):
+        import asyncio
+
         loop = asyncio.get_running_loop()
         return await loop.run_in_executor(None, partial(funct, **kargs))
 
+    def add_hook(self, event: str, callback: Callable[[RequestInfo], None]) -> None:
+        """Call callback(info) each time event happens"""
+        if event not in EVENTS:
+            err = f"Unknown event {event}, expected one of {', '.join(EVENTS)}"
+            logger.error(err)
+            raise ApiConsumerException(err)
+        # copy on write, hooks may be shared between instances
+        self._hooks = {**self._hooks, event: (*self._hooks.get(event, ()), callback)}
+
+    def remove_hook(self, event: str, callback: Callable[[RequestInfo], None]) -> None:
+        """Unregister a callback added with add_hook"""
+        callbacks = tuple(c for c in self._hooks.get(event, ()) if c != callback)
+        self._hooks = {**self._hooks, event: callbacks}
+
+    def _emit(self, event: str, info: RequestInfo) -> None:
+        """Call hooks registered for event, a failing hook never breaks a request"""
+        for callback in self._hooks.get(event, ()):
+            try:
+                callback(info)
+            except Exception as e:
+                logger.error(f"Hook {event} failed: {e!r}")
+
+    def _inherit(self, other: "Api") -> None:
+        """Share runtime configuration with another instance (ex: factory)"""
+        other._transport = self._transport
+        other._hooks = self._hooks
+        other._fields_param = self._fields_param
+        other._paginator = self._paginator
+        if self._path is not None:
+            other._path = self._path
+        if self._endpoints is not None:
+            other._endpoints = self._endpoints
+
+    def _parse(self, r):
+        """Decode a response body"""
+        return r.json()
+
+    def _send(self, method: str, item: str, url: str, **kargs):
+        """
+        Send a request with the configured transport
+        priority: of the request with a scheduler, the instance priority by default
+        """
+        if self._endpoints is not None:
+            return self._send_balanced(method, item, url, **kargs)
+        return self._request(method, item, url, **kargs)
+
+    def _send_balanced(self, method: str, item: str, url: str, **kargs):
+        """
+        Send a request to a replica, idempotent reads failing with a network
+        error or a 5xx status are sent again to other replicas
+        """
+        endpoints = self._endpoints
+        attempts = 1 + endpoints.retries if method.lower() in IDEMPOTENT_READS else 1
+        tried = []
+        for attempt in range(1, attempts + 1):
+            endpoint = endpoints.choose(tried)
+            tried.append(endpoint)
+            target = endpoints.rewrite(url, endpoint)
+            if attempt > 1 and self._hooks:
+                info = RequestInfo(method, target, item)
+                info.attempt = attempt
+                self._emit(ON_RETRY, info)
+            endpoints.start(endpoint)
+            start = time.perf_counter()
+            try:
+                r = self._request(method, item, target, attempt, **kargs)
+            except OSError:
+                # requests exceptions are OSError
+                endpoints.done(endpoint, time.perf_counter() - start, ok=False)
+                if attempt == attempts:
+                    raise
+                continue
+            ok = r.status_code < 500
+            endpoints.done(endpoint, time.perf_counter() - start, ok)
+            if ok or attempt == attempts:
+                return r
+            if kargs.get("stream"):
+                # release the connection of the unread body
+                r.close()
+
+    def _request(
+        self,
+        method: str,
+        item: str,
+        url: str,
+        attempt: int = 1,
+        priority: Optional[int] = None,
+        **kargs,
+    ):
+        """
+        Send a request when the scheduler gives a slot for its host
+        The slot of a streamed response is kept until it is closed.
+        """
+        scheduler = self._scheduler
+        if scheduler is None:
+            return self._call(method, item, url, attempt, 0.0, **kargs)
+        host = urlsplit(url).netloc
+        if priority is None:
+            priority = self._bulk_priority if self._in_pool() else self._priority
+        queued = scheduler.acquire(host, priority, id(self))
+        if not kargs.get("stream"):
+            try:
+                return self._call(method, item, url, attempt, queued, **kargs)
+            finally:
+                scheduler.release(host)
+        try:
+            r = self._call(method, item, url, attempt, queued, **kargs)
+        except BaseException:
+            scheduler.release(host)
+            raise
+        _release_on_close(r, partial(scheduler.release, host))
+        return r
+
+    def _call(
+        self, method: str, item: str, url: str, attempt: int, queued: float, **kargs
+    ):
+        """Send a request with the transport, emitting hook events"""
+        # imported with the first request, not with the package
+        import asyncio
+
+        call = partial(
+            self.async_req,
+            funct=self._transport.request,
+            method=method,
+            url=url,
+            **kargs,
+        )
+        if not self._hooks:
+            return asyncio.run(call())
+
+        info = RequestInfo(method, url, item)
+        info.attempt = attempt
+        info.queued = queued
+        self._emit(BEFORE_REQUEST, info)
+        start = time.perf_counter()
+        try:
+            r = asyncio.run(call())
+        except Exception as e:
+            info.total = time.perf_counter() - start
+            info.error = e
+            self._emit(ON_ERROR, info)
+            raise
+        info.set_response(r, time.perf_counter() - start)
+        self._emit(AFTER_RESPONSE, info)
+        if r.status_code >= 400:
+            self._emit(ON_ERROR, info)
+        return r
+
+    @classmethod
+    def _get_pool(cls) -> ThreadPoolExecutor:
+        """Thread pool shared by all instances, created on first use"""
+        if Api._pool is None:
+            with Api._pool_lock:
+                if Api._pool is None:
+                    Api._pool = ThreadPoolExecutor(
+                        cls._max_workers, thread_name_prefix="api_consumer"
+                    )
+        return Api._pool
+
+    @staticmethod
+    def _in_pool() -> bool:
+        """Running in the shared pool, waiting on it from here could deadlock"""
+        return threading.current_thread().name.startswith("api_consumer")
+
+    def _fetch_page(self, item: str, url: str, priority: Optional[int] = None) -> Page:
+        """Request a page of items, without changing the pagination state"""
+        r = self._send("get", item, url=url, headers=self._headers, priority=priority)
+        if r.status_code != 200:
+            self._debug(item, r)
+        page = self._paginator.parse(self._parse(r), r, url)
+        return page._replace(nbytes=len(r.content or b""))
+
     def get_list(
-        self, item: str, options: Optional[list] = None, page: Optional[str] = None
+        self,
+        item: str,
+        options: Optional[list] = None,
+        page: Optional[str] = None,
+        priority: Optional[int] = None,
     ) -> list:
-        """To collect a list of items"""
+        """
+        To collect a list of items
+        priority: of the request with a scheduler, see _request
+        """
         options = options or []
 
         # DRF pagination management
@@ -62,24 +380,17 @@ class Api:
         elif page is None:
             self._prev = ""
             self._next = ""
+            self._count = None
             url = self._gen_url(item, options=options)
         else:
             return []
 
-        r = asyncio.run(
-            self.async_req(funct=requests.get, url=url, headers=self._headers)
-        )
-
-        if r.status_code != 200:
-            self._debug(item, r)
-        else:
-            datas = r.json()
-            if isinstance(datas, dict):
-                self._prev = datas.get("previous", "")
-                self._next = datas.get("next", "")
-                return datas.get("results", [])
-            else:
-                return datas
+        result = self._fetch_page(item, url, priority)
+        self._prev = result.previous
+        self._next = result.next
+        self._count = result.count
+        self._page_bytes = result.nbytes
+        return result.results
 
     def get_instance(
         self, item: str, id_instance: Union[str, int], options: Optional[list] = None
@@ -87,15 +398,14 @@ class Api:
         """To collect an unique item"""
         options = options or []
 
-        r = asyncio.run(
-            self.async_req(
-                funct=requests.get,
-                url=self._gen_url(item, id_instance=id_instance, options=options),
-                headers=self._headers,
-            )
+        r = self._send(
+            "get",
+            item,
+            url=self._gen_url(item, id_instance=id_instance, options=options),
+            headers=self._headers,
         )
         if r.status_code == 200:
-            return r.json()
+            return self._parse(r)
         else:
             self._debug(item, r)
 
@@ -105,17 +415,16 @@ class Api:
         """To save a new item"""
         options = options or []
 
-        r = asyncio.run(
-            self.async_req(
-                funct=requests.post,
-                url=self._gen_url(item, options=options),
-                headers=self._headers,
-                json=payload,
-            )
+        r = self._send(
+            "post",
+            item,
+            url=self._gen_url(item, options=options),
+            headers=self._headers,
+            json=payload,
         )
         if r.status_code != 201:
             self._debug(item, r)
-        return r.json()
+        return self._parse(r)
 
     def put_instance(
         self, item: str, payload: Optional[dict] = None, options: Optional[list] = None
@@ -126,17 +435,16 @@ class Api:
         id_instance = payload.get("id", None)
 
         if id_instance:
-            r = asyncio.run(
-                self.async_req(
-                    funct=requests.put,
-                    url=self._gen_url(item, id_instance, options),
-                    headers=self._headers,
-                    json=payload,
-                )
+            r = self._send(
+                "put",
+                item,
+                url=self._gen_url(item, id_instance, options),
+                headers=self._headers,
+                json=payload,
             )
             if r.status_code != 200:
                 self._debug(item, r)
-            return r.json()
+            return self._parse(r)
         return None
 
     def patch_instance(
@@ -148,17 +456,16 @@ class Api:
         id_instance = payload.get("id", None)
 
         if id_instance:
-            r = asyncio.run(
-                self.async_req(
-                    funct=requests.patch,
-                    url=self._gen_url(item, id_instance, options),
-                    headers=self._headers,
-                    json=payload,
-                )
+            r = self._send(
+                "patch",
+                item,
+                url=self._gen_url(item, id_instance, options),
+                headers=self._headers,
+                json=payload,
             )
             if r.status_code != 200:
                 self._debug(item, r)
-            return r.json()
+            return self._parse(r)
         return None
 
     def delete_instance(
@@ -169,19 +476,173 @@ class Api:
         payload = payload or dict()
         id_instance = payload.get("id", None)
 
-        r = asyncio.run(
-            self.async_req(
-                funct=requests.delete,
-                url=self._gen_url(item, id_instance, options),
-                headers=self._headers,
-                data=payload,
-            )
+        r = self._send(
+            "delete",
+            item,
+            url=self._gen_url(item, id_instance, options),
+            headers=self._headers,
+            data=payload,
         )
         if r.status_code != 204:
             self._debug(item, r)
         return True
 
-    def _debug(self, item: str, r: requests.Response):
+    def download(
+        self,
+        url: str,
+        target: Target,
+        resume: bool = False,
+        parts: int = 1,
+        chunk_size: int = CHUNK_SIZE,
+        use_mmap: bool = False,
+        progress: Optional[Progress] = None,
+    ) -> Transfer:
+        """
+        Stream a file to a path, a writable buffer or a binary stream by chunks
+        resume: continue a partial file on disk with a Range request, files
+            are written to <target>.part and renamed once complete
+        parts: download ranges of the file in parallel, if the server accepts
+            ranges and the target is a path or a buffer
+        use_mmap: write a file on disk through a memory map
+        progress: called with the size of each chunk written
+        """
+        start = time.perf_counter()
+        offset = existing_size(target) if resume else 0
+
+        size = None
+        if parts > 1 and is_random_access(target):
+            size = self._ranged_size(url)
+        if size is not None and size - offset > chunk_size:
+            writer = Writer(target, size, resume=offset > 0, use_mmap=use_mmap)
+            try:
+                nbytes = self._download_ranges(
+                    url, writer, split_ranges(offset, size, parts), chunk_size, progress
+                )
+            except BaseException:
+                writer.close(complete=False)
+                raise
+            writer.close()
+            return Transfer(nbytes, time.perf_counter() - start, offset, size)
+
+        headers = {**self._headers, "range": f"bytes={offset}-"} if offset else None
+        r = self._send(
+            "get", "file", url=url, headers=headers or self._headers, stream=True
+        )
+        if offset and r.status_code == 416:
+            # nothing left to download
+            r.close()
+            complete_part(target)
+            return Transfer(0, time.perf_counter() - start, offset, offset)
+        if r.status_code not in (200, 206):
+            r.close()
+            self._debug("file", r)
+        if r.status_code == 200:
+            # range ignored by the server, the whole file is sent again
+            offset = 0
+        size = total_size(r, offset)
+        writer = Writer(target, size, resume=offset > 0, use_mmap=use_mmap)
+        try:
+            nbytes = copy_response(r, writer, offset, chunk_size, progress)
+        except BaseException:
+            writer.close(complete=False)
+            raise
+        writer.close()
+        return Transfer(nbytes, time.perf_counter() - start, offset, size)
+
+    def _ranged_size(self, url: str) -> Optional[int]:
+        """Size of a file if the server accepts range requests"""
+        r = self._send("head", "file", url=url, headers=self._headers)
+        length = r.headers.get("content-length", "")
+        if (
+            r.status_code == 200
+            and r.headers.get("accept-ranges", "").lower() == "bytes"
+            and length.isdigit()
+        ):
+            return int(length)
+        return None
+
+    def _download_range(
+        self,
+        url: str,
+        writer: Writer,
+        first: int,
+        last: int,
+        chunk_size: int,
+        progress: Optional[Progress],
+    ) -> int:
+        headers = {**self._headers, "range": f"bytes={first}-{last}"}
+        r = self._send("get", "file", url=url, headers=headers, stream=True)
+        if r.status_code != 206:
+            r.close()
+            self._debug("file", r)
+        return copy_response(r, writer, first, chunk_size, progress)
+
+    def _download_ranges(
+        self,
+        url: str,
+        writer: Writer,
+        ranges: list,
+        chunk_size: int,
+        progress: Optional[Progress],
+    ) -> int:
+        """Download ranges with the shared pool, return the number of bytes"""
+        if self._in_pool():
+            return sum(
+                self._download_range(url, writer, first, last, chunk_size, progress)
+                for first, last in ranges
+            )
+        pool = self._get_pool()
+        futures = [
+            pool.submit(
+                self._download_range, url, writer, first, last, chunk_size, progress
+            )
+            for first, last in ranges
+        ]
+        try:
+            return sum(future.result() for future in futures)
+        finally:
+            for future in futures:
+                future.cancel()
+            # parts still running write to the file until they end
+            wait(futures)
+
+    def upload(
+        self,
+        url: str,
+        source: Source,
+        method: str = "post",
+        field: Optional[str] = None,
+        filename: Optional[str] = None,
+        content_type: str = "application/octet-stream",
+        progress: Optional[Progress] = None,
+    ) -> Transfer:
+        """
+        Stream a path, a buffer or a binary file as the request body,
+        never loaded in memory
+        field: send a multipart/form-data field instead (ex: DRF FileField)
+        progress: called with the size of each chunk read
+        """
+        start = time.perf_counter()
+        body, headers = upload_body(source, field, filename, content_type, progress)
+        try:
+            r = self._send(
+                method,
+                "file",
+                url=url,
+                headers={**self._headers, **headers},
+                data=body,
+            )
+        finally:
+            body.close()
+        if r.status_code >= 400:
+            self._debug("file", r)
+        try:
+            data = self._parse(r) if r.content else None
+        except ValueError:
+            data = None
+        return Transfer(len(body), time.perf_counter() - start, 0, len(body), data)
+
+    def _debug(self, item: str, r: "requests.Response"):
         """Helper for debug purposes"""
         complement = ""
         if self._verbose:
@@ -198,14 +659,56 @@ class Api:
     def __str__(self) -> str:
         return f"API base endpoint: {self._url}"
 
+    def url_builder(self) -> UrlBuilder:
+        """
+        URL builder of the API, shared by instances with the same configuration
+        Created on first use, trailing_slash and url_templates are read then.
+        """
+        urls = self._urls
+        if urls is None:
+            urls = self._urls = UrlBuilder.shared(
+                self._url, self._output, self._trailing_slash, self._url_templates
+            )
+        return urls
+
     def _gen_url(
         self, item: str, id_instance: str = "", options: Optional[list] = None
     ) -> str:
         """To construct URL"""
-        options = options or []
+        urls = self._urls or self.url_builder()
+        if id_instance == "" or id_instance is None:
+            return urls.collection(item, options, path=self._path)
+        return urls.instance(item, id_instance, options, path=self._path)
 
-        return f"{self._url}/{item}/{id_instance}?format={self._output}{self._options(options)}"
+    def _projection(self, options: list, fields: Optional[list] = None) -> list:
+        """Add the fields projection to options, id is always requested"""
+        if not fields:
+            return options
+        if "id" not in fields:
+            fields = ["id", *fields]
+        return [*options, f"{self._fields_param}={','.join(fields)}"]
 
     def _options(self, options: list) -> str:
         """Permit to add options on call"""
         return ("&" + "&".join(options)) if len(options) else ""
+
+
+def _release_on_close(r: "requests.Response", release: Callable[[], None]) -> None:
+    """Call release once, when r is closed or garbage collected unclosed"""
+    done = threading.Lock()
+
+    def release_once():
+        # the lock is never released: only the first call gets it
+        if done.acquire(blocking=False):
+            release()
+
+    close = r.close
+
+    def closing():
+        try:
+            close()
+        finally:
+            release_once()
+
+    r.close = closing
+    weakref.finalize(r, release_once)
@@ -0,0 +1,159 @@
+import itertools
+import logging
+import threading
+import time
+from typing import Iterable, List, Optional, Sequence
+
+from .exceptions import ApiConsumerException
+
+logger = logging.getLogger(__name__)
+
+ROUND_ROBIN = "round_robin"
+LEAST_OUTSTANDING = "least_outstanding"
+EWMA = "ewma"
+STRATEGIES = (ROUND_ROBIN, LEAST_OUTSTANDING, EWMA)
+
+# methods retried on another replica, they do not change anything
+IDEMPOTENT_READS = frozenset(("get", "head", "options"))
+
+# shared pools by configuration, see EndpointPool.shared
+_POOLS: dict = {}
+_POOLS_LOCK = threading.Lock()
+
+
+class Endpoint:
+    """Base URL of a replica and its health"""
+
+    __slots__ = ("url", "outstanding", "latency", "failures", "ejected_until")
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        # moving average of response durations in seconds, None before any
+        self.latency: Optional[float] = None
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    def __repr__(self) -> str:
+        return f"<Endpoint {self.url} {self.outstanding} {self.latency}>"
+
+
+class EndpointPool:
+    """
+    Replicas of an API sharing the load of the requests
+
+    strategy: ROUND_ROBIN, LEAST_OUTSTANDING (fewest requests in progress) or
+        EWMA (lowest average latency weighted by requests in progress)
+    max_failures: consecutive failures (network errors, 5xx) ejecting a replica
+    cooldown: seconds before an ejected replica receives requests again
+    retries: other replicas tried by idempotent reads, all of them by default
+    decay: weight of the last duration in the latency average
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        strategy: str = ROUND_ROBIN,
+        max_failures: int = 3,
+        cooldown: float = 30.0,
+        retries: Optional[int] = None,
+        decay: float = 0.3,
+    ):
+        if not urls:
+            err = "At least one URL is required"
+            logger.error(err)
+            raise ApiConsumerException(err)
+        if strategy not in STRATEGIES:
+            err = (
+                f"Unknown strategy {strategy}, expected one of {', '.join(STRATEGIES)}"
+            )
+            logger.error(err)
+            raise ApiConsumerException(err)
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.retries = len(self.endpoints) - 1 if retries is None else retries
+        self.decay = decay
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, urls: Sequence[str], strategy: str = ROUND_ROBIN) -> "EndpointPool":
+        """Pool shared by all callers with the same replicas, to share their health"""
+        key = (tuple(urls), strategy)
+        with _POOLS_LOCK:
+            pool = _POOLS.get(key)
+            if pool is None:
+                pool = _POOLS[key] = cls(urls, strategy)
+        return pool
+
+    @property
+    def primary(self) -> str:
+        """Base URL used to build URLs, replaced by the chosen replica"""
+        return self.endpoints[0].url
+
+    def choose(self, exclude: Iterable[Endpoint] = ()) -> Endpoint:
+        """Replica for the next request, ejected ones only if no other remains"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude]
+            if not candidates:
+                candidates = self.endpoints
+            healthy = [e for e in candidates if e.ejected_until <= now]
+            if not healthy:
+                return min(candidates, key=lambda e: e.ejected_until)
+
+            turn = next(self._turn)
+            if self.strategy == ROUND_ROBIN:
+                return healthy[turn % len(healthy)]
+            # ties are shared in turn
+            start = turn % len(healthy)
+            ordered = healthy[start:] + healthy[:start]
+            if self.strategy == LEAST_OUTSTANDING:
+                return min(ordered, key=lambda e: e.outstanding)
+            # replicas without measure yet are tried first
+            return min(ordered, key=self._cost)
+
+    @staticmethod
+    def _cost(endpoint: Endpoint) -> float:
+        if endpoint.latency is None:
+            return -1.0
+        return endpoint.latency * (endpoint.outstanding + 1)
+
+    def rewrite(self, url: str, endpoint: Endpoint) -> str:
+        """URL of any replica (generated or a next link) sent to endpoint"""
+        for known in self.endpoints:
+            base = known.url
+            size = len(base)
+            if url.startswith(base) and url[size:].startswith(("/", "?", "#")):
+                return endpoint.url + url[size:]
+            if url == base:
+                return endpoint.url
+        return url
+
+    def start(self, endpoint: Endpoint) -> None:
+        with self._lock:
+            endpoint.outstanding += 1
+
+    def done(self, endpoint: Endpoint, seconds: float, ok: bool) -> None:
+        """Record the result of a request sent to endpoint"""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if endpoint.latency is None:
+                endpoint.latency = seconds
+            else:
+                endpoint.latency += self.decay * (seconds - endpoint.latency)
+            if ok:
+                endpoint.failures = 0
+                return
+            endpoint.failures += 1
+            if endpoint.failures >= self.max_failures:
+                endpoint.failures = 0
+                endpoint.ejected_until = time.monotonic() + self.cooldown
+                logger.error(f"{endpoint.url} ejected for {self.cooldown}s")
+
+    def healthy(self) -> List[str]:
+        """Base URLs of replicas not ejected"""
+        now = time.monotonic()
+        return [e.url for e in self.endpoints if e.ejected_until <= now]
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FRESH = "fresh"
+STALE = "stale"
+
+
+class StaleCache:
+    """
+    Decoded responses served from memory, stale-while-revalidate
+
+    A response younger than ttl seconds is served as is. Up to stale seconds
+    later, it is still served at once and a refresh is sent in background,
+    older responses are requested again before returning.
+    update_instances: instances hydrated from cached responses (the identity
+        scope, weakly referenced) are updated by refreshes, except their
+        changed fields
+    """
+
+    def __init__(
+        self,
+        ttl: float = 0.0,
+        stale: float = 60.0,
+        max_entries: int = 1024,
+        update_instances: bool = True,
+    ):
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        self.update_instances = update_instances
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, str]]" = OrderedDict()
+        self._refreshing: set = set()
+        # incremented by invalidate: responses loaded before are not stored
+        self._generation = 0
+        self._scope: Dict[Tuple[str, Any], weakref.WeakSet] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: Hashable) -> Tuple[Any, Optional[str]]:
+        """Cached value and FRESH or STALE, (None, None) if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None
+            value, stored, _ = entry
+            age = time.monotonic() - stored
+            if age <= self.ttl:
+                self._entries.move_to_end(key)
+                return value, FRESH
+            if age <= self.ttl + self.stale:
+                self._entries.move_to_end(key)
+                return value, STALE
+            del self._entries[key]
+        return None, None
+
+    def store(
+        self,
+        key: Hashable,
+        value: Any,
+        item: str = "",
+        generation: Optional[int] = None,
+    ) -> None:
+        """Keep value, unless invalidated since generation"""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic(), item)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(
+        self, key: Optional[Hashable] = None, item: Optional[str] = None
+    ) -> None:
+        """Forget a response, the responses of an item, or all of them"""
+        with self._lock:
+            self._generation += 1
+            if key is not None:
+                self._entries.pop(key, None)
+            elif item is not None:
+                for k in [k for k, e in self._entries.items() if e[2] == item]:
+                    del self._entries[k]
+            else:
+                self._entries.clear()
+
+    def read(
+        self,
+        key: Hashable,
+        load: Callable[[], Any],
+        executor: Executor,
+        item: str = "",
+    ) -> Tuple[Any, Optional[str]]:
+        """
+        Value of key and how it was found (FRESH, STALE or None when loaded)
+        A stale value triggers one background refresh with executor.
+        """
+        value, state = self.lookup(key)
+        generation = self._generation
+        if state == STALE:
+            with self._lock:
+                refresh = key not in self._refreshing
+                self._refreshing.add(key)
+            if refresh:
+                executor.submit(self._revalidate, key, load, item, generation)
+        if state is None:
+            value = load()
+            if value:
+                self.store(key, value, item, generation)
+        return value, state
+
+    def _revalidate(
+        self, key: Hashable, load: Callable[[], Any], item: str, generation: int
+    ) -> None:
+        try:
+            value = load()
+        except Exception as e:
+            # network errors too: the stale value is served until it expires
+            logger.error(f"Refresh of {key} failed: {e}")
+            return
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+        if value and generation == self._generation:
+            self.store(key, value, item, generation)
+            if self.update_instances:
+                self._update_scope(item, value)
+
+    def track(self, item: str, instance) -> None:
+        """Add an instance hydrated from a cached response to the identity scope"""
+        if self.update_instances and instance.id:
+            with self._lock:
+                scope = self._scope.get((item, instance.id))
+                if scope is None:
+                    scope = self._scope[(item, instance.id)] = weakref.WeakSet()
+                scope.add(instance)
+
+    def _update_scope(self, item: str, value: Any) -> None:
+        rows = value if isinstance(value, list) else [value]
+        for row in rows:
+            if not isinstance(row, dict) or "id" not in row:
+                continue
+            with self._lock:
+                scope = self._scope.get((item, row["id"]))
+                instances = list(scope) if scope is not None else []
+                if scope is not None and not instances:
+                    del self._scope[(item, row["id"])]
+            for instance in instances:
+                instance._refresh(row)
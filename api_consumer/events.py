@@ -0,0 +1,81 @@
+from typing import Optional
+
+BEFORE_REQUEST = "before_request"
+AFTER_RESPONSE = "after_response"
+ON_ERROR = "on_error"
+ON_RETRY = "on_retry"
+ON_CACHE_HIT = "on_cache_hit"
+
+EVENTS = (BEFORE_REQUEST, AFTER_RESPONSE, ON_ERROR, ON_RETRY, ON_CACHE_HIT)
+
+
+class RequestInfo:
+    """
+    Data given to hooks about a request
+
+    Timings are in seconds, None when not available with the transport
+    (requests does not expose DNS, connect and TLS durations).
+    ttfb: time to the response headers
+    download: time to read the response body after the headers
+    total: complete duration of the call
+    cache: "fresh" or "stale" for responses served by a StaleCache
+    queued: time waited for a slot of the request scheduler
+    """
+
+    __slots__ = (
+        "method",
+        "url",
+        "item",
+        "status",
+        "dns",
+        "connect",
+        "tls",
+        "ttfb",
+        "download",
+        "total",
+        "bytes_out",
+        "bytes_in",
+        "error",
+        "attempt",
+        "cache",
+        "queued",
+    )
+
+    def __init__(self, method: str, url: str, item: str = ""):
+        self.method = method.upper()
+        self.url = url
+        self.item = item
+        self.status: Optional[int] = None
+        self.dns: Optional[float] = None
+        self.connect: Optional[float] = None
+        self.tls: Optional[float] = None
+        self.ttfb: Optional[float] = None
+        self.download: Optional[float] = None
+        self.total: Optional[float] = None
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.error: Optional[BaseException] = None
+        self.attempt = 1
+        self.cache: Optional[str] = None
+        self.queued = 0.0
+
+    def set_response(self, r, total: float) -> None:
+        """Fill the information available from a requests.Response"""
+        self.status = r.status_code
+        self.total = total
+        elapsed = getattr(r, "elapsed", None)
+        if elapsed:
+            self.ttfb = elapsed.total_seconds()
+            self.download = max(total - self.ttfb, 0.0)
+        # do not consume streamed bodies
+        content = getattr(r, "_content", None)
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            self.bytes_in = len(content)
+        else:
+            self.bytes_in = int(r.headers.get("content-length", 0) or 0)
+        body = getattr(r.request, "body", None)
+        if isinstance(body, (bytes, str)):
+            self.bytes_out = len(body)
+
+    def __repr__(self) -> str:
+        return f"<RequestInfo {self.method} {self.url} {self.status}>"
@@ -0,0 +1,273 @@
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Iterable, NamedTuple, Optional, Sequence, Union
+
+from .exceptions import ApiConsumerException
+
+logger = logging.getLogger(__name__)
+
+GZIP = "gzip"
+ZSTD = "zstd"
+COMPRESSIONS = (None, GZIP, ZSTD)
+
+Target = Union[str, os.PathLike, io.RawIOBase, io.BufferedIOBase]
+
+
+class ExportResult(NamedTuple):
+    """
+    Result of an export, also given to progress after each page
+
+    rows: items written
+    nbytes: bytes of encoded rows, before compression
+    written: bytes written to the target, after compression
+    seconds: duration since the start of the export
+    """
+
+    rows: int
+    nbytes: int
+    written: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        """Megabytes of encoded rows per second"""
+        return self.nbytes / 1e6 / self.seconds if self.seconds else 0.0
+
+
+# called by the writer thread with the totals after each page
+ExportProgress = Callable[[ExportResult], None]
+
+
+class _Counter:
+    """Count bytes written to the target, under the compressor"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.written = 0
+
+    def write(self, data) -> int:
+        self.stream.write(data)
+        self.written += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+class Sink:
+    """
+    Rows written page by page to a file or a binary stream
+
+    compression: None, "gzip" or "zstd" (needs the zstandard package)
+    level: compression level, default of the compressor otherwise
+    fields: keys of rows to write, all keys otherwise
+    A path is opened and closed by the sink, a stream is only flushed.
+    """
+
+    def __init__(
+        self,
+        target: Target,
+        compression: Optional[str] = None,
+        level: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+    ):
+        if compression not in COMPRESSIONS:
+            err = f"Unknown compression {compression}, one of {COMPRESSIONS}"
+            logger.error(err)
+            raise ApiConsumerException(err)
+        self.target = target
+        self.compression = compression
+        self.level = level
+        self.fields = list(fields) if fields else None
+        self._file = None
+        self._counter: Optional[_Counter] = None
+        self._stream = None
+
+    @property
+    def written(self) -> int:
+        return self._counter.written if self._counter else 0
+
+    def open(self) -> "Sink":
+        if isinstance(self.target, (str, os.PathLike)):
+            self._file = open(self.target, "wb")
+        self._counter = _Counter(self._file or self.target)
+        self._stream = self._compressor(self._counter)
+        return self
+
+    def _compressor(self, raw):
+        if self.compression == GZIP:
+            import gzip
+
+            level = 6 if self.level is None else self.level
+            return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=level)
+        if self.compression == ZSTD:
+            try:
+                import zstandard
+            except ImportError:
+                err = "zstd compression needs the zstandard package"
+                logger.error(err)
+                raise ApiConsumerException(err)
+            level = 3 if self.level is None else self.level
+            compressor = zstandard.ZstdCompressor(level=level)
+            return compressor.stream_writer(raw, closefd=False)
+        return raw
+
+    def encode(self, rows: list) -> bytes:
+        raise NotImplementedError
+
+    def write(self, rows: list) -> int:
+        """Write a page of rows, return the bytes encoded"""
+        data = self.encode(rows)
+        self._stream.write(data)
+        return len(data)
+
+    def close(self) -> None:
+        if self._stream is not self._counter:
+            # compressed streams write their end here
+            self._stream.close()
+        self._counter.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class NdjsonSink(Sink):
+    """A JSON object by line"""
+
+    def encode(self, rows: list) -> bytes:
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        fields = self.fields
+        if fields:
+            rows = [{k: row.get(k) for k in fields} for row in rows]
+        return "".join([dumps(row) + "\n" for row in rows]).encode()
+
+
+class CsvSink(Sink):
+    """
+    Comma separated values with a header line
+
+    Columns are fields, or keys of the first row. Missing values are
+    empty, lists and dicts are written as JSON.
+    """
+
+    def __init__(self, target: Target, *args, dialect: str = "excel", **kargs):
+        super().__init__(target, *args, **kargs)
+        self.dialect = dialect
+        self._header = False
+
+    def open(self) -> "CsvSink":
+        self._header = False
+        return super().open()
+
+    def encode(self, rows: list) -> bytes:
+        if not rows:
+            return b""
+        if self.fields is None:
+            self.fields = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.DictWriter(
+            buffer, self.fields, restval="", extrasaction="ignore", dialect=self.dialect
+        )
+        if not self._header:
+            writer.writeheader()
+            self._header = True
+        for row in rows:
+            writer.writerow(
+                {
+                    k: json.dumps(v) if isinstance(v, (dict, list)) else v
+                    for k, v in row.items()
+                }
+            )
+        return buffer.getvalue().encode()
+
+
+class PageWriter(threading.Thread):
+    """Thread writing pages to a sink, at most queue_size pages wait"""
+
+    def __init__(
+        self,
+        sink: Sink,
+        queue_size: int = 4,
+        progress: Optional[ExportProgress] = None,
+    ):
+        super().__init__(name="export_writer", daemon=True)
+        self.sink = sink
+        self.progress = progress
+        self.pending: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.rows = 0
+        self.nbytes = 0
+        self.error: Optional[BaseException] = None
+        self.start_time = time.perf_counter()
+
+    def result(self) -> ExportResult:
+        seconds = time.perf_counter() - self.start_time
+        return ExportResult(self.rows, self.nbytes, self.sink.written, seconds)
+
+    def put(self, rows: list) -> None:
+        self.pending.put(rows)
+
+    def stop(self) -> None:
+        """Write pages already queued, then end the thread"""
+        self.pending.put(None)
+        self.join()
+
+    def run(self) -> None:
+        while True:
+            rows = self.pending.get()
+            if rows is None:
+                return
+            if self.error is not None:
+                # drain the queue, the producer stops at its next page
+                continue
+            try:
+                self.nbytes += self.sink.write(rows)
+                self.rows += len(rows)
+                if self.progress is not None:
+                    self.progress(self.result())
+            except Exception as e:
+                self.error = e
+
+
+def export_pages(
+    pages: Iterable[list],
+    sink: Sink,
+    queue_size: int = 4,
+    progress: Optional[ExportProgress] = None,
+) -> ExportResult:
+    """
+    Write pages to sink with a writer thread, while next pages are fetched
+
+    The iteration of pages is stopped by the first error of the writer.
+    """
+    with sink:
+        writer = PageWriter(sink, queue_size, progress)
+        writer.start()
+        try:
+            for page in pages:
+                if writer.error is not None:
+                    break
+                if page:
+                    writer.put(page)
+        finally:
+            writer.stop()
+    if writer.error is not None:
+        err = f"Export failed: {writer.error}"
+        logger.error(err)
+        raise ApiConsumerException(err) from writer.error
+    return writer.result()
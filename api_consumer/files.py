@@ -0,0 +1,307 @@
+import logging
+import mmap
+import os
+import threading
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .exceptions import ApiConsumerException
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20
+
+# called with the size of each chunk written or read
+Progress = Callable[[int], None]
+Source = Union[str, os.PathLike, bytes, bytearray, memoryview, mmap.mmap, BinaryIO]
+Target = Union[str, os.PathLike, bytearray, memoryview, mmap.mmap, BinaryIO]
+
+
+class Transfer(NamedTuple):
+    """
+    Result of a file transfer
+
+    nbytes: bytes transferred by the call
+    seconds: duration of the call
+    offset: bytes already downloaded before a resumed download
+    size: complete size of the file, None if unknown
+    data: decoded response of an upload
+    """
+
+    nbytes: int
+    seconds: float
+    offset: int = 0
+    size: Optional[int] = None
+    data: Any = None
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second"""
+        return self.nbytes / self.seconds if self.seconds else 0.0
+
+
+def is_path(target) -> bool:
+    return isinstance(target, (str, os.PathLike))
+
+
+def is_random_access(target) -> bool:
+    """Parts of the file can be written in any order"""
+    return is_path(target) or not hasattr(target, "write")
+
+
+def part_path(target) -> str:
+    """File receiving a download to target, renamed to target once complete"""
+    return os.fspath(target) + ".part"
+
+
+def existing_size(target) -> int:
+    """
+    Size of a partial download to resume, only files on disk can be resumed:
+    the .part file of target, or target itself written by another tool
+    """
+    if is_path(target):
+        for path in (part_path(target), target):
+            if os.path.exists(path):
+                return os.path.getsize(path)
+    return 0
+
+
+def complete_part(target) -> None:
+    """Rename the .part file of a complete download to target"""
+    if is_path(target) and os.path.exists(part_path(target)):
+        os.replace(part_path(target), target)
+
+
+def total_size(r, offset: int = 0) -> Optional[int]:
+    """Complete file size from Content-Range (bytes 0-99/1234) or Content-Length"""
+    content_range = r.headers.get("content-range", "")
+    if "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        return int(total) if total.isdigit() else None
+    length = r.headers.get("content-length")
+    return offset + int(length) if length and length.isdigit() else None
+
+
+def split_ranges(start: int, size: int, parts: int) -> List[Tuple[int, int]]:
+    """Inclusive byte ranges covering start to size in parts of equal size"""
+    step = -(-(size - start) // parts)
+    return [(first, min(first + step, size) - 1) for first in range(start, size, step)]
+
+
+class Writer:
+    """
+    Write chunks at an offset of a file, a buffer or a stream
+
+    Files are memory mapped with use_mmap when the size is known, parts of
+    the same file can then be written by several threads without locking.
+    Streams are only written sequentially.
+
+    Files on disk are written to <target>.part, renamed to target when the
+    download is complete. Otherwise the .part file is cut after the bytes
+    written without gap from its start (parts end in any order, or after a
+    preallocation), so its size is always the offset to resume from.
+    """
+
+    def __init__(
+        self,
+        target: Target,
+        size: Optional[int] = None,
+        resume: bool = False,
+        use_mmap: bool = False,
+    ):
+        self._file = None
+        self._mmap = None
+        self._view = None
+        self._stream = None
+        self._lock = threading.Lock()
+        self._target = target
+        self._size = size
+        # end of the bytes written without gap, runs written after a gap
+        self._end = 0
+        self._runs: Dict[int, int] = {}
+        if is_path(target):
+            path = part_path(target)
+            if resume and not os.path.exists(path):
+                os.replace(target, path)
+            self._file = open(path, "r+b" if resume else "w+b")
+            self._end = os.path.getsize(path) if resume else 0
+            if size is not None:
+                self._file.truncate(size)
+            if use_mmap and size:
+                self._mmap = mmap.mmap(self._file.fileno(), size)
+                self._view = memoryview(self._mmap)
+        elif hasattr(target, "write"):
+            self._stream = target
+        else:
+            self._view = memoryview(target).cast("B")
+            if size is not None and size > len(self._view):
+                err = f"Buffer of {len(self._view)} bytes too small for {size} bytes"
+                logger.error(err)
+                raise ApiConsumerException(err)
+
+    def write(self, offset: int, chunk: bytes) -> None:
+        if self._view is not None:
+            end = offset + len(chunk)
+            self._view[offset:end] = chunk
+        elif self._stream is not None:
+            self._stream.write(chunk)
+        else:
+            with self._lock:
+                self._file.seek(offset)
+                self._file.write(chunk)
+        if self._file is not None:
+            self._written(offset, offset + len(chunk))
+
+    def _written(self, start: int, end: int) -> None:
+        with self._lock:
+            if start == self._end:
+                self._end = end
+            else:
+                for first, last in self._runs.items():
+                    if last == start:
+                        self._runs[first] = end
+                        break
+                else:
+                    self._runs[start] = end
+            while self._end in self._runs:
+                self._end = self._runs.pop(self._end)
+
+    def close(self, complete: bool = True) -> None:
+        """
+        complete: False if the download failed, the .part file is then
+        kept for a resume
+        """
+        if self._mmap is not None:
+            self._view.release()
+            self._mmap.flush()
+            self._mmap.close()
+        elif self._view is not None:
+            self._view.release()
+        if self._file is None:
+            return
+        if complete and (self._size is None or self._end >= self._size):
+            self._file.close()
+            complete_part(self._target)
+        else:
+            self._file.truncate(self._end)
+            self._file.close()
+
+
+def copy_response(
+    r,
+    writer: Writer,
+    offset: int,
+    chunk_size: int = CHUNK_SIZE,
+    progress: Optional[Progress] = None,
+) -> int:
+    """Write a streamed response body at offset, return the number of bytes"""
+    nbytes = 0
+    try:
+        for chunk in r.iter_content(chunk_size):
+            writer.write(offset + nbytes, chunk)
+            nbytes += len(chunk)
+            if progress is not None:
+                progress(len(chunk))
+    finally:
+        r.close()
+    return nbytes
+
+
+def _remaining(file: BinaryIO) -> int:
+    """Bytes left to read in a file"""
+    try:
+        return os.fstat(file.fileno()).st_size - file.tell()
+    except (AttributeError, OSError):
+        # in memory files (io.BytesIO)
+        position = file.tell()
+        end = file.seek(0, os.SEEK_END)
+        file.seek(position)
+        return end - position
+
+
+class BodyReader:
+    """
+    Upload body made of buffers and files, files are read by chunks
+    when the body is sent and buffers are never copied
+    """
+
+    def __init__(self, parts: list, progress: Optional[Progress] = None):
+        self._parts = []
+        self._opened = []
+        self._progress = progress
+        self._size = 0
+        for part in parts:
+            if is_path(part):
+                part = open(part, "rb")
+                self._opened.append(part)
+            if hasattr(part, "read"):
+                size = _remaining(part)
+            else:
+                part = memoryview(part).cast("B")
+                size = len(part)
+            self._parts.append([part, 0])
+            self._size += size
+
+    def __len__(self) -> int:
+        return self._size
+
+    def read(self, size: int = -1):
+        while self._parts:
+            part = self._parts[0]
+            source, position = part
+            if isinstance(source, memoryview):
+                end = len(source) if size < 0 else position + size
+                chunk = source[position:end]
+                part[1] += len(chunk)
+            else:
+                chunk = source.read(size)
+            if chunk:
+                if self._progress is not None:
+                    self._progress(len(chunk))
+                return chunk
+            self._parts.pop(0)
+        return b""
+
+    def close(self) -> None:
+        for opened in self._opened:
+            opened.close()
+
+
+def upload_body(
+    source: Source,
+    field: Optional[str] = None,
+    filename: Optional[str] = None,
+    content_type: str = "application/octet-stream",
+    progress: Optional[Progress] = None,
+) -> Tuple[BodyReader, dict]:
+    """
+    Body and headers sending source as is, or as a multipart/form-data
+    field (ex: a DRF FileField) when field is given
+    """
+    if not field:
+        return BodyReader([source], progress), {"content-type": content_type}
+
+    if filename is None:
+        filename = os.path.basename(source) if is_path(source) else field
+    import uuid
+
+    boundary = uuid.uuid4().hex
+    name = str(field).replace('"', "%22")
+    filename = str(filename).replace('"', "%22")
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    headers = {"content-type": f"multipart/form-data; boundary={boundary}"}
+    return BodyReader([head, source, tail], progress), headers
@@ -0,0 +1,44 @@
+import logging
+from typing import Callable, Dict, Iterable, List
+
+from .exceptions import ModelConsumerException
+
+logger = logging.getLogger(__name__)
+
+
+def dependency_levels(root, dependencies: Callable[[object], Iterable]) -> List[list]:
+    """
+    Nodes reachable from root grouped by depth, dependencies first
+
+    Nodes of a level only depend on nodes of previous levels, they can be
+    handled concurrently. root is alone in the last level.
+    dependencies: returns the nodes a node depends on
+    """
+    depths: Dict[int, int] = {}
+    nodes: Dict[int, object] = {}
+    # iterative depth first walk: (node, its dependencies, visiting them)
+    stack = [(root, iter(list(dependencies(root))))]
+    visiting = {id(root)}
+    while stack:
+        node, pending = stack[-1]
+        child = next(pending, None)
+        if child is not None:
+            if id(child) in visiting:
+                err = f"Circular dependency between unsaved {node!r} and {child!r}"
+                logger.error(err)
+                raise ModelConsumerException(err)
+            if id(child) not in depths:
+                visiting.add(id(child))
+                stack.append((child, iter(list(dependencies(child)))))
+            continue
+        stack.pop()
+        visiting.discard(id(node))
+        depths[id(node)] = 1 + max(
+            (depths[id(child)] for child in dependencies(node)), default=-1
+        )
+        nodes[id(node)] = node
+
+    levels: List[list] = [[] for _ in range(depths[id(root)] + 1)]
+    for key, node in nodes.items():
+        levels[depths[key]].append(node)
+    return levels
@@ -0,0 +1,152 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, Tuple
+
+from .events import AFTER_RESPONSE, ON_ERROR, RequestInfo
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    """Escape a Prometheus label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """Cumulative latency histogram (Prometheus semantic)"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        """Pairs of (upper bound, number of observations <= bound)"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class MetricsCollector:
+    """
+    In-process collector of request metrics, fed by Api hooks
+
+    collector = MetricsCollector()
+    collector.install(api)
+    print(collector.export())
+    """
+
+    def __init__(
+        self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, prefix: str = "api_consumer"
+    ):
+        self._buckets = buckets
+        self._prefix = prefix
+        self._lock = threading.Lock()
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.errors: Dict[Tuple[str, str], int] = {}
+        self.bytes_in: Dict[Tuple[str, str], int] = {}
+        self.bytes_out: Dict[Tuple[str, str], int] = {}
+
+    def install(self, api) -> None:
+        """Register the collector hooks on an Api instance"""
+        api.add_hook(AFTER_RESPONSE, self.on_response)
+        api.add_hook(ON_ERROR, self.on_error)
+
+    def on_response(self, info: RequestInfo) -> None:
+        key = (info.item, info.method)
+        with self._lock:
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram(self._buckets)
+            histogram.observe(info.total or 0.0)
+            status_key = (info.item, info.method, str(info.status))
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            self.bytes_in[key] = self.bytes_in.get(key, 0) + info.bytes_in
+            self.bytes_out[key] = self.bytes_out.get(key, 0) + info.bytes_out
+
+    def on_error(self, info: RequestInfo) -> None:
+        key = (info.item, info.method)
+        with self._lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def slowest(self, count: int = 10) -> list:
+        """Endpoints (item, method, mean latency) sorted from the slowest"""
+        with self._lock:
+            means = [
+                (k[0], k[1], h.sum / h.count)
+                for k, h in self.latency.items()
+                if h.count
+            ]
+        return sorted(means, key=lambda m: m[2], reverse=True)[:count]
+
+    def reset(self) -> None:
+        with self._lock:
+            for metric in (
+                self.latency,
+                self.requests,
+                self.errors,
+                self.bytes_in,
+                self.bytes_out,
+            ):
+                metric.clear()
+
+    @staticmethod
+    def _labels(**labels) -> str:
+        content = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        return "{" + content + "}"
+
+    def export(self) -> str:
+        """Metrics in Prometheus text exposition format"""
+        p = self._prefix
+        lines = []
+        with self._lock:
+            lines += [
+                f"# HELP {p}_request_duration_seconds Duration of API requests",
+                f"# TYPE {p}_request_duration_seconds histogram",
+            ]
+            for (item, method), h in sorted(self.latency.items()):
+                for bound, count in h.cumulative():
+                    labels = self._labels(item=item, method=method, le=bound)
+                    lines.append(f"{p}_request_duration_seconds_bucket{labels} {count}")
+                labels = self._labels(item=item, method=method, le="+Inf")
+                lines.append(f"{p}_request_duration_seconds_bucket{labels} {h.count}")
+                labels = self._labels(item=item, method=method)
+                lines.append(f"{p}_request_duration_seconds_sum{labels} {h.sum}")
+                lines.append(f"{p}_request_duration_seconds_count{labels} {h.count}")
+
+            lines += [
+                f"# HELP {p}_requests_total API responses by status",
+                f"# TYPE {p}_requests_total counter",
+            ]
+            for (item, method, status), count in sorted(self.requests.items()):
+                labels = self._labels(item=item, method=method, status=status)
+                lines.append(f"{p}_requests_total{labels} {count}")
+
+            for name, metric, help_text in (
+                ("errors_total", self.errors, "API requests in error"),
+                ("received_bytes_total", self.bytes_in, "Bytes received from API"),
+                ("sent_bytes_total", self.bytes_out, "Bytes sent to API"),
+            ):
+                lines += [
+                    f"# HELP {p}_{name} {help_text}",
+                    f"# TYPE {p}_{name} counter",
+                ]
+                for (item, method), value in sorted(metric.items()):
+                    lines.append(
+                        f"{p}_{name}{self._labels(item=item, method=method)} {value}"
+                    )
+        return "\n".join(lines) + "\n"
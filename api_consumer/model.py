@@ -1,30 +1,388 @@
+import copy
 import logging
-from inspect import getmembers, ismethod
-from typing import Any, List, Optional, Tuple, Type, TypeVar, Union
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from functools import partial
+from types import FunctionType, MethodType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 from .api import Api
+from .cache import StaleCache
+from .events import ON_CACHE_HIT, RequestInfo
 from .exceptions import ModelConsumerException
+from .files import Source, Target, Transfer
+from .graph import dependency_levels
+from .pagination import PageSizeTuner, resize_page_url
+from .profiling import Profiler
+from .query import Manager
+from .relations import RelationLoader
+from .store import SQLiteStore
+from .sync import SyncResult, synchronize
+from .transport import Transport
+from .urls import UrlBuilder
+from .writeback import WriteBehind
+
+if TYPE_CHECKING:
+    from .export import ExportProgress, ExportResult, Sink
 
 logger = logging.getLogger(__name__)
 T = TypeVar("T", bound="Model")
 
 
+class DeclaredField:
+    """
+    Default value of a field declared in a Model class (age = 0), fields
+    left out by a projection are loaded on first access
+    """
+
+    __slots__ = ("name", "default")
+
+    def __init__(self, name: str, default: Any):
+        self.name = name
+        self.default = default
+
+    def __get__(self, instance, owner=None) -> Any:
+        if instance is None:
+            return self.default
+        # only reached when the instance has no value of its own
+        fields = instance._fields
+        if fields is not None and self.name not in fields:
+            instance._load_deferred()
+            return instance.__dict__.get(self.name, self.default)
+        return self.default
+
+
 class Model(Api):
     _item = None
+    # public attributes changed since the last load and their loaded values
+    _dirty: Optional[set] = None
+    _snapshot: Optional[dict] = None
+    # fields loaded with a projection, None when the instance is complete
+    _fields: Optional[frozenset] = None
+    # class level members never sent in payloads
+    _reserved_members = frozenset(("objects",))
+    # lazy instances: decoded row, fields are set on first access
+    _raw: Optional[dict] = None
+    # keep rows and convert fields on first access in factory
+    _lazy_hydration: bool = False
+    # Relation descriptors by name, and loader shared by instances of a query
+    _relations: dict = {}
+    _loader: Optional[RelationLoader] = None
+    # local SQLite copy of the items of the class, see use_replica
+    _replica: Optional[SQLiteStore] = None
+    # responses served while stale and refreshed in background, see use_cache
+    _read_cache: Optional[StaleCache] = None
+    # buffer of changes saved later, see use_write_behind
+    _write_behind: Optional[WriteBehind] = None
+    # nested route of the items, ex: "customers/{customer_id}/orders"
+    _route: Optional[str] = None
     id = 0
+    objects = Manager()
+
+    def __init_subclass__(cls, **kwargs):
+        """Class setup done once: item from the class name unless declared"""
+        super().__init_subclass__(**kwargs)
+        if not cls.__dict__.get("_item"):
+            cls._item = cls.__name__.lower()
+        for name, value in list(cls.__dict__.items()):
+            if (
+                name[0] != "_"
+                and name not in cls._reserved_members
+                and not callable(value)
+                and not hasattr(value, "__get__")
+            ):
+                setattr(cls, name, DeclaredField(name, value))
+        if "_route" in cls.__dict__ and cls._route:
+            cls._url_templates = {**cls._url_templates, cls._item: cls._route}
+
+    def __init__(
+        self,
+        url: str,
+        item: str = "",
+        verbose: bool = False,
+        transport: Optional[Transport] = None,
+    ):
+        if item:
+            self._item = item
+        elif self._item is None:
+            # instances of Model itself
+            self._item = type(self).__name__.lower()
+        self.config(url, verbose=verbose, transport=transport)
 
-    def __new__(cls, url: str, item: str = "", verbose: bool = False):
-        if not item or cls._item is None:
-            cls._item = item or cls.__name__.lower()
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name[0] != "_":
+            self._track_change(name)
+        object.__setattr__(self, name, value)
 
-        return super().__new__(cls)
+    def _track_change(self, name: str) -> None:
+        """
+        Copy on write snapshot: keep the loaded value of an attribute
+        before its first change, unchanged instances store nothing more
+        """
+        dirty = self._dirty
+        if dirty is None:
+            dirty = self._dirty = set()
+            self._snapshot = {}
+        if name not in dirty:
+            dirty.add(name)
+            state = self.__dict__
+            if name in state:
+                self._snapshot[name] = state[name]
+            elif self._raw is not None and name in self._raw:
+                self._snapshot[name] = self._raw[name]
 
-    def __init__(self, url: str, item: str = "", verbose: bool = False):
-        self.config(url, verbose=verbose)
+    def __getattr__(self, name: str) -> Any:
+        """
+        Only called for missing attributes: set fields of lazy instances,
+        load fields left out by a projection
+        """
+        raw = self._raw
+        if raw is not None and name in raw:
+            value = raw[name]
+            object.__setattr__(self, name, value)
+            return value
+        if name[0] != "_" and self._fields is not None and name not in self._fields:
+            self._load_deferred()
+            return object.__getattribute__(self, name)
+        raise AttributeError(
+            f"'{type(self).__name__}' object has no attribute '{name}'"
+        )
+
+    @classmethod
+    def _declared_fields(cls) -> frozenset:
+        """Public class attributes, they hide missing instance attributes"""
+        declared = cls.__dict__.get("_declared")
+        if declared is None:
+            declared = frozenset(
+                name
+                for name in dir(cls)
+                if name[0] != "_"
+                and name not in cls._reserved_members
+                and name not in cls._relations
+                and not callable(getattr(cls, name))
+                and not isinstance(getattr(cls, name), property)
+            )
+            cls._declared = declared
+        return declared
+
+    def _hydrate_lazy(self, data: dict) -> None:
+        """
+        Keep the row, only fields declared in the class are converted now:
+        others are set from the row on first access
+        """
+        for k in self._declared_fields().intersection(data):
+            object.__setattr__(self, k, self._auto_typing(k, data[k]))
+        object.__setattr__(self, "_raw", data)
+
+    def _materialize(self) -> None:
+        """Set all fields of a lazy instance"""
+        raw = self._raw
+        if raw is not None:
+            state = self.__dict__
+            for k, v in raw.items():
+                if k not in state:
+                    object.__setattr__(self, k, v)
+            object.__setattr__(self, "_raw", None)
+
+    def _load_deferred(self) -> None:
+        """
+        Complete a partial instance in one request, keeping local changes
+        It stays partial if the request fails, the next access tries again.
+        """
+        data = self.get_instance(self._item, self.id)
+        if not data:
+            err = f"Error retriving item {self._item}({self.id}) from API"
+            logger.error(err)
+            raise ModelConsumerException(err)
+        self._refresh(data)
+        self._fields = None
+
+    def _refresh(self, data: dict) -> None:
+        """Load newer data, keeping local changes"""
+        dirty = self._dirty or ()
+        self.from_json({k: v for k, v in data.items() if k not in dirty}, verify=False)
+
+    @classmethod
+    def use_replica(
+        cls, store: Optional[SQLiteStore], indexes: Tuple[str, ...] = ()
+    ) -> None:
+        """
+        Keep a local copy of the items of this class in store
+        Complete items fetched by queries are saved in bulk (one transaction
+        by page), get and objects querysets are answered locally first.
+        indexes: fields often filtered or ordered on
+        None to stop using a replica.
+        """
+        cls._replica = store
+        if store is not None:
+            store.index(cls._item or cls.__name__.lower(), *indexes)
+
+    @classmethod
+    def use_cache(cls, cache: Optional[StaleCache]) -> None:
+        """
+        Serve get and from_query of this class from cache, refreshed in
+        background once stale. None to always request the API.
+        """
+        cls._read_cache = cache
+
+    def _cached_read(
+        self, cache: StaleCache, item: str, url: str, key, load
+    ) -> Tuple[Any, Optional[str]]:
+        """
+        Response of load from cache and its state (None when loaded),
+        emit on_cache_hit when served from it
+        """
+        value, state = cache.read(key, load, self._get_pool(), item)
+        if state is not None and self._hooks:
+            info = RequestInfo("get", url, item)
+            info.cache = state
+            info.total = 0.0
+            self._emit(ON_CACHE_HIT, info)
+        return value, state
+
+    def _replicate_write(self, data: Any) -> None:
+        """Merge the response of a write in the replica row of the instance"""
+        replica = self._replica
+        if replica is not None and isinstance(data, dict) and "id" in data:
+            stored = replica.get(self._item, data["id"])
+            replica.upsert(self._item, [{**(stored or {}), **data}])
+
+    def _invalidate_cache(self) -> None:
+        """Cached responses of the item are outdated by a write"""
+        cache = self._read_cache
+        if cache is not None:
+            cache.invalidate(item=self._item)
+
+    @classmethod
+    def use_write_behind(cls, buffer: Optional[WriteBehind]) -> None:
+        """
+        Record changes of saved instances of this class in buffer, sent
+        later with one PATCH by instance. None to save at once again.
+        """
+        cls._write_behind = buffer
+
+    def _replicate(
+        self, model_class: Type[T], item: str, rows: list, fields: Optional[list]
+    ) -> None:
+        """Save complete items in the replica of model_class"""
+        replica = model_class._replica
+        if replica is not None and not fields and rows:
+            replica.upsert(item, (r for r in rows if isinstance(r, dict) and "id" in r))
+
+    def set_path(self: T, **path) -> T:
+        """Values of the {parameters} of a nested route, ex: set_path(customer_id=3)"""
+        self._path = {**(self._path or {}), **path}
+        return self
+
+    def _parent_path(self, parent: "Model", names: Tuple[str, ...]) -> dict:
+        """
+        Path of the children of parent: the last parameter is the parent id,
+        others come from the parent path or attributes
+        """
+        path = dict(parent._path or {})
+        for name in names[:-1]:
+            if name not in path:
+                path[name] = getattr(parent, name)
+        path[names[-1]] = parent.id
+        return path
+
+    def _detached(self) -> "Model":
+        """Instance of the same configuration, with an own pagination state"""
+        other = type(self)(self._url, self._item)
+        self._inherit(other)
+        return other
+
+    def _children(
+        self,
+        model_class: Type[T],
+        path: dict,
+        options: list,
+        limit: int,
+        fields: Optional[list],
+    ) -> List[T]:
+        """Children of a parent, with an own instance for the pagination state"""
+        child = model_class(self._url)
+        self._inherit(child)
+        child._path = path
+        return list(child.iter_query(options, limit, fields=fields))
+
+    def fetch_children(
+        self,
+        parents: Iterable["Model"],
+        model_class: Type[T],
+        options: Optional[list] = None,
+        limit: int = 0,
+        fields: Optional[list] = None,
+    ) -> Iterator[Tuple["Model", List[T]]]:
+        """
+        Fetch children collections of many parents concurrently, with the shared
+        pool and at most max_workers parents in flight
+        Yield (parent, children) pairs as they complete.
+        model_class: class with a nested route, ex: "customers/{customer_id}/orders"
+        """
+        model_class = self._check_model_class(model_class)
+        item = self._define_item(model_class)
+        urls = UrlBuilder.shared(
+            self._url,
+            self._output,
+            model_class._trailing_slash,
+            model_class._url_templates,
+        )
+        names = urls.parameters(item)
+        if not names:
+            err = f"No nested route with parameters for item {item}"
+            logger.error(err)
+            raise ModelConsumerException(err)
+        options = options or []
+
+        if self._in_pool():
+            for parent in parents:
+                path = self._parent_path(parent, names)
+                yield parent, self._children(model_class, path, options, limit, fields)
+            return
+
+        pool = self._get_pool()
+        pending: dict = {}
+        try:
+            for parent in parents:
+                path = self._parent_path(parent, names)
+                future = pool.submit(
+                    self._children, model_class, path, options, limit, fields
+                )
+                pending[future] = parent
+                # bounded number of parents in flight
+                if len(pending) >= self._max_workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future.result()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    @classmethod
+    def profile(cls, report: bool = True, output=None) -> Profiler:
+        """Context to measure time spent in network, parsing and hydration"""
+        return Profiler(report=report, output=output)
 
     def _is_public_attribute(self, member: Tuple[str, any]) -> bool:
         return (
-            not ismethod(member[1])
+            not isinstance(member[1], MethodType)
             and not isinstance(member[1], Model)
             and member[0][0] != "_"
         )
@@ -32,29 +390,178 @@ class Model(Api):
     def _is_object(self, member: Tuple[str, any]) -> bool:
         return isinstance(member[1], Model)
 
+    @staticmethod
+    def _ids(value: Any) -> Any:
+        """Instances of lists and tuples (M2M) replaced by their ids"""
+        if isinstance(value, (list, tuple)) and any(
+            isinstance(v, Model) for v in value
+        ):
+            return [v.id if isinstance(v, Model) else v for v in value]
+        return value
+
+    @classmethod
+    def _payload_members(cls) -> frozenset:
+        """Public class members which may be sent in payloads (not methods)"""
+        members = cls.__dict__.get("_payload")
+        if members is None:
+            members = frozenset(
+                name
+                for name in dir(cls)
+                if name[0] != "_"
+                and name not in cls._reserved_members
+                and name not in cls._relations
+                and not isinstance(getattr(cls, name), (FunctionType, MethodType))
+            )
+            cls._payload = members
+        return members
+
+    def _payload_names(self) -> Iterable[str]:
+        """Members sent in payloads, only known fields of partial instances"""
+        names = self._payload_members().union(
+            k for k in self.__dict__ if k[0] != "_" and k not in self._relations
+        )
+        if self._fields is not None:
+            # unknown fields are neither loaded nor sent
+            names = names.intersection(self._fields.union(self._dirty or ()))
+        return sorted(names)
+
     def _build_dictionary(self) -> dict:
+        self._materialize()
         data = {}
-        for member in getmembers(self):
+        for name in self._payload_names():
+            try:
+                member = (name, getattr(self, name))
+            except AttributeError:
+                continue
             if self._is_public_attribute(member):
-                data[member[0]] = member[1]
+                data[member[0]] = self._ids(member[1])
             elif self._is_object(member):
                 data[member[0]] = member[1].id
+        for name, relation in self._relations.items():
+            # ids are sent without loading related instances
+            if relation.field is None:
+                related_id = relation.id_of(self)
+                if related_id is not None:
+                    data[name] = related_id
+        if self._fields is not None:
+            # partial instance: only send known fields
+            known = self._fields.union(self._dirty or ())
+            data = {k: v for k, v in data.items() if k in known}
         return data
 
     def get_url(self):
         return self._url
 
-    def save(self) -> dict:
-        """CREATE - Save the instance in the API"""
+    def _unsaved_dependencies(self) -> list:
+        """
+        Unsaved instances set in attributes (in lists and tuples too) or
+        relations, saved before self
+        """
+        found = []
+        for name, value in self.__dict__.items():
+            if name[0] == "_":
+                continue
+            if isinstance(value, (list, tuple)):
+                found += [v for v in value if isinstance(v, Model) and v.id == 0]
+            elif isinstance(value, Model) and value.id == 0:
+                found.append(value)
+        for relation in self._relations.values():
+            related = self.__dict__.get(relation._cache)
+            if related is not None and related.id == 0:
+                found.append(related)
+        return found
+
+    def _link_relations(self) -> None:
+        """Set relation ids from related instances, saved since they were set"""
+        for relation in self._relations.values():
+            related = self.__dict__.get(relation._cache)
+            if related is not None and related.id != relation.id_of(self):
+                relation.__set__(self, related)
+
+    def _changes(self) -> dict:
+        """
+        Payload of the attributes changed since the last load
+        Lists, dicts and sets are always sent (copies): changes made in place,
+        like obj.tags.append(x), are not tracked.
+        """
+        data = {}
+        for name in self._dirty or ():
+            relation = self._relations.get(name)
+            if relation is not None:
+                data[relation.field or name] = relation.id_of(self)
+                continue
+            try:
+                value = getattr(self, name)
+            except AttributeError:
+                continue
+            data[name] = value.id if isinstance(value, Model) else self._ids(value)
+        fields = self._fields
+        for name, value in self.__dict__.items():
+            if (
+                name[0] != "_"
+                and isinstance(value, (list, dict, set))
+                and (fields is None or name in fields)
+            ):
+                data[name] = copy.copy(self._ids(value))
+        return data
+
+    def _acknowledge(self, data: dict, sent: dict) -> None:
+        """
+        Load the response to sent changes, fields changed since they were
+        sent keep their local value and stay changed
+        """
+        newer = {
+            k
+            for k, v in self._changes().items()
+            if k not in sent or not self._same_value(v, sent[k])
+        }
+        for name in self._dirty or ():
+            relation = self._relations.get(name)
+            if relation is not None and (relation.field or name) in newer:
+                newer.add(name)
+        self._replicate_write(data)
+        self._invalidate_cache()
+        self.from_json({k: v for k, v in data.items() if k not in newer}, verify=False)
+
+    def save(self, cascade: bool = False) -> dict:
+        """
+        CREATE - Save the instance in the API
+
+        cascade: save unsaved instances referenced by the instance first,
+            instances of the same depth concurrently, their ids are sent
+        With use_write_behind, changes of existing instances are buffered.
+        """
+        if cascade:
+            levels = dependency_levels(self, Model._unsaved_dependencies)
+            for level in levels[:-1]:
+                if len(level) == 1 or self._in_pool():
+                    for instance in level:
+                        instance.save()
+                else:
+                    # overrides of save are called
+                    list(self._get_pool().map(lambda instance: instance.save(), level))
+        self._link_relations()
         if self.id == 0:
             response = self.post_instance(self._item, payload=self._build_dictionary())
-            self.from_json(response)
+            self._replicate_write(response)
+            self._invalidate_cache()
+            self.from_json(response, verify=False)
+        elif self._write_behind is not None:
+            # changes waiting in the buffer for this instance, nothing if none
+            response = self._write_behind.add(self, self._changes())
         else:
             response = self.update()
         return response
 
-    def get(self, id_instance: Optional[Union[int, str]] = None) -> bool:
-        """READ - Load the instance from the API"""
+    def get(
+        self,
+        id_instance: Optional[Union[int, str]] = None,
+        fields: Optional[list] = None,
+    ) -> bool:
+        """
+        READ - Load the instance from the API
+        fields: load only these fields, others are loaded on first access
+        """
         if not id_instance and not self.id:
             err = f"ID required for item {self._item}"
             logger.error(err)
@@ -62,66 +569,324 @@ class Model(Api):
         elif not id_instance:
             id_instance = self.id
 
-        data = self.get_instance(self._item, id_instance)
+        replica = self._replica
+        data = None
+        if replica is not None and not fields:
+            data = replica.get(self._item, id_instance)
+        cache = self._read_cache
         if not data:
-            err = f"Error retriving item {self._item}({id_instance}) from API"
-            logger.error(err)
-            raise ModelConsumerException(err)
-        return self.from_json(data)
+            options = self._projection([], fields)
+            load = partial(self.get_instance, self._item, id_instance, options=options)
+            state = None
+            if cache is None:
+                data = load()
+            else:
+                url = self._gen_url(self._item, id_instance, options)
+                data, state = self._cached_read(cache, self._item, url, url, load)
+            if not data:
+                err = f"Error retriving item {self._item}({id_instance}) from API"
+                logger.error(err)
+                raise ModelConsumerException(err)
+            if state is None:
+                # responses served from the cache were replicated when loaded
+                self._replicate(type(self), self._item, [data], fields)
+        self._fields = frozenset(data) if fields else None
+        loaded = self.from_json(data)
+        if cache is not None:
+            cache.track(self._item, self)
+        return loaded
+
+    def _sized_options(self, limit: int, options: list) -> list:
+        """Ask pages no bigger than limit, unless the page size is given in options"""
+        param = self._page_size_param
+        if not limit or not param or any(o.startswith(f"{param}=") for o in options):
+            return options
+        size = min(limit, self._max_page_size) if self._max_page_size else limit
+        return [*options, f"{param}={size}"]
+
+    def _iter_pages(
+        self, item: str, limit: int, options: list, priority: Optional[int] = None
+    ) -> Iterator[list]:
+        """
+        Yield pages until limit items are collected, all pages without limit
+        priority: of the requests with a scheduler, parallel pages are bulk
+        """
+        options = self._sized_options(limit, options)
+        tuner = None
+        if self._adaptive_page_size and self._page_size_param:
+            tuner = PageSizeTuner(
+                limit or self._max_page_size or 100,
+                max_size=self._max_page_size or 1000,
+            )
+
+        count = 0
+        start = time.perf_counter()
+        page = self.get_list(item, options=options, priority=priority)
+        elapsed = time.perf_counter() - start
+        while page:
+            yield page
+            count += len(page)
+            if not self._next or (limit and count >= limit):
+                return
+
+            plans = None
+            if self._paginator.parallel and self._count is not None:
+                plans = self._paginator.plan(options, len(page), self._count, limit)
+            if plans is not None:
+                yield from self._fetch_parallel(item, plans)
+                return
+
+            size = tuner.update(len(page), elapsed, self._page_bytes) if tuner else 0
+            if limit:
+                size = min(size, limit - count) if size else limit - count
+            if size:
+                self._next = resize_page_url(
+                    self._next,
+                    self._page_size_param,
+                    self._offset_param,
+                    size,
+                    grow=tuner is not None,
+                )
+            start = time.perf_counter()
+            page = self.get_list(item, page="next", priority=priority)
+            elapsed = time.perf_counter() - start
+
+    def _fetch_parallel(self, item: str, plans: List[list]) -> Iterator[list]:
+        """Fetch pages with the shared pool and yield them in order"""
+        if self._in_pool():
+            for options in plans:
+                url = self._gen_url(item, options=options)
+                yield self._fetch_page(item, url, self._bulk_priority).results
+            return
+
+        pool = self._get_pool()
+        pending = deque()
+        try:
+            for options in plans:
+                url = self._gen_url(item, options=options)
+                pending.append(
+                    pool.submit(self._fetch_page, item, url, self._bulk_priority)
+                )
+                # bounded number of pages in flight
+                if len(pending) >= self._max_workers:
+                    yield pending.popleft().result().results
+            while pending:
+                yield pending.popleft().result().results
+        finally:
+            for future in pending:
+                future.cancel()
 
     def _paginated_results(self, item: str, limit: int, options: list) -> list:
         """Build a list with the expected number of elements"""
         items = []
         if limit:
-            items = self.get_list(item, options=options)
-            while self._next and len(items) < limit:
-                items += self.get_list(item, page="next")
+            for page in self._iter_pages(item, limit, options):
+                items += page
             items = items[:limit]
         else:
             items = self.get_list(item, options=options)
         return items
 
     def _define_item(self, model_class: Optional[Type[T]] = None):
-        """We need an item set to continue"""
-        if model_class:
-            item = model_class._item or model_class.__name__.lower()
-        else:
-            item = self._item or self.__name__.lower()
-        return item
+        """We need an item set to continue, the item given to the instance first"""
+        if model_class is None or model_class is type(self):
+            return self._item or type(self).__name__.lower()
+        return model_class._item or model_class.__name__.lower()
 
     def from_query(
         self,
         options: list = None,
         limit: int = 0,
         model_class: Optional[Type[T]] = None,
+        fields: Optional[list] = None,
     ):
-        """Return a list of dict items or an instance list of items if a class is specified"""
-        options = options or []
+        """
+        Return a list of dict items or an instance list of items if a class is specified
+        fields: load only these fields, others are loaded on first access
+        """
+        options = self._projection(options or [], fields)
 
         model_class = self._check_model_class(model_class)
         item = self._define_item(model_class)
-        items: list = self._paginated_results(item, limit, options)
+        cache = model_class._read_cache
+        state = None
+        if cache is None:
+            items: list = self._paginated_results(item, limit, options)
+        else:
+            url = self._gen_url(item, options=options)
+
+            def load() -> list:
+                # refreshed in background: pagination state of its own
+                return self._detached()._paginated_results(item, limit, options)
+
+            items, state = self._cached_read(cache, item, url, (url, limit), load)
+        if state is None:
+            # responses served from the cache were replicated when loaded
+            self._replicate(model_class, item, items, fields)
 
         if model_class and items:
             if limit == 1:
-                return self.factory(items[0], model_class)
+                instances = [self.factory(items[0], model_class, fields)]
             else:
-                return self.factory_list(items, model_class)
+                instances = self.factory_list(items, model_class, fields)
+            if cache is not None:
+                for instance in instances:
+                    cache.track(item, instance)
+            return instances[0] if limit == 1 else instances
         else:
             return items
 
-    def from_json(self, data: dict):
-        """Load an instance from a dict"""
+    def sync(
+        self,
+        store: SQLiteStore,
+        modified_field: str = "modified",
+        filter_param: Optional[str] = None,
+        tombstone_item: Optional[str] = None,
+        reconcile_every: Optional[float] = None,
+        options: Optional[list] = None,
+    ) -> SyncResult:
+        """
+        Incremental synchronisation of all items in a local store
+        Only items changed since the last run are fetched (high-water mark
+        on modified_field), deletions come from tombstone_item or from a
+        full synchronisation every reconcile_every seconds.
+        """
+        return synchronize(
+            self,
+            store,
+            modified_field=modified_field,
+            filter_param=filter_param,
+            tombstone_item=tombstone_item,
+            reconcile_every=reconcile_every,
+            options=options,
+        )
+
+    def _single_item_options(self, options: list) -> list:
+        """Options asking the smallest page possible"""
+        limit = f"{self._limit_param}="
+        return [o for o in options if not o.startswith(limit)] + [f"{limit}1"]
+
+    def count(
+        self, options: Optional[list] = None, model_class: Optional[Type[T]] = None
+    ) -> int:
+        """
+        Number of items matching options, without downloading them
+        DRF count is read from a single item page, if the API gives no count
+        pages of the default (or max) size are followed without hydration.
+        Offset and limit of options are ignored, all matching items are counted.
+        """
+        sliced = (f"{self._offset_param}=", f"{self._limit_param}=")
+        options = [o for o in options or [] if not o.startswith(sliced)]
+        item = self._define_item(self._check_model_class(model_class))
+        results = self.get_list(item, options=self._single_item_options(options))
+        if self._count is not None:
+            return self._count
+        if not self._next:
+            return len(results or [])
+
+        # next links keep limit=1: start again with pages as big as possible
+        if self._max_page_size:
+            options = self._sized_options(self._max_page_size, options)
+        return sum(len(page) for page in self._iter_pages(item, 0, options))
+
+    def exists(
+        self, options: Optional[list] = None, model_class: Optional[Type[T]] = None
+    ) -> bool:
+        """At least one item matches options, with a single item request"""
+        item = self._define_item(self._check_model_class(model_class))
+        return bool(
+            self.get_list(item, options=self._single_item_options(options or []))
+        )
+
+    def iter_query(
+        self,
+        options: list = None,
+        limit: int = 0,
+        model_class: Optional[Type[T]] = None,
+        fields: Optional[list] = None,
+    ) -> Iterator[T]:
+        """
+        Yield instances page by page, following all pages if there is no limit
+        fields: load only these fields, others are loaded on first access
+        """
+        options = self._projection(options or [], fields)
+
+        model_class = self._check_model_class(model_class)
+        item = self._define_item(model_class)
+        count = 0
+        for page in self._iter_pages(item, limit, options):
+            self._replicate(model_class, item, page, fields)
+            if limit:
+                page = page[: limit - count]
+            # instances of a page share their relation loader
+            instances = self.factory_list(page, model_class, fields)
+            yield from instances
+            count += len(instances)
+            if limit and count >= limit:
+                return
+
+    def export(
+        self,
+        sink: "Sink",
+        options: list = None,
+        limit: int = 0,
+        model_class: Optional[Type[T]] = None,
+        fields: Optional[list] = None,
+        queue_size: int = 4,
+        progress: Optional["ExportProgress"] = None,
+    ) -> "ExportResult":
+        """
+        Write items of a query to sink (NdjsonSink, CsvSink) while pages are
+        fetched, rows are written as received, without building instances
+        fields: request only these fields, and columns of the sink by default
+        """
+        from .export import export_pages
+
+        options = self._projection(options or [], fields)
+        item = self._define_item(self._check_model_class(model_class))
+        if fields and sink.fields is None:
+            sink.fields = list(fields)
+
+        def pages() -> Iterator[list]:
+            count = 0
+            for page in self._iter_pages(item, limit, options):
+                if limit:
+                    page = page[: limit - count]
+                yield page
+                count += len(page)
+                if limit and count >= limit:
+                    return
+
+        return export_pages(pages(), sink, queue_size, progress)
+
+    def from_json(self, data: dict, verify: bool = True) -> bool:
+        """
+        Load an instance from a dict
+        verify: control the result with is_up_to_date (skipped on bulk loading)
+        """
+        if self._fields is not None:
+            # loaded fields of a partial instance are known
+            self._fields = self._fields.union(data)
         for k, v in data.items():
-            self.__setattr__(k, self._auto_typing(k, v))
-        return self.is_up_to_date(data)
+            # loaded values are not local changes
+            object.__setattr__(self, k, self._auto_typing(k, v))
+        dirty = self._dirty
+        if dirty:
+            dirty.difference_update(data)
+            for k in data:
+                self._snapshot.pop(k, None)
+        return self.is_up_to_date(data) if verify else True
 
     def _auto_typing(self, key: str, value: Any) -> Any:
         """Convert to a type defined in class Model attribute if exist"""
         try:
             # if self.__annotations__.get(key) in [int, float, str, bytes, list, tuple, set, dict]:
             #     return self.__annotations__.get(key)(value)
-            return type(getattr(self, key))(value)
+            # never trigger __getattr__ (lazy loading of partial instances)
+            # nor relation descriptors
+            if self._relations and key in self._relations:
+                return value
+            return type(object.__getattribute__(self, key))(value)
         except Exception:
             return value
 
@@ -138,16 +903,35 @@ class Model(Api):
             raise ModelConsumerException(err)
         return model_class
 
-    def factory(self, data: dict, model_class: Optional[Type[T]] = None):
-        """Return a new instance of the same type with attributes in dictionary"""
+    def factory(
+        self,
+        data: dict,
+        model_class: Optional[Type[T]] = None,
+        fields: Optional[list] = None,
+    ):
+        """
+        Return a new instance of the same type with attributes in dictionary
+        fields: the instance is partial, loaded with this projection
+        """
         model_class = self._check_model_class(model_class)
 
-        instance = model_class(self._url)
-        instance.from_json(data)
+        # same class: instances keep the item given to this one
+        item = self._item if model_class is type(self) else ""
+        instance = model_class(self._url, item)
+        self._inherit(instance)
+        if model_class._lazy_hydration:
+            instance._hydrate_lazy(data)
+        else:
+            instance.from_json(data, verify=False)
+        if fields:
+            instance._fields = frozenset(data)
         return instance
 
     def factory_list(
-        self, data_list: list, model_class: Optional[Type[T]] = None
+        self,
+        data_list: list,
+        model_class: Optional[Type[T]] = None,
+        fields: Optional[list] = None,
     ) -> List[Type[T]]:
         """
         Convert a list of dict to a list of instances
@@ -155,28 +939,95 @@ class Model(Api):
         ex: class = Model
         """
         model_class = self._check_model_class(model_class)
-        return [self.factory(data, model_class) for data in data_list]
+        instances = [self.factory(data, model_class, fields) for data in data_list]
+        if model_class._relations and len(instances) > 1:
+            loader = RelationLoader(instances)
+            for instance in instances:
+                object.__setattr__(instance, "_loader", loader)
+        return instances
+
+    def download_file(self, field: str, target: Target, **kwargs) -> Transfer:
+        """Stream the file whose URL is in field (ex: DRF FileField), see Api.download"""
+        url = getattr(self, field, None)
+        if not url:
+            err = f"No file URL in {self._item}({self.id}).{field}"
+            logger.error(err)
+            raise ModelConsumerException(err)
+        return self.download(url, target, **kwargs)
+
+    def upload_file(self, field: str, source: Source, **kwargs) -> Transfer:
+        """Send a file in field of the instance (multipart PATCH), see Api.upload"""
+        transfer = self.upload(
+            self._gen_url(self._item, self.id),
+            source,
+            method="patch",
+            field=field,
+            **kwargs,
+        )
+        if isinstance(transfer.data, dict):
+            self.from_json(transfer.data, verify=False)
+        return transfer
 
     def update(self):
         """UPDATE - Update instance from API"""
         data = self.patch_instance(self._item, payload=self._build_dictionary())
-        self.from_json(data)
+        self._replicate_write(data)
+        self._invalidate_cache()
+        self.from_json(data, verify=False)
         return data
 
     def delete(self):
         """ " DELETE - Delete instance in the API"""
-        return self.delete_instance(self._item, payload={"id": self.id})
-
-    def is_up_to_date(self, data: dict):
-        """Control data is up to date"""
-        for k, _ in data.items():
-            if getattr(self, k) != data[k] or (
-                self._is_object((0, getattr(self, k)))
-                and getattr(self, k).id != data[k]
-            ):
+        deleted = self.delete_instance(self._item, payload={"id": self.id})
+        if self._replica is not None:
+            self._replica.delete(self._item, [self.id])
+        self._invalidate_cache()
+        return deleted
+
+    def is_up_to_date(self, data: Optional[dict] = None) -> bool:
+        """
+        Control data is up to date
+        Without data, control that no attribute changed since the last load,
+        only changed attributes are compared to their snapshot.
+        """
+        if data is None:
+            if not self._dirty:
+                return True
+            snapshot = self._snapshot
+            return all(
+                k in snapshot and self._same_value(getattr(self, k), snapshot[k])
+                for k in self._dirty
+            )
+
+        relations = self._relations
+        for k, v in data.items():
+            if k in relations:
+                # compare ids, related instances are not loaded
+                current = relations[k].id_of(self)
+                v = v.get("id") if isinstance(v, dict) else v
+            else:
+                current = getattr(self, k)
+            if not self._same_value(current, v):
                 return False
         return True
 
+    @classmethod
+    def _same_value(cls, current: Any, expected: Any) -> bool:
+        """Compare values, instances are compared to ids (M2M and O2M included)"""
+        if isinstance(current, Model):
+            return current.id == getattr(expected, "id", expected)
+        if isinstance(current, (list, tuple, set)) and isinstance(
+            expected, (list, tuple, set)
+        ):
+            if len(current) != len(expected):
+                return False
+            if isinstance(current, set) or isinstance(expected, set):
+                return {getattr(c, "id", c) for c in current} == {
+                    getattr(e, "id", e) for e in expected
+                }
+            return all(cls._same_value(c, e) for c, e in zip(current, expected))
+        return current == expected
+
     def id_to_object(self, attribute: str, instance: T):
         """Composition from ids"""
         id_instance = getattr(self, attribute)
@@ -0,0 +1,252 @@
+from math import ceil
+from typing import List, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+class Page(NamedTuple):
+    """A page of a list response"""
+
+    results: list
+    next: str = ""
+    previous: str = ""
+    count: Optional[int] = None
+    nbytes: int = 0
+
+
+def _option_int(options: list, name: str, default: int) -> int:
+    """Integer value of a querystring option, last one wins"""
+    value = default
+    for option in options:
+        key, _, raw = option.partition("=")
+        if key == name and raw.isdigit():
+            value = int(raw)
+    return value
+
+
+def _without(options: list, *names: str) -> list:
+    """Options without the given querystring names"""
+    return [o for o in options if o.partition("=")[0] not in names]
+
+
+def _set_query(url: str, name: str, value: str) -> str:
+    """Replace or add a querystring parameter in an URL"""
+    parts = urlsplit(url)
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != name
+    ]
+    query.append((name, value))
+    return urlunsplit(parts._replace(query=urlencode(query, safe=",")))
+
+
+class Paginator:
+    """
+    Read pages of list responses
+
+    parse() extracts items and links of a response, plan() gives the
+    options of all remaining pages when they can be fetched in parallel
+    (parallel = True), sequential paginators follow next links one by one.
+    """
+
+    parallel = False
+
+    def parse(self, data, r, url: str) -> Page:
+        raise NotImplementedError
+
+    def plan(
+        self, options: list, size: int, count: int, limit: int = 0
+    ) -> Optional[List[list]]:
+        """Options of the remaining pages, None if pages must be fetched sequentially"""
+        return None
+
+
+class NextLinkPaginator(Paginator):
+    """
+    Envelope with a link to the next page (DRF default)
+    {"count": 42, "next": url, "previous": url, "results": [...]}
+    A response without envelope (list) is a complete result.
+    """
+
+    def __init__(
+        self,
+        results_key: str = "results",
+        next_key: str = "next",
+        previous_key: str = "previous",
+        count_key: str = "count",
+    ):
+        self.results_key = results_key
+        self.next_key = next_key
+        self.previous_key = previous_key
+        self.count_key = count_key
+
+    def parse(self, data, r, url: str) -> Page:
+        if not isinstance(data, dict):
+            return Page(data)
+        return Page(
+            data.get(self.results_key, []),
+            data.get(self.next_key) or "",
+            data.get(self.previous_key) or "",
+            data.get(self.count_key),
+        )
+
+
+class OffsetPaginator(NextLinkPaginator):
+    """DRF LimitOffsetPagination, pages are fetched in parallel once count is known"""
+
+    parallel = True
+
+    def __init__(
+        self, limit_param: str = "limit", offset_param: str = "offset", **keys
+    ):
+        super().__init__(**keys)
+        self.limit_param = limit_param
+        self.offset_param = offset_param
+
+    def plan(
+        self, options: list, size: int, count: int, limit: int = 0
+    ) -> Optional[List[list]]:
+        base = _option_int(options, self.offset_param, 0)
+        total = count - base
+        if limit:
+            total = min(total, limit)
+        kept = _without(options, self.limit_param, self.offset_param)
+        return [
+            [
+                *kept,
+                f"{self.limit_param}={min(size, total - start)}",
+                f"{self.offset_param}={base + start}",
+            ]
+            for start in range(size, total, size)
+        ]
+
+
+class PageNumberPaginator(NextLinkPaginator):
+    """DRF PageNumberPagination, pages are fetched in parallel once count is known"""
+
+    parallel = True
+
+    def __init__(self, page_param: str = "page", size_param: str = "page_size", **keys):
+        super().__init__(**keys)
+        self.page_param = page_param
+        self.size_param = size_param
+
+    def plan(
+        self, options: list, size: int, count: int, limit: int = 0
+    ) -> Optional[List[list]]:
+        first = _option_int(options, self.page_param, 1)
+        total = count - (first - 1) * size
+        if limit:
+            total = min(total, limit)
+        kept = _without(options, self.page_param, self.size_param)
+        return [
+            [*kept, f"{self.page_param}={first + index}", f"{self.size_param}={size}"]
+            for index in range(1, ceil(total / size))
+        ]
+
+
+class CursorPaginator(Paginator):
+    """
+    Opaque cursor token given in the body, sent back in the querystring
+    {"results": [...], "next_cursor": "abc"} -> ?cursor=abc
+    """
+
+    def __init__(
+        self,
+        cursor_param: str = "cursor",
+        next_key: str = "next_cursor",
+        results_key: str = "results",
+    ):
+        self.cursor_param = cursor_param
+        self.next_key = next_key
+        self.results_key = results_key
+
+    def parse(self, data, r, url: str) -> Page:
+        if not isinstance(data, dict):
+            return Page(data)
+        cursor = data.get(self.next_key)
+        next_url = _set_query(url, self.cursor_param, str(cursor)) if cursor else ""
+        return Page(data.get(self.results_key, []), next_url)
+
+
+class LinkHeaderPaginator(Paginator):
+    """
+    RFC 5988 Link header: <https://api/items?page=2>; rel="next"
+    count_header: header giving the total number of items (if any)
+    """
+
+    def __init__(
+        self, count_header: str = "X-Total-Count", results_key: str = "results"
+    ):
+        self.count_header = count_header
+        self.results_key = results_key
+
+    def parse(self, data, r, url: str) -> Page:
+        if isinstance(data, dict):
+            data = data.get(self.results_key, [])
+        links = r.links
+        count = r.headers.get(self.count_header)
+        return Page(
+            data,
+            links.get("next", {}).get("url", ""),
+            links.get("prev", {}).get("url", ""),
+            int(count) if count and count.isdigit() else None,
+        )
+
+
+def resize_page_url(
+    url: str, size_param: str, offset_param: str, size: int, grow: bool = True
+) -> str:
+    """
+    Change the page size of an offset paginated URL (ex: DRF next link)
+    URLs without offset are returned unchanged: with page numbers,
+    a new page size would skip or repeat items.
+    grow: False to only make pages smaller
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    current = dict(query)
+    if offset_param not in current or size_param not in current:
+        return url
+    if not grow and (
+        not current[size_param].isdigit() or int(current[size_param]) <= size
+    ):
+        return url
+    query = [(k, str(size) if k == size_param else v) for k, v in query]
+    return urlunsplit(parts._replace(query=urlencode(query, safe=",")))
+
+
+class PageSizeTuner:
+    """
+    Choose the next page size from the measured duration and weight of pages
+
+    Bigger pages save round trips, the size grows until a page takes
+    target_seconds (or max_bytes), within min_size and max_size, and
+    changes at most by a factor 2 between pages.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        min_size: int = 10,
+        max_size: int = 1000,
+        target_seconds: float = 1.0,
+        max_bytes: int = 0,
+    ):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self.size = self._clamp(size)
+
+    def _clamp(self, size: float) -> int:
+        return int(max(self.min_size, min(size, self.max_size)))
+
+    def update(self, rows: int, seconds: float, nbytes: Optional[int] = None) -> int:
+        """Register a page and return the next page size"""
+        if rows <= 0 or seconds <= 0:
+            return self.size
+        size = self.target_seconds * rows / seconds
+        if self.max_bytes and nbytes:
+            size = min(size, self.max_bytes * rows / nbytes)
+        size = max(self.size / 2, min(size, self.size * 2))
+        self.size = self._clamp(size)
+        return self.size
@@ -0,0 +1,145 @@
+import sys
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, Optional, TextIO, Tuple
+
+from .exceptions import ModelConsumerException
+
+# phase name, class name (imported lazily) and method measured
+PHASES = (
+    ("network", "Api", "_send"),
+    ("parse", "Api", "_parse"),
+    ("hydration", "Model", "factory"),
+    ("hydration", "Model", "from_json"),
+    ("typing", "Model", "_auto_typing"),
+    ("verify", "Model", "is_up_to_date"),
+)
+
+# methods creating instances of another class: position and name of the
+# model class argument, their time is recorded for that class
+MODEL_CLASS_ARGUMENTS = {"factory": (1, "model_class")}
+
+_active: Optional["Profiler"] = None
+
+
+class Profiler:
+    """
+    Record cumulative wall/CPU time per phase and per model class
+
+    While the context is active, methods listed in PHASES are wrapped
+    with timers, they are restored on exit: there is no cost at all
+    when profiling is disabled. Times are inclusive (hydration contains
+    typing and verify), CPU time is the one of the calling thread.
+
+    Wrapped methods are shared by the whole process: only calls of the
+    thread which entered the context are measured, calls of other threads
+    (the shared pool of parallel pagination included) are ignored.
+
+    with User.profile() as profiler:
+        user.from_query(model_class=User)
+    """
+
+    def __init__(self, report: bool = True, output: Optional[TextIO] = None):
+        self._report = report
+        self._output = output
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._originals: list = []
+        self._thread: Optional[int] = None
+        # (phase, class name) -> [calls, wall, cpu]
+        self.stats: Dict[Tuple[str, str], list] = {}
+
+    def __enter__(self):
+        global _active
+        if _active is not None:
+            raise ModelConsumerException("A profiling context is already active")
+        _active = self
+        self._thread = threading.get_ident()
+        self._install()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active
+        self._uninstall()
+        _active = None
+        if self._report:
+            print(self.report(), file=self._output or sys.stdout)
+
+    def _install(self):
+        from .api import Api
+        from .model import Model
+
+        classes = {"Api": Api, "Model": Model}
+        for phase, class_name, method in PHASES:
+            cls = classes[class_name]
+            original = cls.__dict__[method]
+            self._originals.append((cls, method, original))
+            setattr(cls, method, self._wrap(phase, original, method))
+
+    def _uninstall(self):
+        while self._originals:
+            cls, method, original = self._originals.pop()
+            setattr(cls, method, original)
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _wrap(self, phase: str, funct: Callable, method: str) -> Callable:
+        model_class_argument = MODEL_CLASS_ARGUMENTS.get(method)
+
+        @wraps(funct)
+        def wrapper(instance, *args, **kargs):
+            if threading.get_ident() != self._thread:
+                return funct(instance, *args, **kargs)
+            stack = self._stack()
+            # only the outer call is measured for reentrant phases
+            if phase in stack:
+                return funct(instance, *args, **kargs)
+            owner = type(instance)
+            if model_class_argument is not None:
+                position, name = model_class_argument
+                model_class = kargs.get(name)
+                if model_class is None and len(args) > position:
+                    model_class = args[position]
+                owner = model_class or owner
+            stack.append(phase)
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                return funct(instance, *args, **kargs)
+            finally:
+                stack.pop()
+                self.record(
+                    phase,
+                    owner.__name__,
+                    time.perf_counter() - wall,
+                    time.thread_time() - cpu,
+                )
+
+        return wrapper
+
+    def record(self, phase: str, owner: str, wall: float, cpu: float) -> None:
+        with self._lock:
+            stat = self.stats.get((phase, owner))
+            if stat is None:
+                stat = self.stats[(phase, owner)] = [0, 0.0, 0.0]
+            stat[0] += 1
+            stat[1] += wall
+            stat[2] += cpu
+
+    def report(self) -> str:
+        """Breakdown table sorted by wall time"""
+        lines = [
+            f"{'phase':<12}{'class':<20}{'calls':>10}{'wall (s)':>12}"
+            f"{'cpu (s)':>12}{'wall/call (ms)':>16}"
+        ]
+        rows = sorted(self.stats.items(), key=lambda row: row[1][1], reverse=True)
+        for (phase, owner), (calls, wall, cpu) in rows:
+            lines.append(
+                f"{phase:<12}{owner:<20}{calls:>10}{wall:>12.4f}"
+                f"{cpu:>12.4f}{wall / calls * 1000:>16.4f}"
+            )
+        return "\n".join(lines)
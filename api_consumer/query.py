@@ -0,0 +1,230 @@
+import logging
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from .exceptions import ModelConsumerException
+
+logger = logging.getLogger(__name__)
+
+
+def _encode(value) -> str:
+    """Querystring value as DRF filters expect it"""
+    if isinstance(value, bool):
+        value = "true" if value else "false"
+    elif isinstance(value, (list, tuple, set)):
+        value = ",".join(str(v) for v in value)
+    return quote(str(value), safe=",")
+
+
+class QuerySet:
+    """
+    Lazy and chainable query on a Model
+
+    Nothing is requested before iteration, the query is compiled once
+    to URL options and the result is cached.
+
+    User.objects.filter(is_active=True).order_by("-created").only("email")[:100]
+    """
+
+    def __init__(self, model, item: str):
+        self._model = model
+        self._item = item
+        self._filters: Tuple[tuple, ...] = ()
+        self._ordering: Tuple[str, ...] = ()
+        self._fields: Optional[Tuple[str, ...]] = None
+        self._raw: Tuple[str, ...] = ()
+        self._offset = 0
+        self._limit: Optional[int] = None
+        self._remote = False
+        self._compiled: Optional[list] = None
+        self._result: Optional[list] = None
+
+    def _clone(self, **changes) -> "QuerySet":
+        clone = QuerySet(self._model, self._item)
+        for attribute in (
+            "_filters",
+            "_ordering",
+            "_fields",
+            "_raw",
+            "_offset",
+            "_limit",
+            "_remote",
+        ):
+            setattr(clone, attribute, changes.get(attribute, getattr(self, attribute)))
+        return clone
+
+    def filter(self, **filters) -> "QuerySet":
+        """Add filters, sent as querystring parameters (django-filter style)"""
+        return self._clone(_filters=self._filters + tuple(filters.items()))
+
+    def order_by(self, *fields: str) -> "QuerySet":
+        """Replace ordering, a leading - for descending order"""
+        return self._clone(_ordering=fields)
+
+    def only(self, *fields: str) -> "QuerySet":
+        """Load only these fields (projection), others are loaded on access"""
+        return self._clone(_fields=fields)
+
+    def options(self, *options: str) -> "QuerySet":
+        """Add raw querystring options, not escaped"""
+        return self._clone(_raw=self._raw + options)
+
+    def remote(self) -> "QuerySet":
+        """Always ask the API, even if the model has a local replica"""
+        return self._clone(_remote=True)
+
+    def __getitem__(self, key):
+        """Slices are translated to offset/limit, an integer to a single item request"""
+        if isinstance(key, int):
+            if key < 0:
+                err = f"Negative indexing is not supported ({key})"
+                logger.error(err)
+                raise ModelConsumerException(err)
+            if self._result is not None:
+                return self._result[key]
+            stop = key + 1
+            result = list(self[key:stop])
+            if not result:
+                raise IndexError("QuerySet index out of range")
+            return result[0]
+
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            err = f"Only integers and slices without step are supported ({key})"
+            logger.error(err)
+            raise ModelConsumerException(err)
+        start, stop = key.start or 0, key.stop
+        if start < 0 or (stop is not None and stop < 0):
+            err = f"Negative indexing is not supported ({key})"
+            logger.error(err)
+            raise ModelConsumerException(err)
+
+        offset = self._offset + start
+        limit = None if stop is None else max(stop - start, 0)
+        if self._limit is not None:
+            remaining = max(self._limit - start, 0)
+            limit = remaining if limit is None else min(limit, remaining)
+        return self._clone(_offset=offset, _limit=limit)
+
+    def _options(self) -> list:
+        """Compile the query to URL options, once"""
+        if self._compiled is None:
+            model = self._model
+            options = [f"{quote(k)}={_encode(v)}" for k, v in self._filters]
+            if self._ordering:
+                options.append(f"{model._ordering_param}={_encode(self._ordering)}")
+            if self._offset:
+                options.append(f"{model._offset_param}={self._offset}")
+            if self._limit:
+                options.append(f"{model._limit_param}={self._limit}")
+            self._compiled = options + list(self._raw)
+        return self._compiled
+
+    def _local_rows(self) -> Optional[list]:
+        """
+        Rows from the replica of the model, None to ask the API
+        Only a complete replica answers (see SQLiteStore.mark_complete), projections,
+        raw options and other lookups are only understood by the API.
+        """
+        replica = self._model._replica
+        if replica is None or self._remote or self._raw or self._fields:
+            return None
+        if not all(replica.supports(lookup) for lookup, _ in self._filters):
+            return None
+        if not replica.is_complete(self._item):
+            return None
+        return replica.filter(
+            self._item, dict(self._filters), self._ordering, self._offset, self._limit
+        )
+
+    def _is_everything(self) -> bool:
+        """The query asks all the items, without projection"""
+        return not (
+            self._filters or self._raw or self._fields or self._offset or self._limit
+        )
+
+    def _fetch(self) -> list:
+        if self._result is None:
+            if self._limit == 0:
+                self._result = []
+            else:
+                rows = self._local_rows()
+                if rows is not None:
+                    self._result = self._model.factory_list(rows)
+            if self._result is None:
+                self._result = list(
+                    self._model.iter_query(
+                        self._options(),
+                        limit=self._limit or 0,
+                        fields=list(self._fields) if self._fields else None,
+                    )
+                )
+                replica = self._model._replica
+                if replica is not None and self._is_everything():
+                    # every item was fetched and replicated
+                    replica.mark_complete(self._item)
+        return self._result
+
+    def __iter__(self) -> Iterator:
+        return iter(self._fetch())
+
+    def __len__(self) -> int:
+        return len(self._fetch())
+
+    def __bool__(self) -> bool:
+        return self.exists()
+
+    def count(self) -> int:
+        """Number of results, from DRF count without downloading them"""
+        if self._result is not None:
+            return len(self._result)
+        if self._limit == 0:
+            return 0
+        rows = self._local_rows()
+        if rows is not None:
+            return len(rows)
+
+        # the model counts all matching items, the slice is applied here
+        total = max(self._model.count(self._options()) - self._offset, 0)
+        return total if self._limit is None else min(total, self._limit)
+
+    def exists(self) -> bool:
+        """At least one result, with a single item request"""
+        if self._result is not None:
+            return bool(self._result)
+        if self._limit == 0:
+            return False
+        rows = self._local_rows()
+        if rows is not None:
+            return bool(rows)
+        return self._model.exists(self._options())
+
+    def export(self, sink, **kargs):
+        """Write results to sink page by page, see Model.export"""
+        return self._model.export(
+            sink,
+            self._options(),
+            limit=self._limit or 0,
+            fields=list(self._fields) if self._fields else None,
+            **kargs,
+        )
+
+    def first(self):
+        """First instance or None"""
+        result = list(self[:1])
+        return result[0] if result else None
+
+    def __repr__(self) -> str:
+        return f"<QuerySet {self._item} {'&'.join(self._options())}>"
+
+
+class Manager:
+    """Descriptor giving a new QuerySet from a Model class or instance"""
+
+    def __get__(self, instance, owner) -> QuerySet:
+        # own instance, pagination state is not shared with the caller
+        if instance is None:
+            model = owner(owner._url)
+        else:
+            model = owner(instance._url, instance._item)
+            instance._inherit(model)
+        return QuerySet(model, model._item)
@@ -0,0 +1,174 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from urllib.parse import quote
+
+from .exceptions import ApiConsumerException, ModelConsumerException
+
+logger = logging.getLogger(__name__)
+
+
+class Relation:
+    """
+    Related instance loaded on first access, from its id
+
+    class Order(Model):
+        customer = Relation(Customer)  # "customer": 3 in the API data
+        seller = Relation(User, field="seller_id")  # id in another field
+        parent = Relation("self")
+
+    The id (or a nested dict, or an instance) given to the relation is
+    kept, the related instance is only requested on first access.
+    Instances listed by the same query share a loader: the first access
+    loads the related instances of all of them at once, with list requests
+    filtered by batch_param (id__in=1,2,3) or with concurrent requests if
+    batch_param is empty.
+
+    field: attribute holding the id, sent in payloads instead of the relation
+    """
+
+    def __init__(
+        self,
+        model_class,
+        field: Optional[str] = None,
+        batch_param: Optional[str] = "id__in",
+        batch_size: int = 100,
+    ):
+        self.model_class = model_class
+        self.field = field
+        self.batch_param = batch_param
+        self.batch_size = batch_size
+        self.name = ""
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+        self._id = self.field or f"_{name}_id"
+        self._cache = f"_{name}_instance"
+        if self.model_class == "self":
+            self.model_class = owner
+        owner._relations = {**owner._relations, name: self}
+
+    def id_of(self, instance) -> Any:
+        """Id of the related instance, without loading it"""
+        related_id = getattr(instance, self._id, None)
+        if related_id is None and self.field is None:
+            # lazy instance, the value is still in the row
+            raw = instance._raw
+            if raw is not None and raw.get(self.name) is not None:
+                self.__set__(instance, raw[self.name])
+                related_id = getattr(instance, self._id, None)
+        return related_id
+
+    def cached(self, instance):
+        """Related instance if already loaded"""
+        related = getattr(instance, self._cache, None)
+        if related is not None and related.id == self.id_of(instance):
+            return related
+        return None
+
+    def cache(self, instance, related) -> None:
+        object.__setattr__(instance, self._cache, related)
+
+    def __set__(self, instance, value) -> None:
+        if isinstance(value, dict):
+            value = instance.factory(value, self.model_class)
+        if isinstance(value, self.model_class):
+            self.cache(instance, value)
+            value = value.id
+        object.__setattr__(instance, self._id, value)
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        related_id = self.id_of(instance)
+        if related_id is None:
+            return None
+        related = self.cached(instance)
+        if related is None and instance._loader is not None:
+            instance._loader.load(self, instance)
+            related = self.cached(instance)
+        if related is None:
+            related = self._new(instance)
+            related.get(related_id)
+            self.cache(instance, related)
+        return related
+
+    def _new(self, instance):
+        """Instance of the related class sharing the configuration of instance"""
+        related = self.model_class(instance._url)
+        instance._inherit(related)
+        return related
+
+    def fetch(self, instance, ids: Iterable) -> Dict[Any, Any]:
+        """Related instances by id, requested in batches or concurrently"""
+        ids = list(ids)
+        if not ids:
+            return {}
+        if not self.batch_param:
+            found = _map(instance, self._get, [(instance, i) for i in ids])
+            return {related.id: related for related in found}
+
+        chunks = []
+        for start in range(0, len(ids), self.batch_size):
+            end = start + self.batch_size
+            chunks.append((instance, ids[start:end]))
+        found = {}
+        for page in _map(instance, self._get_many, chunks):
+            found.update((related.id, related) for related in page)
+        return found
+
+    def _get(self, args: tuple):
+        instance, related_id = args
+        related = self._new(instance)
+        related.get(related_id)
+        return related
+
+    def _get_many(self, args: tuple) -> list:
+        instance, ids = args
+        values = ",".join(quote(str(i), safe="") for i in ids)
+        options = [f"{self.batch_param}={values}"]
+        return list(self._new(instance).iter_query(options, limit=len(ids)))
+
+    def __repr__(self) -> str:
+        return f"<Relation {self.name} to {getattr(self.model_class, '__name__', '?')}>"
+
+
+def _map(instance, funct: Callable, items: List) -> list:
+    """Call funct on items with the shared pool (in the caller thread from the pool)"""
+    if len(items) == 1 or instance._in_pool():
+        return [funct(item) for item in items]
+    return list(instance._get_pool().map(funct, items))
+
+
+class RelationLoader:
+    """
+    Load relations of instances listed by the same query, the first
+    access to a relation loads it for all instances, once
+    """
+
+    def __init__(self, instances: list):
+        self.instances = instances
+        self._loaded: set = set()
+        self._lock = threading.Lock()
+
+    def load(self, relation: Relation, instance) -> None:
+        with self._lock:
+            if relation in self._loaded:
+                return
+            self._loaded.add(relation)
+            ids = {
+                relation.id_of(sibling)
+                for sibling in self.instances
+                if relation.cached(sibling) is None
+            }
+            ids.discard(None)
+            try:
+                found = relation.fetch(instance, ids)
+            except (ApiConsumerException, ModelConsumerException) as e:
+                # loaded one by one on access
+                logger.error(f"Batch loading of {relation!r} failed: {e!r}")
+                return
+            for sibling in self.instances:
+                related = found.get(relation.id_of(sibling))
+                if related is not None:
+                    relation.cache(sibling, related)
@@ -0,0 +1,84 @@
+import logging
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DnsCache:
+    """
+    Results of socket.getaddrinfo kept for ttl seconds
+
+    Once installed, every connection of the process (requests included)
+    resolves its host from the cache, a lookup is only done again after
+    the ttl. Failed lookups are not kept.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        max_entries: int = 1024,
+        resolver: Optional[Callable] = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._resolver = resolver
+        self._original: Optional[Callable] = None
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def installed(self) -> bool:
+        return self._original is not None
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0) -> list:
+        """Same as socket.getaddrinfo, answered from the cache when possible"""
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                return list(entry[0])
+        resolver = self._resolver or self._original or socket.getaddrinfo
+        addresses = resolver(host, port, family, type, proto, flags)
+        with self._lock:
+            self._entries[key] = (tuple(addresses), now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return list(addresses)
+
+    def resolve(self, host: str, port: int) -> list:
+        """Addresses of host for TCP connections, cached"""
+        infos = self.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        return [info[4] for info in infos]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def install(self) -> "DnsCache":
+        """Resolve hosts of the whole process with the cache"""
+        with self._lock:
+            if self._original is None:
+                self._original = socket.getaddrinfo
+                socket.getaddrinfo = self.getaddrinfo
+        return self
+
+    def uninstall(self) -> None:
+        """Restore the resolver replaced by install"""
+        with self._lock:
+            if self._original is not None:
+                if socket.getaddrinfo == self.getaddrinfo:
+                    socket.getaddrinfo = self._original
+                else:
+                    logger.error("socket.getaddrinfo replaced since, not restored")
+                self._original = None
+
+
+# cache installed by Api.warmup
+DNS_CACHE = DnsCache()
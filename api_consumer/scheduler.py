@@ -0,0 +1,105 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from .metrics import DEFAULT_BUCKETS, Histogram
+
+# priority classes, lower values are sent first
+INTERACTIVE = 0
+BULK = 10
+
+
+class HostQueue:
+    """Requests sent and waiting for a host, with their wait time metrics"""
+
+    def __init__(self, limit: int, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.limit = limit
+        self.active = 0
+        self.waiting: List[tuple] = []
+        self.max_depth = 0
+        self.wait = Histogram(buckets)
+        # fair queuing: virtual start of the last sent request and by caller
+        self.clock = 0
+        self.tags: Dict[Hashable, int] = {}
+
+    @property
+    def depth(self) -> int:
+        return len(self.waiting)
+
+
+class RequestScheduler:
+    """
+    Send requests by priority with at most max_per_host at once by host
+
+    Requests of a lower priority value are sent first (INTERACTIVE before
+    BULK), callers of the same priority are served in turn: a caller
+    queuing hundreds of pages does not delay the single request of another.
+    limits: max concurrency of specific hosts (netloc), max_per_host otherwise
+    """
+
+    def __init__(self, max_per_host: int = 8, limits: Optional[Dict[str, int]] = None):
+        self.max_per_host = max_per_host
+        self.limits = dict(limits or {})
+        self._hosts: Dict[str, HostQueue] = {}
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def _queue(self, host: str) -> HostQueue:
+        queue = self._hosts.get(host)
+        if queue is None:
+            limit = self.limits.get(host, self.max_per_host)
+            queue = self._hosts[host] = HostQueue(limit)
+        return queue
+
+    def acquire(self, host: str, priority: int = INTERACTIVE, caller=None) -> float:
+        """Wait for a slot of host, return the seconds waited"""
+        with self._lock:
+            queue = self._queue(host)
+            if queue.active < queue.limit and not queue.waiting:
+                queue.active += 1
+                queue.wait.observe(0.0)
+                return 0.0
+            # start tag of the caller, after its previous queued requests
+            tag = max(queue.tags.get(caller, 0), queue.clock) + 1
+            queue.tags[caller] = tag
+            ticket = threading.Event()
+            entry = (priority, tag, next(self._order), ticket, caller)
+            heapq.heappush(queue.waiting, entry)
+            queue.max_depth = max(queue.max_depth, len(queue.waiting))
+        start = time.perf_counter()
+        ticket.wait()
+        waited = time.perf_counter() - start
+        with self._lock:
+            queue.wait.observe(waited)
+        return waited
+
+    def release(self, host: str) -> None:
+        """Give the slot to the next waiting request"""
+        with self._lock:
+            queue = self._hosts[host]
+            if queue.waiting:
+                _, tag, _, ticket, caller = heapq.heappop(queue.waiting)
+                queue.clock = max(queue.clock, tag)
+                if queue.tags.get(caller) == tag:
+                    # nothing else queued by this caller
+                    del queue.tags[caller]
+                ticket.set()
+            else:
+                queue.active -= 1
+
+    def stats(self) -> Dict[str, dict]:
+        """Active and queued requests, deepest queue and wait times by host"""
+        with self._lock:
+            return {
+                host: {
+                    "active": queue.active,
+                    "queued": queue.depth,
+                    "max_queued": queue.max_depth,
+                    "waits": queue.wait.count,
+                    "wait_seconds": queue.wait.sum,
+                    "wait_buckets": queue.wait.cumulative(),
+                }
+                for host, queue in self._hosts.items()
+            }
@@ -0,0 +1,211 @@
+import json
+import logging
+import re
+import threading
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from .exceptions import ModelConsumerException
+
+logger = logging.getLogger(__name__)
+
+_FIELD = re.compile(r"^\w+$")
+_LOOKUPS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "exact": "=", "in": "IN"}
+
+
+def _table(item: str) -> str:
+    """Quoted SQL identifier of the table storing an item"""
+    return '"records_' + item.replace('"', '""') + '"'
+
+
+def _field(name: str) -> str:
+    """SQL expression of a field of the stored JSON"""
+    if not _FIELD.match(name):
+        err = f"Invalid field name for local queries: {name}"
+        logger.error(err)
+        raise ModelConsumerException(err)
+    return f"json_extract(data, '$.{name}')"
+
+
+def _condition(lookup: str, value) -> Tuple[str, list]:
+    """SQL condition and parameters of a django-like lookup (ex: age__gte=18)"""
+    name, _, operator = lookup.rpartition("__")
+    if not name:
+        name, operator = lookup, "exact"
+    elif operator not in _LOOKUPS:
+        err = f"Unsupported lookup for local queries: {lookup}"
+        logger.error(err)
+        raise ModelConsumerException(err)
+    if operator == "in":
+        values = list(value)
+        return f"{_field(name)} IN ({', '.join('?' * len(values))})", values
+    return f"{_field(name)} {_LOOKUPS[operator]} ?", [value]
+
+
+class SQLiteStore:
+    """
+    Local snapshot of API items in SQLite, with a key/value state
+    (ex: synchronisation high-water marks)
+
+    Rows are stored as JSON by id, with the generation of the full
+    synchronisation that saw them last.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        import sqlite3
+
+        self._path = path
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._tables: set = set()
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    def _ensure(self, item: str) -> str:
+        table = _table(item)
+        if item not in self._tables:
+            with self._db:
+                self._db.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} "
+                    "(id TEXT PRIMARY KEY, data TEXT NOT NULL, generation INTEGER)"
+                )
+            self._tables.add(item)
+        return table
+
+    def get_state(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM sync_state WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                (key, value),
+            )
+
+    def mark_complete(self, item: str, complete: bool = True) -> None:
+        """
+        All items are stored (full synchronisation or unfiltered query):
+        queries can be answered locally, a miss is an empty result
+        """
+        self.set_state(f"complete:{item}", "1" if complete else "")
+
+    def is_complete(self, item: str) -> bool:
+        return bool(self.get_state(f"complete:{item}"))
+
+    def upsert(self, item: str, rows: Iterable[dict], generation: int = 0) -> int:
+        """Insert or replace rows in one transaction, return the number of rows"""
+        with self._lock:
+            table = self._ensure(item)
+            values = [(str(row["id"]), json.dumps(row), generation) for row in rows]
+            with self._db:
+                self._db.executemany(
+                    f"INSERT OR REPLACE INTO {table} (id, data, generation) VALUES (?, ?, ?)",
+                    values,
+                )
+        return len(values)
+
+    def delete(self, item: str, ids: Iterable[Union[int, str]]) -> int:
+        with self._lock:
+            table = self._ensure(item)
+            with self._db:
+                cursor = self._db.executemany(
+                    f"DELETE FROM {table} WHERE id = ?", [(str(i),) for i in ids]
+                )
+        return cursor.rowcount
+
+    def delete_other_generations(self, item: str, generation: int) -> int:
+        """Remove rows not seen by a full synchronisation"""
+        with self._lock:
+            table = self._ensure(item)
+            with self._db:
+                cursor = self._db.execute(
+                    f"DELETE FROM {table} WHERE generation != ?", (generation,)
+                )
+        return cursor.rowcount
+
+    def get(self, item: str, id_instance: Union[int, str]) -> Optional[dict]:
+        with self._lock:
+            table = self._ensure(item)
+            row = self._db.execute(
+                f"SELECT data FROM {table} WHERE id = ?", (str(id_instance),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def all(self, item: str) -> Iterator[dict]:
+        with self._lock:
+            table = self._ensure(item)
+            rows = self._db.execute(f"SELECT data FROM {table} ORDER BY id").fetchall()
+        return (json.loads(row[0]) for row in rows)
+
+    def index(self, item: str, *fields: str) -> None:
+        """Create indexes on fields of the stored JSON, if missing"""
+        with self._lock:
+            table = self._ensure(item)
+            prefix = re.sub(r"\W", "_", item)
+            with self._db:
+                for field in fields:
+                    name = f'"index_{prefix}_{field}"'
+                    self._db.execute(
+                        f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({_field(field)})"
+                    )
+
+    @staticmethod
+    def supports(lookup: str) -> bool:
+        """The lookup can be answered by filter"""
+        name, _, operator = lookup.rpartition("__")
+        return not name or operator in _LOOKUPS
+
+    def filter(
+        self,
+        item: str,
+        filters: Optional[dict] = None,
+        ordering: Iterable[str] = (),
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        Rows matching django-like lookups (field, field__gte, field__in...)
+        ordering: field names, a leading - for descending order
+        """
+        where, params = [], []
+        for lookup, value in (filters or {}).items():
+            condition, values = _condition(lookup, value)
+            where.append(condition)
+            params += values
+        with self._lock:
+            table = self._ensure(item)
+        sql = f"SELECT data FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        order = [
+            f"{_field(f.lstrip('-'))} {'DESC' if f.startswith('-') else 'ASC'}"
+            for f in ordering
+        ]
+        if order:
+            sql += " ORDER BY " + ", ".join(order)
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset]
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self, item: str) -> int:
+        with self._lock:
+            table = self._ensure(item)
+            return self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,82 @@
+import logging
+import time
+from typing import NamedTuple, Optional
+from urllib.parse import quote
+
+from .store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class SyncResult(NamedTuple):
+    fetched: int
+    deleted: int
+    full: bool
+    high_water: Optional[str]
+
+
+def synchronize(
+    model,
+    store: SQLiteStore,
+    modified_field: str = "modified",
+    filter_param: Optional[str] = None,
+    tombstone_item: Optional[str] = None,
+    reconcile_every: Optional[float] = None,
+    options: Optional[list] = None,
+) -> SyncResult:
+    """
+    Fetch items changed since the last run and merge them in the store
+
+    modified_field: field of the items giving their last modification
+    filter_param: querystring filter on this field (modified_field__gte by default,
+        boundary items are fetched again rather than missed)
+    tombstone_item: item listing deleted ids since the high-water mark
+    reconcile_every: seconds between full synchronisations, removing from
+        the store items deleted in the API
+    """
+    item = model._item
+    filter_param = filter_param or f"{modified_field}__gte"
+    key = f"{model._url}/{item}"
+    high_water = store.get_state(f"{key}:high_water")
+    last_full = float(store.get_state(f"{key}:last_full") or 0)
+    full = high_water is None or bool(
+        reconcile_every and time.time() - last_full >= reconcile_every
+    )
+
+    options = list(options or [])
+    options.append(f"{model._ordering_param}={modified_field}")
+    if not full:
+        options.append(f"{filter_param}={quote(high_water)}")
+    # a full synchronisation marks seen rows with a new generation
+    generation = int(store.get_state(f"{key}:generation") or 0)
+    if full:
+        generation += 1
+
+    fetched = 0
+    newest = high_water
+    # a background job: its pages do not delay interactive requests
+    for page in model._iter_pages(item, 0, options, model._bulk_priority):
+        fetched += store.upsert(item, page, generation)
+        for row in page:
+            value = row.get(modified_field)
+            if value is not None and (newest is None or str(value) > newest):
+                newest = str(value)
+
+    deleted = 0
+    if full:
+        deleted = store.delete_other_generations(item, generation)
+        store.mark_complete(item)
+        store.set_state(f"{key}:generation", str(generation))
+        store.set_state(f"{key}:last_full", str(time.time()))
+    elif tombstone_item:
+        tombstone_options = [f"{filter_param}={quote(high_water)}"]
+        for page in model._iter_pages(
+            tombstone_item, 0, tombstone_options, model._bulk_priority
+        ):
+            ids = [t["id"] if isinstance(t, dict) else t for t in page]
+            deleted += store.delete(item, ids)
+
+    if newest is not None:
+        store.set_state(f"{key}:high_water", newest)
+    logger.info(f"Sync {item}: {fetched} fetched, {deleted} deleted (full: {full})")
+    return SyncResult(fetched, deleted, full, newest)
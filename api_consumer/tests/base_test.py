@@ -1,5 +1,34 @@
+import json
 import logging
+import time
+from typing import Any, Optional
 from unittest import TestCase
+from unittest.mock import MagicMock
+
+from requests import Response
+
+
+def make_response(
+    payload: Any = None,
+    status_code: int = 200,
+    headers: Optional[dict] = None,
+    method: str = "GET",
+) -> Response:
+    """Response to a request, payload is sent as JSON ({"id": 1} by default)"""
+    r = Response()
+    r.status_code = status_code
+    r._content = json.dumps({"id": 1} if payload is None else payload).encode()
+    r.headers.update(headers or {})
+    r.request = MagicMock(method=method, body=None)
+    return r
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    """Wait until condition() is true, return its last value"""
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.002)
+    return condition()
 
 
 class BaseTestCase(TestCase):
@@ -0,0 +1,121 @@
+from unittest.mock import patch
+
+import requests
+
+from api_consumer.api import Api
+from api_consumer.balancing import EWMA, LEAST_OUTSTANDING, EndpointPool
+from api_consumer.events import ON_RETRY
+from api_consumer.exceptions import ApiConsumerException
+
+from .base_test import BaseTestCase, make_response
+
+REPLICAS = ["http://a.test/api", "http://b.test/api", "http://c.test/api"]
+
+
+class TestEndpointPool(BaseTestCase):
+    def test_round_robin(self):
+        pool = EndpointPool(REPLICAS)
+        chosen = [pool.choose().url for _ in range(6)]
+        self.assertEqual(chosen, REPLICAS * 2)
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ApiConsumerException):
+            EndpointPool(REPLICAS, strategy="random")
+        with self.assertRaises(ApiConsumerException):
+            EndpointPool([])
+
+    def test_least_outstanding(self):
+        pool = EndpointPool(REPLICAS, strategy=LEAST_OUTSTANDING)
+        a, b, c = pool.endpoints
+        pool.start(a)
+        pool.start(a)
+        pool.start(c)
+        self.assertIs(pool.choose(), b)
+
+    def test_ewma(self):
+        pool = EndpointPool(REPLICAS, strategy=EWMA)
+        a, b, c = pool.endpoints
+        for endpoint, seconds in ((a, 0.3), (b, 0.1)):
+            pool.start(endpoint)
+            pool.done(endpoint, seconds, ok=True)
+        # c is not measured yet
+        self.assertIs(pool.choose(), c)
+        pool.start(c)
+        pool.done(c, 0.2, ok=True)
+        self.assertIs(pool.choose(), b)
+        # b becomes slower
+        for _ in range(5):
+            pool.start(b)
+            pool.done(b, 1.0, ok=True)
+        self.assertIs(pool.choose(), c)
+
+    def test_ejection_and_cooldown(self):
+        pool = EndpointPool(REPLICAS, max_failures=2, cooldown=10)
+        a = pool.endpoints[0]
+        for _ in range(2):
+            pool.start(a)
+            pool.done(a, 0.1, ok=False)
+        self.assertEqual(pool.healthy(), REPLICAS[1:])
+        self.assertNotIn(a, [pool.choose() for _ in range(4)])
+        with patch("time.monotonic", return_value=a.ejected_until + 1):
+            self.assertEqual(pool.healthy(), REPLICAS)
+
+    def test_rewrite(self):
+        pool = EndpointPool(REPLICAS)
+        b = pool.endpoints[1]
+        self.assertEqual(
+            pool.rewrite("http://a.test/api/user/?page=2", b),
+            "http://b.test/api/user/?page=2",
+        )
+        self.assertEqual(pool.rewrite("http://c.test/api", b), "http://b.test/api")
+        self.assertEqual(
+            pool.rewrite("http://a.test/apiv2/user/", b), "http://a.test/apiv2/user/"
+        )
+
+
+class TestApiBalancing(BaseTestCase):
+    def test_requests_shared_between_replicas(self):
+        api = Api()
+        api.config(EndpointPool(REPLICAS))
+        with patch("requests.get", return_value=make_response()) as mock:
+            for _ in range(3):
+                api.get_instance("user", 1)
+            urls = [call.kwargs["url"] for call in mock.call_args_list]
+        self.assertEqual(
+            urls, [f"{replica}/user/1?format=json" for replica in REPLICAS]
+        )
+
+    def test_config_list_shares_health(self):
+        first, second = Api(), Api()
+        first.config(REPLICAS)
+        second.config(REPLICAS)
+        self.assertIs(first._endpoints, second._endpoints)
+        self.assertEqual(first._url, REPLICAS[0])
+        first.config("http://test.com")
+        self.assertIsNone(first._endpoints)
+
+    def test_read_retried_on_another_replica(self):
+        api = Api()
+        api.config(EndpointPool(REPLICAS))
+        retries = []
+        api.add_hook(ON_RETRY, retries.append)
+
+        def get(url, **kargs):
+            if url.startswith("http://a.test"):
+                raise requests.ConnectionError("refused")
+            if url.startswith("http://c.test"):
+                return make_response(status_code=503)
+            return make_response()
+
+        with patch("requests.get", side_effect=get):
+            self.assertEqual(api.get_instance("user", 1), {"id": 1})
+        self.assertEqual([info.attempt for info in retries], [2, 3])
+        self.assertTrue(retries[-1].url.startswith("http://b.test"))
+
+    def test_write_not_retried(self):
+        api = Api()
+        api.config(EndpointPool(REPLICAS))
+        with patch("requests.post", side_effect=requests.ConnectionError) as mock:
+            with self.assertRaises(requests.ConnectionError):
+                api.post_instance("user", payload={"name": "Bob"})
+            self.assertEqual(mock.call_count, 1)
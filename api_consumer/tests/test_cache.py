@@ -0,0 +1,213 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from requests import Response
+
+from api_consumer.cache import FRESH, STALE, StaleCache
+from api_consumer.events import ON_CACHE_HIT
+from api_consumer.model import Model
+
+from .base_test import BaseTestCase, wait_for
+
+
+class Article(Model):
+    """For testing only"""
+
+    title: str = ""
+
+
+class FakeApi:
+    """For testing only, titles change with the number of requests"""
+
+    def __init__(self):
+        self.calls = 0
+        self.refreshed = threading.Event()
+
+    def get(self, url, **kargs):
+        self.calls += 1
+        title = f"version {self.calls}"
+        r = Response()
+        r.status_code = 200
+        if "/article/?" in url:
+            results = [{"id": i, "title": title} for i in (1, 2)]
+            r.json = lambda: {"next": None, "results": results}
+        else:
+            r.json = lambda: {"id": 1, "title": title}
+        if self.calls > 1:
+            self.refreshed.set()
+        return r
+
+
+class TestStaleCache(BaseTestCase):
+    def test_fresh_stale_expired(self):
+        cache = StaleCache(ttl=10, stale=10)
+        cache.store("key", 1)
+        self.assertEqual(cache.lookup("key"), (1, FRESH))
+
+        with patch("time.monotonic", return_value=time.monotonic() + 15):
+            self.assertEqual(cache.lookup("key"), (1, STALE))
+        with patch("time.monotonic", return_value=time.monotonic() + 25):
+            self.assertEqual(cache.lookup("key"), (None, None))
+        self.assertEqual(len(cache), 0)
+
+    def test_single_background_refresh(self):
+        cache = StaleCache(ttl=0, stale=60)
+        cache.store("key", "old")
+        release = threading.Event()
+        loads = []
+
+        def load():
+            loads.append(1)
+            release.wait(2)
+            return "new"
+
+        with ThreadPoolExecutor(2) as executor:
+            for _ in range(5):
+                self.assertEqual(cache.read("key", load, executor), ("old", STALE))
+            release.set()
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(cache.lookup("key")[0], "new")
+
+    def test_invalidated_during_load(self):
+        cache = StaleCache(ttl=60)
+
+        def load():
+            # a write happens while the response is received
+            cache.invalidate(item="article")
+            return "before the write"
+
+        with ThreadPoolExecutor(1) as executor:
+            cache.read("key", load, executor, "article")
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate_item(self):
+        cache = StaleCache(ttl=60)
+        cache.store("a", 1, "article")
+        cache.store("b", 2, "user")
+        cache.invalidate(item="article")
+        self.assertEqual((cache.lookup("a")[0], cache.lookup("b")[0]), (None, 2))
+
+    def test_failed_refresh(self):
+        cache = StaleCache(ttl=0, stale=60)
+        cache.store("key", "old")
+
+        def load():
+            raise ConnectionError("unreachable")
+
+        with (
+            patch("api_consumer.cache.logger") as logger,
+            ThreadPoolExecutor(1) as executor,
+        ):
+            self.assertEqual(cache.read("key", load, executor), ("old", STALE))
+        logger.error.assert_called_once()
+        # still served, refreshed again by the next read
+        self.assertEqual(cache.lookup("key"), ("old", STALE))
+        self.assertEqual(cache._refreshing, set())
+
+    def test_max_entries(self):
+        cache = StaleCache(ttl=60, max_entries=2)
+        for key in "abc":
+            cache.store(key, key)
+        self.assertEqual(cache.lookup("a"), (None, None))
+        self.assertEqual(cache.lookup("c"), ("c", FRESH))
+
+
+class TestModelCache(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.api = FakeApi()
+        self.cache = StaleCache(ttl=0, stale=60)
+        Article.use_cache(self.cache)
+
+    def tearDown(self):
+        Article.use_cache(None)
+        super().tearDown()
+
+    def test_get_stale_while_revalidate(self):
+        hits = []
+        with patch("requests.get", side_effect=self.api.get):
+            article = Article("http://test.com")
+            article.get(1)
+            self.assertEqual(article.title, "version 1")
+
+            copy = Article("http://test.com")
+            copy.add_hook(ON_CACHE_HIT, hits.append)
+            copy.get(1)
+            # served at once from the cache, refreshed in background
+            self.assertEqual(copy.title, "version 1")
+            self.assertTrue(self.api.refreshed.wait(2))
+            self.assertTrue(wait_for(lambda: article.title == "version 2"))
+        self.assertEqual(copy.title, "version 2")
+        self.assertEqual([info.cache for info in hits], [STALE])
+
+    def test_refresh_keeps_local_changes(self):
+        with patch("requests.get", side_effect=self.api.get):
+            article = Article("http://test.com")
+            article.get(1)
+            article.title = "local"
+            Article("http://test.com").get(1)
+            self.assertTrue(self.api.refreshed.wait(2))
+            time.sleep(0.05)
+        self.assertEqual(article.title, "local")
+
+    def test_from_query(self):
+        with patch("requests.get", side_effect=self.api.get):
+            articles = Article("http://test.com").from_query()
+            again = Article("http://test.com").from_query()
+            self.assertEqual([a.title for a in again], ["version 1"] * 2)
+            self.assertTrue(self.api.refreshed.wait(2))
+            self.assertTrue(
+                wait_for(lambda: [a.title for a in articles] == ["version 2"] * 2)
+            )
+
+    def test_hit_not_replicated(self):
+        self.cache.ttl = 60
+        with patch("requests.get", side_effect=self.api.get):
+            Article("http://test.com").from_query()
+            article = Article("http://test.com")
+            with (
+                patch.object(Article, "_detached") as detached,
+                patch.object(Article, "_replicate") as replicate,
+            ):
+                self.assertEqual(len(article.from_query()), 2)
+                Article("http://test.com").get(1)
+                Article("http://test.com").get(1)
+            detached.assert_not_called()
+            # only the get loaded from the API
+            replicate.assert_called_once()
+        self.assertEqual(self.api.calls, 2)
+
+    def test_refresh_keeps_pagination_state(self):
+        with patch("requests.get", side_effect=self.api.get):
+            article = Article("http://test.com")
+            article.from_query()
+            # the caller iterates another query with the same instance
+            article._next = "http://test.com/article/?color=blue&page=2"
+            article.from_query()
+            self.assertTrue(self.api.refreshed.wait(2))
+            self.assertTrue(wait_for(lambda: self.api.calls == 2))
+            time.sleep(0.05)
+        self.assertEqual(article._next, "http://test.com/article/?color=blue&page=2")
+
+    def test_writes_invalidate(self):
+        self.cache.ttl = 60
+        with patch("requests.get", side_effect=self.api.get):
+            article = Article("http://test.com")
+            article.get(1)
+            article.title = "changed"
+            with patch("requests.patch") as mock:
+                r = Response()
+                r.status_code = 200
+                r.json = lambda: {"id": 1, "title": "changed"}
+                mock.return_value = r
+                article.save()
+            self.assertEqual(len(self.cache), 0)
+            Article("http://test.com").get(1)
+            self.assertEqual(self.api.calls, 2)
+
+            with patch("requests.delete") as mock:
+                mock.return_value.status_code = 204
+                article.delete()
+        self.assertEqual(len(self.cache), 0)
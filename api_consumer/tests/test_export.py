@@ -0,0 +1,171 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from requests import Response
+
+from api_consumer.exceptions import ApiConsumerException
+from api_consumer.export import CsvSink, NdjsonSink, Sink, export_pages
+from api_consumer.model import Model
+
+from .base_test import BaseTestCase
+
+PAGES = 3
+PAGE_SIZE = 4
+
+
+class Article(Model):
+    """For testing only"""
+
+    title: str = ""
+    tags: list = []
+
+
+def paginated(url, **kargs):
+    """Pages of articles, page=N in url"""
+    number = int(url.split("page=")[1][0]) if "page=" in url else 1
+    first = (number - 1) * PAGE_SIZE
+    results = [
+        {"id": i, "title": f"Article {i}", "tags": ["a", "b"]}
+        for i in range(first + 1, first + PAGE_SIZE + 1)
+    ]
+    r = Response()
+    r.status_code = 200
+    r._content = json.dumps(
+        {
+            "count": PAGES * PAGE_SIZE,
+            "next": (
+                f"http://test.com/article/?page={number + 1}"
+                if number < PAGES
+                else None
+            ),
+            "results": results,
+        }
+    ).encode()
+    return r
+
+
+class FailingSink(NdjsonSink):
+    """For testing only, fail on the second page"""
+
+    def write(self, rows: list) -> int:
+        if rows[0]["id"] > PAGE_SIZE:
+            raise OSError("No space left on device")
+        return super().write(rows)
+
+
+class TestSinks(BaseTestCase):
+    def test_ndjson(self):
+        buffer = io.BytesIO()
+        with NdjsonSink(buffer, fields=["id", "title"]) as sink:
+            nbytes = sink.write([{"id": 1, "title": "Été", "tags": []}])
+        self.assertEqual(buffer.getvalue(), '{"id":1,"title":"Été"}\n'.encode())
+        self.assertEqual((nbytes, sink.written), (len(buffer.getvalue()),) * 2)
+
+    def test_csv(self):
+        buffer = io.BytesIO()
+        with CsvSink(buffer) as sink:
+            sink.write([{"id": 1, "title": "a, b", "tags": ["x"]}])
+            sink.write([{"id": 2, "other": "ignored"}])
+        rows = list(csv.reader(io.StringIO(buffer.getvalue().decode())))
+        self.assertEqual(
+            rows, [["id", "title", "tags"], ["1", "a, b", '["x"]'], ["2", "", ""]]
+        )
+
+    def test_gzip_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "export.ndjson.gz")
+            with NdjsonSink(path, compression="gzip") as sink:
+                for i in range(100):
+                    sink.write([{"id": i, "title": "repeated title"}])
+            self.assertEqual(sink.written, os.path.getsize(path))
+            with gzip.open(path) as f:
+                lines = f.read().splitlines()
+        self.assertEqual(len(lines), 100)
+        self.assertEqual(json.loads(lines[-1]), {"id": 99, "title": "repeated title"})
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ApiConsumerException):
+            NdjsonSink(io.BytesIO(), compression="rar")
+
+    def test_zstd_without_package(self):
+        with patch.dict("sys.modules", {"zstandard": None}):
+            with self.assertRaises(ApiConsumerException):
+                NdjsonSink(io.BytesIO(), compression="zstd").open()
+
+    def test_base_sink(self):
+        with self.assertRaises(NotImplementedError):
+            with Sink(io.BytesIO()) as sink:
+                sink.write([{"id": 1}])
+
+
+class TestExport(BaseTestCase):
+    def test_export_pages(self):
+        buffer = io.BytesIO()
+        reports = []
+        result = export_pages(
+            ([{"id": i}] * 10 for i in range(5)), NdjsonSink(buffer), 2, reports.append
+        )
+        self.assertEqual((result.rows, result.nbytes), (50, 450))
+        self.assertEqual(result.written, len(buffer.getvalue()))
+        self.assertEqual([report.rows for report in reports], [10, 20, 30, 40, 50])
+        self.assertGreater(result.rows_per_second, 0)
+        self.assertGreater(result.mb_per_second, 0)
+
+    def test_writer_overlaps_fetching(self):
+        fetched = []
+        started = threading.Event()
+
+        class SlowSink(NdjsonSink):
+            def write(self, rows: list) -> int:
+                started.set()
+                time.sleep(0.05)
+                return super().write(rows)
+
+        def pages():
+            for i in range(3):
+                if i:
+                    # the next page is fetched while the previous one is written
+                    self.assertTrue(started.wait(1))
+                fetched.append(i)
+                yield [{"id": i}]
+
+        export_pages(pages(), SlowSink(io.BytesIO()), queue_size=1)
+        self.assertEqual(fetched, [0, 1, 2])
+
+    def test_model_export(self):
+        article = Article("http://test.com")
+        buffer = io.BytesIO()
+        with (
+            patch("requests.get", side_effect=paginated) as mock,
+            patch.object(Article, "from_json") as from_json,
+        ):
+            result = article.export(CsvSink(buffer), limit=10, fields=["id", "title"])
+        from_json.assert_not_called()
+        self.assertEqual(mock.call_count, 3)
+        self.assertIn("fields=id,title", mock.call_args_list[0].kwargs["url"])
+        lines = buffer.getvalue().decode().splitlines()
+        self.assertEqual(result.rows, 10)
+        self.assertEqual(lines[:2], ["id,title", "1,Article 1"])
+        self.assertEqual(lines[-1], "10,Article 10")
+
+    def test_query_export(self):
+        buffer = io.BytesIO()
+        with patch("requests.get", side_effect=paginated):
+            result = Article.objects.filter(title="x").export(NdjsonSink(buffer))
+        ids = [json.loads(line)["id"] for line in buffer.getvalue().splitlines()]
+        self.assertEqual(ids, list(range(1, PAGES * PAGE_SIZE + 1)))
+        self.assertEqual(result.rows, PAGES * PAGE_SIZE)
+
+    def test_writer_error_stops_export(self):
+        article = Article("http://test.com")
+        with patch("requests.get", side_effect=paginated):
+            with self.assertRaises(ApiConsumerException) as context:
+                article.export(FailingSink(io.BytesIO()), queue_size=1)
+        self.assertIsInstance(context.exception.__cause__, OSError)
@@ -0,0 +1,249 @@
+import io
+import os
+import tempfile
+from unittest.mock import patch
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from api_consumer.api import Api
+from api_consumer.exceptions import ApiConsumerException, ModelConsumerException
+from api_consumer.files import BodyReader, split_ranges
+from api_consumer.model import Model
+
+from .base_test import BaseTestCase
+
+DATA = bytes(range(256)) * 40
+
+
+class Document(Model):
+    """For testing only"""
+
+
+def file_response(url, headers=None, **kargs):
+    """For testing only, serve DATA with range requests"""
+    r = Response()
+    r.url = url
+    r.headers = CaseInsensitiveDict({"accept-ranges": "bytes"})
+    body = DATA
+    ranged = (headers or {}).get("range")
+    if ranged:
+        first, last = ranged.split("=")[1].split("-")
+        first, end = int(first), int(last) + 1 if last else len(DATA)
+        body = DATA[first:end]
+        r.status_code = 206
+        r.headers["content-range"] = f"bytes {first}-{end - 1}/{len(DATA)}"
+    else:
+        r.status_code = 200
+    r.headers["content-length"] = str(len(body))
+    r.raw = io.BytesIO(body)
+    return r
+
+
+class BrokenBody(io.BytesIO):
+    """For testing only, the connection is lost after limit bytes"""
+
+    def __init__(self, body: bytes, limit: int):
+        super().__init__(body)
+        self.limit = limit
+
+    def read(self, size=-1):
+        if self.tell() >= self.limit:
+            raise ConnectionResetError("Connection lost")
+        return super().read(min(size, self.limit - self.tell()))
+
+
+def read_body(body) -> bytes:
+    chunks = []
+    chunk = body.read(1000)
+    while chunk:
+        chunks.append(bytes(chunk))
+        chunk = body.read(1000)
+    return b"".join(chunks)
+
+
+class TestFiles(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.api = Api()
+        self.api.config("http://test.com")
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "file.bin")
+
+    def tearDown(self):
+        self.folder.cleanup()
+        super().tearDown()
+
+    def test_split_ranges(self):
+        self.assertEqual(split_ranges(0, 10, 3), [(0, 3), (4, 7), (8, 9)])
+        self.assertEqual(split_ranges(4, 10, 2), [(4, 6), (7, 9)])
+
+    def test_download_to_buffer(self):
+        buffer = bytearray(len(DATA))
+        seen = []
+        with patch("requests.get", side_effect=file_response) as mock:
+            transfer = self.api.download(
+                "http://test.com/f", buffer, chunk_size=1000, progress=seen.append
+            )
+            self.assertTrue(mock.call_args.kwargs["stream"])
+        self.assertEqual(bytes(buffer), DATA)
+        self.assertEqual((transfer.nbytes, transfer.size), (len(DATA), len(DATA)))
+        self.assertEqual(sum(seen), len(DATA))
+        self.assertGreater(transfer.throughput, 0)
+
+    def test_download_buffer_too_small(self):
+        with patch("requests.get", side_effect=file_response):
+            with self.assertRaises(ApiConsumerException):
+                self.api.download("http://test.com/f", bytearray(10))
+
+    def test_download_resume(self):
+        with open(self.path, "wb") as file:
+            file.write(DATA[:1000])
+        with patch("requests.get", side_effect=file_response) as mock:
+            transfer = self.api.download("http://test.com/f", self.path, resume=True)
+            self.assertEqual(mock.call_args.kwargs["headers"]["range"], "bytes=1000-")
+        self.assertEqual((transfer.offset, transfer.nbytes), (1000, len(DATA) - 1000))
+        with open(self.path, "rb") as file:
+            self.assertEqual(file.read(), DATA)
+
+    def test_download_resume_ignored_by_server(self):
+        with open(self.path, "wb") as file:
+            file.write(b"x" * 1000)
+        with patch("requests.get", side_effect=lambda url, **k: file_response(url)):
+            transfer = self.api.download("http://test.com/f", self.path, resume=True)
+        self.assertEqual((transfer.offset, transfer.nbytes), (0, len(DATA)))
+        with open(self.path, "rb") as file:
+            self.assertEqual(file.read(), DATA)
+
+    def test_download_interrupted_then_resumed(self):
+        def broken(url, **kargs):
+            r = file_response(url, **kargs)
+            r.raw = BrokenBody(r.raw.read(), 3000)
+            return r
+
+        with patch("requests.get", side_effect=broken):
+            with self.assertRaises(ConnectionResetError):
+                self.api.download("http://test.com/f", self.path, chunk_size=1000)
+        # the preallocated part is cut after the bytes received
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(os.path.getsize(self.path + ".part"), 3000)
+
+        with patch("requests.get", side_effect=file_response) as mock:
+            transfer = self.api.download("http://test.com/f", self.path, resume=True)
+            self.assertEqual(mock.call_args.kwargs["headers"]["range"], "bytes=3000-")
+        self.assertEqual((transfer.offset, transfer.nbytes), (3000, len(DATA) - 3000))
+        self.assertFalse(os.path.exists(self.path + ".part"))
+        with open(self.path, "rb") as file:
+            self.assertEqual(file.read(), DATA)
+
+    def test_parallel_download_interrupted_then_resumed(self):
+        def broken(url, headers=None, **kargs):
+            r = file_response(url, headers, **kargs)
+            if headers["range"].startswith("bytes=5120-"):
+                r.raw = BrokenBody(r.raw.read(), 0)
+            return r
+
+        for use_mmap in (False, True):
+            with self.subTest(use_mmap=use_mmap):
+                with (
+                    patch("requests.head", side_effect=file_response),
+                    patch("requests.get", side_effect=broken),
+                ):
+                    with self.assertRaises(ConnectionResetError):
+                        self.api.download(
+                            "http://test.com/f",
+                            self.path,
+                            parts=4,
+                            chunk_size=1000,
+                            use_mmap=use_mmap,
+                        )
+                # the last part ended, but after the gap of the third one
+                self.assertEqual(os.path.getsize(self.path + ".part"), 5120)
+
+                with (
+                    patch("requests.head", side_effect=file_response),
+                    patch("requests.get", side_effect=file_response),
+                ):
+                    transfer = self.api.download(
+                        "http://test.com/f",
+                        self.path,
+                        resume=True,
+                        parts=2,
+                        chunk_size=1000,
+                        use_mmap=use_mmap,
+                    )
+                self.assertEqual(transfer.offset, 5120)
+                with open(self.path, "rb") as file:
+                    self.assertEqual(file.read(), DATA)
+                os.remove(self.path)
+
+    def test_parallel_ranged_download(self):
+        for use_mmap in (False, True):
+            with self.subTest(use_mmap=use_mmap):
+                with (
+                    patch("requests.head", side_effect=file_response),
+                    patch("requests.get", side_effect=file_response) as mock,
+                ):
+                    transfer = self.api.download(
+                        "http://test.com/f",
+                        self.path,
+                        parts=4,
+                        chunk_size=1000,
+                        use_mmap=use_mmap,
+                    )
+                    self.assertEqual(mock.call_count, 4)
+                self.assertEqual(transfer.nbytes, len(DATA))
+                with open(self.path, "rb") as file:
+                    self.assertEqual(file.read(), DATA)
+
+    def test_upload_buffer(self):
+        def post(url, data=None, **kargs):
+            self.assertEqual(len(data), len(DATA))
+            self.assertEqual(read_body(data), DATA)
+            r = Response()
+            r.status_code = 201
+            r._content = b'{"id": 1}'
+            return r
+
+        with patch("requests.post", side_effect=post):
+            transfer = self.api.upload("http://test.com/f", memoryview(DATA))
+        self.assertEqual(transfer.data, {"id": 1})
+        self.assertEqual(transfer.nbytes, len(DATA))
+
+    def test_body_reader_file(self):
+        body = BodyReader([b"head", io.BytesIO(DATA), b"tail"])
+        self.assertEqual(len(body), len(DATA) + 8)
+        self.assertEqual(read_body(body), b"head" + DATA + b"tail")
+
+
+class TestModelFiles(BaseTestCase):
+    def test_upload_file(self):
+        document = Document("http://test.com")
+        document.id = 3
+
+        def patch_file(url, data=None, headers=None, **kargs):
+            self.assertEqual(url, "http://test.com/document/3?format=json")
+            self.assertTrue(headers["content-type"].startswith("multipart/form-data"))
+            body = read_body(data)
+            self.assertIn(b'name="file"; filename="report.pdf"', body)
+            self.assertIn(DATA, body)
+            r = Response()
+            r.status_code = 200
+            r._content = b'{"id": 3, "file": "http://test.com/media/report.pdf"}'
+            return r
+
+        with patch("requests.patch", side_effect=patch_file):
+            document.upload_file("file", io.BytesIO(DATA), filename="report.pdf")
+        self.assertEqual(document.file, "http://test.com/media/report.pdf")
+
+    def test_download_file(self):
+        document = Document("http://test.com")
+        with self.assertRaises(ModelConsumerException):
+            document.download_file("file", bytearray(10))
+
+        document.file = "http://test.com/media/report.pdf"
+        target = io.BytesIO()
+        with patch("requests.get", side_effect=file_response) as mock:
+            document.download_file("file", target)
+            self.assertEqual(mock.call_args.kwargs["url"], document.file)
+        self.assertEqual(target.getvalue(), DATA)
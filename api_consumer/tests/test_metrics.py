@@ -0,0 +1,106 @@
+from unittest.mock import patch
+
+from api_consumer.api import Api
+from api_consumer.events import AFTER_RESPONSE, BEFORE_REQUEST, ON_ERROR
+from api_consumer.exceptions import ApiConsumerException
+from api_consumer.metrics import Histogram, MetricsCollector
+
+from .base_test import BaseTestCase, make_response
+
+
+class TestHooks(BaseTestCase):
+    def test_hooks_called(self):
+        api = Api()
+        api.config("http://test.com")
+        events = []
+        api.add_hook(
+            BEFORE_REQUEST, lambda info: events.append(("before", info.status))
+        )
+        api.add_hook(AFTER_RESPONSE, lambda info: events.append(("after", info.status)))
+
+        with patch("requests.get") as mock:
+            mock.return_value = make_response()
+            api.get_instance("item", 1)
+
+        self.assertEqual(events, [("before", None), ("after", 200)])
+
+    def test_error_hook(self):
+        api = Api()
+        api.config("http://test.com")
+        errors = []
+        api.add_hook(ON_ERROR, errors.append)
+
+        with patch("requests.get") as mock:
+            mock.return_value = make_response(status_code=404)
+            with self.assertRaises(ApiConsumerException):
+                api.get_instance("item", 1)
+
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].item, "item")
+        self.assertEqual(errors[0].status, 404)
+
+    def test_failing_hook_ignored(self):
+        api = Api()
+        api.config("http://test.com")
+        api.add_hook(AFTER_RESPONSE, lambda info: 1 / 0)
+
+        with patch("requests.get") as mock:
+            mock.return_value = make_response()
+            self.assertDictEqual(api.get_instance("item", 1), {"id": 1})
+
+    def test_unknown_hook(self):
+        api = Api()
+        with self.assertRaises(ApiConsumerException):
+            api.add_hook("on_nothing", print)
+
+    def test_remove_hook(self):
+        api = Api()
+        api.add_hook(AFTER_RESPONSE, print)
+        api.remove_hook(AFTER_RESPONSE, print)
+        self.assertEqual(api._hooks[AFTER_RESPONSE], ())
+        self.assertDictEqual(Api._hooks, {})
+
+
+class TestMetrics(BaseTestCase):
+    def test_histogram(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 5):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [(0.1, 1), (1.0, 3)])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 6.25)
+
+    def test_collector_export(self):
+        api = Api()
+        api.config("http://test.com")
+        collector = MetricsCollector()
+        collector.install(api)
+
+        with patch("requests.get") as mock:
+            mock.return_value = make_response()
+            api.get_instance("user", 1)
+            api.get_instance("user", 2)
+            mock.return_value = make_response(status_code=500)
+            with self.assertRaises(ApiConsumerException):
+                api.get_instance("user", 3)
+
+        self.assertEqual(collector.latency[("user", "GET")].count, 3)
+        self.assertEqual(collector.bytes_in[("user", "GET")], 27)
+        self.assertEqual(collector.slowest(1)[0][:2], ("user", "GET"))
+        export = collector.export()
+        self.assertIn(
+            'api_consumer_request_duration_seconds_bucket{item="user",method="GET",le="+Inf"} 3',
+            export,
+        )
+        self.assertIn(
+            'api_consumer_requests_total{item="user",method="GET",status="200"} 2',
+            export,
+        )
+        self.assertIn(
+            'api_consumer_requests_total{item="user",method="GET",status="500"} 1',
+            export,
+        )
+        self.assertIn('api_consumer_errors_total{item="user",method="GET"} 1', export)
+
+        collector.reset()
+        self.assertDictEqual(collector.latency, {})
@@ -1,10 +1,14 @@
+import itertools
+import threading
 from unittest.mock import patch
+from urllib.parse import parse_qsl, urlsplit
 
 from requests import Response
 
+from api_consumer.exceptions import ApiConsumerException, ModelConsumerException
 from api_consumer.model import Model
 
-from .base_test import BaseTestCase
+from .base_test import BaseTestCase, make_response
 
 
 class User(Model):
@@ -36,6 +40,56 @@ class Foo(Model):
     """For testing only"""
 
 
+class LazyUser(User):
+    """For testing only"""
+
+    _lazy_hydration = True
+    age: int = 0
+
+
+class Order(Model):
+    """For testing only"""
+
+    _route = "customers/{customer_id}/orders"
+
+
+class Line(Model):
+    """For testing only"""
+
+    _route = "customers/{customer_id}/orders/{order_id}/lines"
+
+
+def nested_response(url, **kargs):
+    """For testing only, 2 children by parent with ids from the URL"""
+    segments = urlsplit(url).path.strip("/").split("/")
+    parent = int(segments[-2])
+    r = Response()
+    r.status_code = 200
+    r.json = lambda: {
+        "next": None,
+        "results": [{"id": parent * 10 + i} for i in range(2)],
+    }
+    return r
+
+
+class FakeCreate:
+    """For testing only, create items with increasing ids"""
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.payloads = []
+        self.lock = threading.Lock()
+
+    def post(self, url, **kargs):
+        with self.lock:
+            created = {"id": next(self.ids)}
+            self.payloads.append((urlsplit(url).path, kargs["json"]))
+        r = Response()
+        r.status_code = 201
+        r.json = lambda: created
+        return r
+
+
 class TestModel(BaseTestCase):
     def test_model_creation(self):
         user = User("http://test.com/api")
@@ -246,6 +300,31 @@ class TestModel(BaseTestCase):
         self.assertEqual(result, "group")
         Group._item = "group"
 
+    def test_define_item_given_to_instance(self):
+        user = User("http://test.com", "member")
+        self.assertEqual(user._define_item(), "member")
+        self.assertEqual(user._define_item(User), "member")
+        self.assertEqual(user._define_item(Group), "grouped")
+
+    def test_queries_use_item_given_to_instance(self):
+        user = User("http://test.com", "member")
+
+        with patch("requests.get") as mock:
+            mock.return_value = make_response(
+                {"count": 1, "next": None, "results": [{"id": 1}]}
+            )
+            results = user.from_query()
+            self.assertEqual(results[0]._item, "member")
+            list(user.iter_query())
+            user.count()
+            user.exists()
+            user.objects.filter(id=1).count()
+            for call in mock.call_args_list:
+                with self.subTest(call.kwargs["url"]):
+                    self.assertTrue(
+                        call.kwargs["url"].startswith("http://test.com/member/")
+                    )
+
     def test_from_query(self):
         user = User("http://test.com")
 
@@ -371,3 +450,382 @@ class TestModel(BaseTestCase):
         user.object_to_id("group")
         self.assertIsInstance(user.group, str)
         self.assertEqual(user.group, "abc-efg")
+
+    def test_is_up_to_date_without_data(self):
+        user = User("http://test.com")
+        user.from_json({"id": 123, "public": "public"})
+        self.assertTrue(user.is_up_to_date())
+        user.public = "modified"
+        self.assertFalse(user.is_up_to_date())
+        self.assertFalse(user.is_up_to_date({"id": 123, "public": "public"}))
+        self.assertTrue(user.is_up_to_date({"id": 123, "public": "modified"}))
+        user.from_json({"public": "modified"})
+        self.assertTrue(user.is_up_to_date())
+
+    def test_is_up_to_date_with_lists(self):
+        user = User("http://test.com")
+        group1 = Group("http://test.com")
+        group1.from_json({"id": 1})
+        group2 = Group("http://test.com")
+        group2.from_json({"id": 2})
+        user.from_json({"id": 123, "groups": [1, 2], "tags": {"a", "b"}})
+        self.assertTrue(user.is_up_to_date({"groups": [1, 2], "tags": ["b", "a"]}))
+        self.assertFalse(user.is_up_to_date({"groups": [2, 1]}))
+        self.assertFalse(user.is_up_to_date({"groups": [1]}))
+
+        user.groups = [group1, group2]
+        self.assertTrue(user.is_up_to_date({"groups": [1, 2]}))
+        self.assertFalse(user.is_up_to_date({"groups": [1, 3]}))
+        user.group = group1
+        self.assertTrue(user.is_up_to_date({"group": 1}))
+        self.assertTrue(user.is_up_to_date({"group": group1}))
+
+    def test_factory_list_skip_verification(self):
+        user = User("http://test.com")
+        with patch.object(User, "is_up_to_date") as mock:
+            user.factory_list([{"id": 1}, {"id": 2}])
+            mock.assert_not_called()
+
+    def test_is_up_to_date_restored_value(self):
+        user = User("http://test.com")
+        user.from_json({"id": 123, "public": "public"})
+        self.assertIsNone(user._snapshot)
+        user.public = "modified"
+        user.public = "public"
+        self.assertTrue(user.is_up_to_date())
+        user.other = "new attribute"
+        self.assertFalse(user.is_up_to_date())
+
+    def test_from_query_with_fields(self):
+        user = User("http://test.com")
+
+        with patch("requests.get") as mock:
+            r = Response()
+            r.status_code = 200
+            r.json = lambda: [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+            mock.return_value = r
+
+            results = user.from_query(model_class=User, fields=["name"])
+            self.assertIn("fields=id,name", mock.call_args.kwargs["url"])
+            self.assertEqual(results[0]._fields, frozenset(("id", "name")))
+
+    def test_partial_instance_lazy_load(self):
+        user = User("http://test.com")
+
+        with patch("requests.get") as mock:
+            r = Response()
+            r.status_code = 200
+            r.json = lambda: {"id": 1, "name": "a"}
+            mock.return_value = r
+            user.get(1, fields=["name"])
+            self.assertIn("fields=id,name", mock.call_args.kwargs["url"])
+
+            user.name = "changed"
+            r.json = lambda: {"id": 1, "name": "a", "email": "a@test.com"}
+            self.assertEqual(user.email, "a@test.com")
+            self.assertEqual(mock.call_count, 2)
+            self.assertIsNone(user._fields)
+            # local changes are kept
+            self.assertEqual(user.name, "changed")
+
+        with self.assertRaises(AttributeError):
+            user.unknown
+
+    def test_partial_instance_failed_load(self):
+        user = User("http://test.com")
+        user.from_json({"id": 1, "name": "a"})
+        user._fields = frozenset(("id", "name"))
+
+        with patch("requests.get") as mock:
+            mock.return_value = make_response(status_code=503)
+            for _ in range(2):
+                with self.assertRaises(ApiConsumerException):
+                    user.public
+            self.assertEqual(user._fields, frozenset(("id", "name")))
+
+            mock.return_value = make_response({"id": 1, "public": "loaded"})
+            self.assertEqual(user.public, "loaded")
+            self.assertEqual(mock.call_count, 3)
+        self.assertIsNone(user._fields)
+
+    def test_partial_instance_declared_field(self):
+        user = User("http://test.com")
+
+        with patch("requests.get") as mock:
+            r = Response()
+            r.status_code = 200
+            r.json = lambda: {"id": 1, "name": "a"}
+            mock.return_value = r
+            user.get(1, fields=["name"])
+            # not loaded and not sent by save
+            self.assertNotIn("public", user._build_dictionary())
+            self.assertEqual(mock.call_count, 1)
+
+            r.json = lambda: {"id": 1, "name": "a", "public": "loaded"}
+            self.assertEqual(user.public, "loaded")
+            self.assertEqual(mock.call_count, 2)
+
+            # the class default of complete instances
+            complete = User("http://test.com")
+            complete.get(1)
+            self.assertEqual(User("http://test.com").public, "public")
+        self.assertEqual(User.public, "public")
+
+    def test_partial_instance_save(self):
+        user = User("http://test.com")
+        user.from_json({"id": 1, "name": "a"})
+        user._fields = frozenset(("id", "name"))
+        user.email = "a@test.com"
+        self.assertDictEqual(
+            user._build_dictionary(), {"id": 1, "name": "a", "email": "a@test.com"}
+        )
+
+    def test_iter_query(self):
+        user = User("http://test.com")
+
+        with patch("requests.get") as mock:
+            r = Response()
+            r.status_code = 200
+            r.json = lambda: {
+                "next": "page2",
+                "results": [{"id": 1}, {"id": 2}],
+            }
+            mock.return_value = r
+
+            results = user.iter_query(limit=3)
+            self.assertEqual(mock.call_count, 0)
+            self.assertEqual([u.id for u in results], [1, 2, 1])
+            self.assertEqual(mock.call_count, 2)
+
+    def test_count(self):
+        user = User("http://test.com")
+
+        with patch("requests.get") as mock:
+            r = Response()
+            r.status_code = 200
+            r.json = lambda: {"count": 1234, "next": "page2", "results": [{"id": 1}]}
+            mock.return_value = r
+
+            with patch.object(User, "from_json") as from_json:
+                self.assertEqual(user.count(["is_active=true", "limit=50"]), 1234)
+                from_json.assert_not_called()
+            self.assertEqual(mock.call_count, 1)
+            self.assertTrue(
+                mock.call_args.kwargs["url"].endswith("&is_active=true&limit=1")
+            )
+
+    def test_count_without_drf_count(self):
+        user = User("http://test.com")
+
+        def get(url, **kargs):
+            query = dict(parse_qsl(urlsplit(url).query))
+            limit, offset = int(query.get("limit", 20)), int(query.get("offset", 0))
+            end = min(offset + limit, 50)
+            following = f"http://test.com/user/?limit={limit}&offset={end}"
+            return make_response(
+                {
+                    "next": following if end < 50 else None,
+                    "results": [{"id": i} for i in range(offset, end)],
+                }
+            )
+
+        with patch("requests.get", side_effect=get) as mock:
+            self.assertEqual(user.count(), 50)
+            # the single item page, then pages of the default size
+            self.assertEqual(mock.call_count, 4)
+
+            user._max_page_size = 1000
+            self.assertEqual(user.count(), 50)
+            self.assertEqual(mock.call_count, 6)
+            self.assertIn("limit=1000", mock.call_args.kwargs["url"])
+
+    def test_exists(self):
+        user = User("http://test.com")
+
+        with patch("requests.get") as mock:
+            r = Response()
+            r.status_code = 200
+            r.json = lambda: {"count": 0, "results": []}
+            mock.return_value = r
+            self.assertFalse(user.exists(["email=a@test.com"]))
+
+            r.json = lambda: {"count": 3, "results": [{"id": 1}]}
+            self.assertTrue(user.exists(["email=a@test.com"]))
+            self.assertIn("email=a@test.com&limit=1", mock.call_args.kwargs["url"])
+
+    def test_paginated_results_page_size(self):
+        user = User("http://test.com")
+        user._max_page_size = 100
+
+        with patch("requests.get") as mock:
+            r = Response()
+            r.status_code = 200
+            r.json = lambda: {
+                "next": "http://test.com/user/?format=json&limit=100&offset=100",
+                "results": [{"id": i} for i in range(100)],
+            }
+            mock.return_value = r
+
+            results = user._paginated_results("user", 150, ["is_active=true"])
+            self.assertEqual(len(results), 150)
+            urls = [call.kwargs["url"] for call in mock.call_args_list]
+            self.assertTrue(urls[0].endswith("&is_active=true&limit=100"))
+            # last page only asks the missing items
+            self.assertEqual(
+                urls[1], "http://test.com/user/?format=json&limit=50&offset=100"
+            )
+
+    def test_paginated_results_explicit_page_size(self):
+        user = User("http://test.com")
+        self.assertEqual(user._sized_options(3, ["limit=10"]), ["limit=10"])
+        self.assertEqual(user._sized_options(3, []), ["limit=3"])
+        self.assertEqual(user._sized_options(0, []), [])
+        user._page_size_param = ""
+        self.assertEqual(user._sized_options(3, []), [])
+
+    def test_nested_route(self):
+        order = Order("http://test.com").set_path(customer_id=3)
+        self.assertEqual(
+            order._gen_url("order", 5),
+            "http://test.com/customers/3/orders/5?format=json",
+        )
+        with self.assertRaises(ApiConsumerException):
+            Order("http://test.com")._gen_url("order")
+
+    def test_fetch_children(self):
+        customers = User("http://test.com").factory_list([{"id": i} for i in (1, 2, 3)])
+
+        with patch("requests.get", side_effect=nested_response) as mock:
+            pairs = dict(customers[0].fetch_children(customers, Order))
+            self.assertEqual(mock.call_count, 3)
+
+        self.assertEqual(
+            {parent.id: [o.id for o in orders] for parent, orders in pairs.items()},
+            {1: [10, 11], 2: [20, 21], 3: [30, 31]},
+        )
+        order = pairs[customers[1]][0]
+        self.assertIsInstance(order, Order)
+        self.assertEqual(order._path, {"customer_id": 2})
+        self.assertEqual(
+            order._gen_url("order", order.id),
+            "http://test.com/customers/2/orders/20?format=json",
+        )
+
+    def test_fetch_grandchildren(self):
+        orders = (
+            Order("http://test.com")
+            .set_path(customer_id=4)
+            .factory_list([{"id": 7}, {"id": 8}])
+        )
+
+        with patch("requests.get", side_effect=nested_response) as mock:
+            pairs = list(orders[0].fetch_children(orders, Line, limit=1))
+            urls = sorted(call.kwargs["url"] for call in mock.call_args_list)
+
+        self.assertEqual(len(pairs), 2)
+        self.assertTrue(all(len(lines) == 1 for _, lines in pairs))
+        self.assertEqual(
+            urls[0], "http://test.com/customers/4/orders/7/lines/?format=json&limit=1"
+        )
+
+    def test_fetch_children_without_route(self):
+        user = User("http://test.com")
+        with self.assertRaises(ModelConsumerException):
+            list(user.fetch_children([user], Foo))
+
+    def test_lazy_hydration(self):
+        user = LazyUser("http://test.com").factory(
+            {"id": "3", "age": "42", "name": "Alice", "tags": ["a"]}
+        )
+        # declared fields are converted at once, others on first access
+        self.assertEqual((user.id, user.age), (3, 42))
+        self.assertNotIn("name", user.__dict__)
+        self.assertEqual(user.name, "Alice")
+        self.assertIn("name", user.__dict__)
+        self.assertTrue(user.is_up_to_date())
+        with self.assertRaises(AttributeError):
+            user.missing
+
+    def test_lazy_hydration_changes(self):
+        user = LazyUser("http://test.com").factory({"id": 3, "name": "Alice"})
+        user.name = "Bob"
+        self.assertFalse(user.is_up_to_date())
+        user.name = "Alice"
+        self.assertTrue(user.is_up_to_date())
+
+        user.name = "Bob"
+        data = user._build_dictionary()
+        self.assertEqual((data["id"], data["name"]), (3, "Bob"))
+        self.assertIsNone(user._raw)
+
+    def test_save_cascade(self):
+        api = FakeCreate()
+        user = User("http://test.com")
+        group = Group("http://test.com")
+        foo = Foo("http://test.com")
+        foo.owner = user
+        foo.group = group
+        user.group = group
+        with patch("requests.post", side_effect=api.post):
+            foo.save(cascade=True)
+
+        self.assertEqual((group.id, foo.id), (1, 3))
+        created = dict(api.payloads)
+        self.assertEqual(created["/user/"]["group"], 1)
+        self.assertEqual(created["/foo/"]["owner"], user.id)
+
+    def test_save_cascade_concurrent_level(self):
+        api = FakeCreate()
+        foo = Foo("http://test.com")
+        for i in range(6):
+            setattr(foo, f"user_{i}", User("http://test.com"))
+        with patch("requests.post", side_effect=api.post):
+            foo.save(cascade=True)
+
+        self.assertEqual(api.payloads[-1][0], "/foo/")
+        payload = api.payloads[-1][1]
+        self.assertEqual(
+            sorted(payload[f"user_{i}"] for i in range(6)), list(range(1, 7))
+        )
+
+    def test_save_cascade_list(self):
+        api = FakeCreate()
+        foo = Foo("http://test.com")
+        foo.members = [User("http://test.com"), User("http://test.com"), 7]
+        with patch("requests.post", side_effect=api.post):
+            foo.save(cascade=True)
+
+        self.assertEqual(api.payloads[-1][0], "/foo/")
+        self.assertEqual(sorted(api.payloads[-1][1]["members"][:2]), [1, 2])
+        self.assertEqual(api.payloads[-1][1]["members"][2], 7)
+
+    def test_save_cascade_calls_overrides(self):
+        saved = []
+
+        class Member(User):
+            """For testing only"""
+
+            _item = "user"
+
+            def save(self, cascade=False):
+                saved.append(self)
+                return super().save(cascade)
+
+        api = FakeCreate()
+        foo = Foo("http://test.com")
+        foo.owner = Member("http://test.com")
+        foo.members = (Member("http://test.com"),)
+        with patch("requests.post", side_effect=api.post):
+            foo.save(cascade=True)
+        self.assertEqual(len(saved), 2)
+        self.assertEqual(len(api.payloads), 3)
+
+    def test_save_cascade_cycle(self):
+        foo = Foo("http://test.com")
+        user = User("http://test.com")
+        foo.owner = user
+        user.foo = foo
+        with patch("requests.post") as mock:
+            with self.assertRaises(ModelConsumerException):
+                foo.save(cascade=True)
+            mock.assert_not_called()
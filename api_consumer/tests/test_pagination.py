@@ -0,0 +1,134 @@
+from unittest.mock import patch
+
+from api_consumer.model import Model
+from api_consumer.pagination import (
+    CursorPaginator,
+    LinkHeaderPaginator,
+    NextLinkPaginator,
+    OffsetPaginator,
+    Page,
+    PageNumberPaginator,
+    PageSizeTuner,
+    resize_page_url,
+)
+
+from .base_test import BaseTestCase, make_response
+
+
+class TestPageSize(BaseTestCase):
+    def test_resize_offset_url(self):
+        url = "http://test.com/user/?format=json&limit=100&offset=200&ordering=a,-b"
+        self.assertEqual(
+            resize_page_url(url, "limit", "offset", 50),
+            "http://test.com/user/?format=json&limit=50&offset=200&ordering=a,-b",
+        )
+
+    def test_resize_page_number_url_unchanged(self):
+        url = "http://test.com/user/?format=json&page=3&page_size=100"
+        self.assertEqual(resize_page_url(url, "page_size", "offset", 50), url)
+
+    def test_tuner_grows_fast_pages(self):
+        tuner = PageSizeTuner(100, max_size=1000, target_seconds=1.0)
+        self.assertEqual(tuner.update(100, 0.1), 200)
+        self.assertEqual(tuner.update(200, 0.1), 400)
+        self.assertEqual(tuner.update(400, 0.1), 800)
+        self.assertEqual(tuner.update(800, 0.1), 1000)
+
+    def test_tuner_shrinks_slow_pages(self):
+        tuner = PageSizeTuner(400, target_seconds=1.0)
+        self.assertEqual(tuner.update(400, 2.0), 200)
+        self.assertEqual(tuner.update(200, 1.0), 200)
+        self.assertEqual(tuner.update(0, 1.0), 200)
+
+    def test_tuner_max_bytes(self):
+        tuner = PageSizeTuner(100, target_seconds=10, max_bytes=50_000)
+        self.assertEqual(tuner.update(100, 0.1, nbytes=100_000), 50)
+
+    def test_resize_only_smaller(self):
+        url = "http://test.com/user/?limit=10&offset=10"
+        self.assertEqual(resize_page_url(url, "limit", "offset", 1990, grow=False), url)
+        self.assertEqual(
+            resize_page_url(url, "limit", "offset", 5, grow=False),
+            "http://test.com/user/?limit=5&offset=10",
+        )
+
+
+class TestPaginators(BaseTestCase):
+    def test_next_link_custom_keys(self):
+        paginator = NextLinkPaginator(
+            results_key="data", next_key="after", count_key="total"
+        )
+        page = paginator.parse({"data": [1], "after": "url2", "total": 5}, None, "url1")
+        self.assertEqual(page, Page([1], "url2", "", 5))
+        self.assertEqual(paginator.parse([1, 2], None, "url1"), Page([1, 2]))
+
+    def test_cursor(self):
+        paginator = CursorPaginator()
+        page = paginator.parse(
+            {"results": [1], "next_cursor": "abc"},
+            None,
+            "http://t.com/i/?cursor=old&a=1",
+        )
+        self.assertEqual(page.next, "http://t.com/i/?a=1&cursor=abc")
+        self.assertEqual(paginator.parse({"results": [1]}, None, "url").next, "")
+        self.assertFalse(paginator.parallel)
+
+    def test_link_header(self):
+        r = make_response(
+            [1, 2],
+            headers={
+                "Link": '<http://t.com/i/?page=3>; rel="next", '
+                '<http://t.com/i/?page=1>; rel="prev"',
+                "X-Total-Count": "12",
+            },
+        )
+        page = LinkHeaderPaginator().parse(r.json(), r, "http://t.com/i/?page=2")
+        self.assertEqual(
+            page, Page([1, 2], "http://t.com/i/?page=3", "http://t.com/i/?page=1", 12)
+        )
+
+    def test_offset_plan(self):
+        paginator = OffsetPaginator()
+        self.assertEqual(
+            paginator.plan(["a=1", "limit=100", "offset=10"], 100, 300),
+            [["a=1", "limit=100", "offset=110"], ["a=1", "limit=90", "offset=210"]],
+        )
+        self.assertEqual(
+            paginator.plan([], 100, 1000, limit=150), [["limit=50", "offset=100"]]
+        )
+
+    def test_page_number_plan(self):
+        paginator = PageNumberPaginator()
+        self.assertEqual(
+            paginator.plan(["a=1"], 10, 35),
+            [
+                ["a=1", "page=2", "page_size=10"],
+                ["a=1", "page=3", "page_size=10"],
+                ["a=1", "page=4", "page_size=10"],
+            ],
+        )
+        self.assertEqual(
+            paginator.plan(["page=3"], 10, 35), [["page=4", "page_size=10"]]
+        )
+
+    def test_parallel_fetch(self):
+        user = Model("http://test.com", "user")
+        user.config("http://test.com", paginator=OffsetPaginator())
+
+        def get(url, **kargs):
+            offset = int(url.partition("offset=")[2] or 0)
+            return make_response(
+                {
+                    "count": 250,
+                    "next": f"http://test.com/user/?limit=100&offset={offset + 100}",
+                    "results": [
+                        {"id": i} for i in range(offset, min(offset + 100, 250))
+                    ],
+                }
+            )
+
+        with patch("requests.get", side_effect=get) as mock:
+            results = list(user.iter_query())
+            self.assertEqual(mock.call_count, 3)
+
+        self.assertEqual([u.id for u in results], list(range(250)))
@@ -0,0 +1,85 @@
+import io
+import threading
+from unittest.mock import patch
+
+from requests import Response
+
+from api_consumer.api import Api
+from api_consumer.exceptions import ModelConsumerException
+from api_consumer.model import Model
+
+from .base_test import BaseTestCase
+
+
+class User(Model):
+    """For testing only"""
+
+    public: str = "public"
+
+
+class Order(Model):
+    """For testing only"""
+
+
+class TestProfiling(BaseTestCase):
+    def test_profile_phases(self):
+        user = User("http://test.com")
+        output = io.StringIO()
+
+        with patch("requests.get") as mock:
+            r = Response()
+            r.status_code = 200
+            r.json = lambda: [{"id": 1, "public": "a"}, {"id": 2, "public": "b"}]
+            mock.return_value = r
+
+            with User.profile(output=output) as profiler:
+                user.from_query(model_class=User)
+
+        self.assertEqual(profiler.stats[("network", "User")][0], 1)
+        self.assertEqual(profiler.stats[("parse", "User")][0], 1)
+        # reentrant from_json inside factory is counted once
+        self.assertEqual(profiler.stats[("hydration", "User")][0], 2)
+        self.assertEqual(profiler.stats[("typing", "User")][0], 4)
+        report = output.getvalue()
+        self.assertIn("hydration", report)
+        self.assertIn("wall/call", report)
+
+    def test_profile_by_model_class(self):
+        user = User("http://test.com")
+
+        with patch("requests.get") as mock:
+            r = Response()
+            r.status_code = 200
+            r.json = lambda: [{"id": 1}, {"id": 2}]
+            mock.return_value = r
+
+            with User.profile(report=False) as profiler:
+                user.from_query(model_class=Order)
+
+        self.assertEqual(profiler.stats[("hydration", "Order")][0], 2)
+        self.assertNotIn(("hydration", "User"), profiler.stats)
+        self.assertEqual(profiler.stats[("network", "User")][0], 1)
+
+    def test_other_threads_ignored(self):
+        user = User("http://test.com")
+        with User.profile(report=False) as profiler:
+            thread = threading.Thread(target=user.from_json, args=({"id": 1},))
+            thread.start()
+            thread.join()
+            self.assertEqual(profiler.stats, {})
+            user.from_json({"id": 1})
+        self.assertEqual(profiler.stats[("hydration", "User")][0], 1)
+
+    def test_methods_restored(self):
+        send, from_json = Api._send, Model.from_json
+        with Model.profile(report=False):
+            self.assertIsNot(Api._send, send)
+            self.assertIsNot(Model.from_json, from_json)
+        self.assertIs(Api._send, send)
+        self.assertIs(Model.from_json, from_json)
+
+    def test_nested_profiling(self):
+        with Model.profile(report=False):
+            with self.assertRaises(ModelConsumerException):
+                with Model.profile(report=False):
+                    pass
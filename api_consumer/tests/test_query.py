@@ -0,0 +1,117 @@
+from unittest.mock import patch
+from urllib.parse import parse_qsl, urlsplit
+
+from api_consumer.exceptions import ModelConsumerException
+from api_consumer.model import Model
+from api_consumer.query import QuerySet
+
+from .base_test import BaseTestCase, make_response
+
+
+class Customer(Model):
+    """For testing only"""
+
+    _url = "http://test.com"
+
+
+class TestQuerySet(BaseTestCase):
+    def test_objects_from_class_and_instance(self):
+        self.assertIsInstance(Customer.objects, QuerySet)
+        self.assertEqual(Customer.objects._item, "customer")
+        customer = Customer("http://other.com")
+        self.assertEqual(customer.objects._model._url, "http://other.com")
+        self.assertIsNot(customer.objects._model, customer)
+
+    def test_lazy_and_cached(self):
+        query = Customer.objects.filter(name="a b", active=True, id__in=[1, 2])
+        query = query.order_by("-created", "name").only("name")[10:30]
+
+        with patch("requests.get") as mock:
+            mock.return_value = make_response({"results": [{"id": 1, "name": "a b"}]})
+            self.assertEqual(mock.call_count, 0)
+            self.assertEqual(len(query), 1)
+            list(query)
+            self.assertEqual(mock.call_count, 1)
+
+        url = mock.call_args.kwargs["url"]
+        self.assertEqual(
+            url,
+            "http://test.com/customer/?format=json&name=a%20b&active=true&id__in=1,2"
+            "&ordering=-created,name&offset=10&limit=20&fields=id,name",
+        )
+
+    def test_chained_slices(self):
+        query = Customer.objects[10:20][2:5]
+        self.assertEqual(query._offset, 12)
+        self.assertEqual(query._limit, 3)
+        self.assertEqual(Customer.objects[5:][:2]._limit, 2)
+        self.assertEqual(Customer.objects[:3][5:]._limit, 0)
+
+    def test_invalid_index(self):
+        with self.assertRaises(ModelConsumerException):
+            Customer.objects[-1]
+        with self.assertRaises(ModelConsumerException):
+            Customer.objects[::2]
+
+    def test_index(self):
+        with patch("requests.get") as mock:
+            mock.return_value = make_response({"results": [{"id": 8}]})
+            self.assertEqual(Customer.objects[7].id, 8)
+            self.assertIn("offset=7&limit=1", mock.call_args.kwargs["url"])
+
+            mock.return_value = make_response({"results": []})
+            with self.assertRaises(IndexError):
+                Customer.objects[100]
+
+    def test_count(self):
+        with patch("requests.get") as mock:
+            mock.return_value = make_response(
+                {"count": 42, "next": "page2", "results": [{"id": 1}]}
+            )
+            self.assertEqual(Customer.objects.filter(active=True).count(), 42)
+            self.assertEqual(mock.call_count, 1)
+            self.assertIn("active=true&limit=1", mock.call_args.kwargs["url"])
+            self.assertEqual(Customer.objects[40:].count(), 2)
+            self.assertEqual(Customer.objects[:10].count(), 10)
+
+    def test_sliced_count_without_drf_count(self):
+        def get(url, **kargs):
+            query = dict(parse_qsl(urlsplit(url).query))
+            limit, offset = int(query.get("limit", 20)), int(query.get("offset", 0))
+            end = min(offset + limit, 50)
+            following = f"http://test.com/customer/?limit={limit}&offset={end}"
+            return make_response(
+                {
+                    "next": following if end < 50 else None,
+                    "results": [{"id": i} for i in range(offset, end)],
+                }
+            )
+
+        with patch("requests.get", side_effect=get) as mock:
+            self.assertEqual(Customer.objects[10:].count(), 40)
+            self.assertEqual(Customer.objects[10:20].count(), 10)
+            calls = mock.call_count
+            self.assertEqual(Customer.objects[45:60].count(), 5)
+            # the single item request counts from the start
+            probe = mock.call_args_list[calls].kwargs["url"]
+            self.assertNotIn("offset=", probe)
+            self.assertTrue(probe.endswith("&limit=1"))
+
+    def test_count_not_paginated(self):
+        with patch("requests.get") as mock:
+            mock.return_value = make_response([{"id": 1}, {"id": 2}])
+            self.assertEqual(Customer.objects.count(), 2)
+
+    def test_exists_and_first(self):
+        with patch("requests.get") as mock:
+            mock.return_value = make_response({"results": []})
+            self.assertFalse(Customer.objects.exists())
+            self.assertIsNone(Customer.objects.first())
+            mock.return_value = make_response({"results": [{"id": 3}]})
+            self.assertTrue(Customer.objects.filter(id=3))
+            self.assertEqual(Customer.objects.first().id, 3)
+            self.assertIn("limit=1", mock.call_args.kwargs["url"])
+
+    def test_objects_not_in_payload(self):
+        customer = Customer("http://test.com")
+        self.assertNotIn("objects", customer._build_dictionary())
@@ -0,0 +1,146 @@
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+
+from requests import Response
+
+from api_consumer.model import Model
+from api_consumer.relations import Relation
+
+from .base_test import BaseTestCase
+
+
+class Customer(Model):
+    """For testing only"""
+
+    name: str = ""
+
+
+class Order(Model):
+    """For testing only"""
+
+    customer = Relation(Customer)
+    seller = Relation(Customer, field="seller_id", batch_param="")
+
+
+class LazyOrder(Order):
+    """For testing only"""
+
+    _lazy_hydration = True
+
+
+class Category(Model):
+    """For testing only"""
+
+    parent = Relation("self")
+
+
+class FakeApi:
+    """For testing only, customers list filtered by id__in and details"""
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, **kargs):
+        self.urls.append(url)
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        segments = [s for s in parts.path.split("/") if s]
+        r = Response()
+        r.status_code = 200
+        if segments[-1] == "customer":
+            ids = [int(i) for i in query["id__in"][0].split(",")]
+            results = [{"id": i, "name": f"customer {i}"} for i in ids]
+            r.json = lambda: {"next": None, "results": results}
+        elif segments[-1] in ("order", "lazyorder"):
+            results = [
+                {"id": i, "customer": i % 3 + 1, "seller_id": 9} for i in range(1, 7)
+            ]
+            r.json = lambda: {"next": None, "results": results}
+        else:
+            id_instance = int(segments[-1])
+            r.json = lambda: {"id": id_instance, "name": f"customer {id_instance}"}
+        return r
+
+
+class TestRelation(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.api = FakeApi()
+
+    def test_relation_from_id(self):
+        order = Order("http://test.com").factory({"id": 1, "customer": 4})
+        self.assertEqual(Order.customer.id_of(order), 4)
+
+        with patch("requests.get", side_effect=self.api.get):
+            customer = order.customer
+            self.assertIs(order.customer, customer)
+        self.assertEqual(self.api.urls, ["http://test.com/customer/4?format=json"])
+        self.assertEqual(customer.name, "customer 4")
+
+    def test_relation_from_nested_data_or_instance(self):
+        order = Order("http://test.com").factory(
+            {"id": 1, "customer": {"id": 5, "name": "nested"}}
+        )
+        self.assertEqual(order.customer.name, "nested")
+
+        customer = Customer("http://test.com").factory({"id": 6})
+        order.customer = customer
+        self.assertIs(order.customer, customer)
+        self.assertEqual(order._build_dictionary()["customer"], 6)
+        self.assertEqual(self.api.urls, [])
+
+    def test_batched_loading(self):
+        with patch("requests.get", side_effect=self.api.get):
+            orders = Order("http://test.com").from_query(model_class=Order)
+            self.assertEqual(orders[0].customer.name, "customer 2")
+            self.assertEqual([o.customer.id for o in orders], [2, 3, 1, 2, 3, 1])
+            self.assertIs(orders[0].customer, orders[3].customer)
+        # one list request for orders, one for all their customers
+        self.assertEqual(len(self.api.urls), 2)
+        self.assertIn("id__in=1%2C2%2C3", self.api.urls[1].replace(",", "%2C"))
+
+    def test_concurrent_loading(self):
+        with patch("requests.get", side_effect=self.api.get):
+            orders = list(Order("http://test.com").iter_query())
+            self.assertEqual(orders[0].seller.id, 9)
+            self.assertIs(orders[5].seller, orders[0].seller)
+        self.assertEqual(len(self.api.urls), 2)
+
+    def test_lazy_instances(self):
+        with patch("requests.get", side_effect=self.api.get):
+            orders = LazyOrder("http://test.com").from_query(model_class=LazyOrder)
+            self.assertEqual([o.customer.id for o in orders], [2, 3, 1, 2, 3, 1])
+        self.assertEqual(len(self.api.urls), 2)
+
+    def test_relation_not_loaded_by_payload_and_verify(self):
+        order = Order("http://test.com").factory({"id": 1, "customer": 4})
+        self.assertEqual(order._build_dictionary(), {"customer": 4, "id": 1})
+        self.assertTrue(order.is_up_to_date({"id": 1, "customer": {"id": 4}}))
+        self.assertEqual(self.api.urls, [])
+
+    def test_self_relation(self):
+        self.assertIs(Category.parent.model_class, Category)
+        category = Category("http://test.com").factory({"id": 2, "parent": None})
+        self.assertIsNone(category.parent)
+
+    def test_save_cascade_sets_relation_ids(self):
+        def post(url, **kargs):
+            self.api.urls.append(url)
+            r = Response()
+            r.status_code = 201
+            created = {**kargs["json"], "id": 40 + len(self.api.urls)}
+            r.json = lambda: created
+            return r
+
+        order = Order("http://test.com")
+        order.customer = Customer("http://test.com")
+        order.seller = Customer("http://test.com")
+        with patch("requests.post", side_effect=post) as mock:
+            order.save(cascade=True)
+            payload = mock.call_args.kwargs["json"]
+        self.assertEqual(len(self.api.urls), 3)
+        self.assertEqual(
+            {payload["customer"], payload["seller_id"]},
+            {order.customer.id, order.seller.id},
+        )
+        self.assertNotIn(0, (payload["customer"], payload["seller_id"]))
@@ -0,0 +1,132 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from api_consumer.api import Api
+from api_consumer.resolver import DNS_CACHE, DnsCache
+from api_consumer.transport import RequestsTransport
+
+from .base_test import BaseTestCase
+
+ADDRESS = (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.1", 80))
+
+
+class FakeResolver:
+    """For testing only, count lookups"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, host, port, *args):
+        self.calls += 1
+        if host == "unknown.test":
+            raise socket.gaierror("Name or service not known")
+        return [ADDRESS]
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """For testing only, record the client port of each request"""
+
+    protocol_version = "HTTP/1.1"
+
+    def respond(self, body: bytes):
+        with self.server.lock:
+            self.server.ports.append(self.client_address[1])
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        return body
+
+    def do_HEAD(self):
+        self.respond(b"")
+
+    def do_GET(self):
+        self.wfile.write(self.respond(b'{"id": 1}'))
+
+    def log_message(self, *args):
+        pass
+
+
+class TestDnsCache(BaseTestCase):
+    def test_cached_until_ttl(self):
+        resolver = FakeResolver()
+        cache = DnsCache(ttl=10, resolver=resolver)
+        with patch("time.monotonic", return_value=100.0):
+            self.assertEqual(cache.resolve("api.test", 80), [("10.0.0.1", 80)])
+            cache.resolve("api.test", 80)
+        self.assertEqual(resolver.calls, 1)
+        with patch("time.monotonic", return_value=111.0):
+            cache.resolve("api.test", 80)
+        self.assertEqual(resolver.calls, 2)
+
+    def test_failure_not_cached(self):
+        resolver = FakeResolver()
+        cache = DnsCache(resolver=resolver)
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                cache.resolve("unknown.test", 80)
+        self.assertEqual(resolver.calls, 2)
+
+    def test_max_entries(self):
+        cache = DnsCache(max_entries=2, resolver=FakeResolver())
+        for host in ("a.test", "b.test", "c.test"):
+            cache.resolve(host, 80)
+        self.assertEqual([key[0] for key in cache._entries], ["b.test", "c.test"])
+
+    def test_install(self):
+        original = socket.getaddrinfo
+        cache = DnsCache(resolver=FakeResolver()).install()
+        try:
+            self.assertTrue(cache.installed)
+            self.assertEqual(socket.getaddrinfo("api.test", 80), [ADDRESS])
+        finally:
+            cache.uninstall()
+        self.assertIs(socket.getaddrinfo, original)
+        self.assertFalse(cache.installed)
+
+
+class TestWarmup(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.ports = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.api = Api()
+        url = f"http://127.0.0.1:{self.server.server_port}"
+        self.api.config(url, transport=RequestsTransport())
+
+    def tearDown(self):
+        self.api._transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+        DNS_CACHE.uninstall()
+        DNS_CACHE.clear()
+        super().tearDown()
+
+    def test_connections_opened_and_reused(self):
+        self.assertEqual(self.api.warmup(4, dns_ttl=300), 4)
+        self.assertEqual(len(set(self.server.ports)), 4)
+        self.assertTrue(DNS_CACHE.installed)
+        self.assertIn("127.0.0.1", [key[0] for key in DNS_CACHE._entries])
+        for _ in range(8):
+            self.api.get_instance("user", 1)
+        # every request sent on a warm connection
+        self.assertEqual(len(set(self.server.ports)), 4)
+
+    def test_without_dns_cache(self):
+        self.assertEqual(self.api.warmup(2), 2)
+        self.assertFalse(DNS_CACHE.installed)
+
+    def test_no_connection(self):
+        self.assertEqual(self.api.warmup(0), 0)
+        self.assertEqual(self.api._transport.warmup(self.api._url, 0), 0)
+        self.assertEqual(self.server.ports, [])
+
+    def test_host_down(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertEqual(self.api.warmup(2, timeout=1), 0)
@@ -0,0 +1,150 @@
+import gc
+import io
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from requests import Response
+
+from api_consumer.api import Api
+from api_consumer.scheduler import BULK, INTERACTIVE, RequestScheduler
+
+from .base_test import BaseTestCase, wait_for
+
+
+class ScheduledApi(Api):
+    """For testing only"""
+
+
+class TestRequestScheduler(BaseTestCase):
+    def queue(self, scheduler, order, name, priority=INTERACTIVE, caller=None):
+        """Start a thread waiting for a slot of host, wait until it is queued"""
+        depth = scheduler.stats()["host"]["queued"]
+
+        def run():
+            scheduler.acquire("host", priority, caller)
+            order.append(name)
+            scheduler.release("host")
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.assertTrue(wait_for(lambda: scheduler.stats()["host"]["queued"] > depth))
+        return thread
+
+    def test_max_per_host(self):
+        scheduler = RequestScheduler(max_per_host=2, limits={"slow": 1})
+        lock = threading.Lock()
+        running = {"now": 0, "max": 0}
+
+        def run(host):
+            scheduler.acquire(host)
+            with lock:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+            time.sleep(0.01)
+            with lock:
+                running["now"] -= 1
+            scheduler.release(host)
+
+        threads = [threading.Thread(target=run, args=("fast",)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(running["max"], 2)
+        stats = scheduler.stats()["fast"]
+        self.assertEqual((stats["active"], stats["queued"], stats["waits"]), (0, 0, 6))
+        self.assertGreater(stats["max_queued"], 0)
+        self.assertEqual(scheduler._queue("slow").limit, 1)
+
+    def test_priority(self):
+        scheduler = RequestScheduler(max_per_host=1)
+        scheduler.acquire("host")
+        order = []
+        threads = [
+            self.queue(scheduler, order, "bulk 1", BULK),
+            self.queue(scheduler, order, "bulk 2", BULK),
+            self.queue(scheduler, order, "interactive", INTERACTIVE),
+        ]
+        scheduler.release("host")
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ["interactive", "bulk 1", "bulk 2"])
+
+    def test_fair_between_callers(self):
+        scheduler = RequestScheduler(max_per_host=1)
+        scheduler.acquire("host")
+        order = []
+        threads = [self.queue(scheduler, order, f"a{i}", caller="a") for i in range(3)]
+        threads.append(self.queue(scheduler, order, "b0", caller="b"))
+        scheduler.release("host")
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ["a0", "b0", "a1", "a2"])
+
+
+class TestApiScheduler(BaseTestCase):
+    def tearDown(self):
+        ScheduledApi.use_scheduler(None)
+        super().tearDown()
+
+    def test_requests_scheduled(self):
+        scheduler = RequestScheduler()
+        ScheduledApi.use_scheduler(scheduler)
+        api = ScheduledApi()
+        api.config("http://test.com")
+        r = Response()
+        r.status_code = 200
+        r.json = lambda: {"id": 1, "next": None, "results": []}
+
+        with (
+            patch("requests.get", return_value=r),
+            patch.object(scheduler, "acquire", wraps=scheduler.acquire) as acquire,
+        ):
+            api.get_instance("user", 1)
+            api.get_list("user")
+            # parallel pages and background refreshes
+            api._get_pool().submit(api.get_list, "user").result()
+            api.get_list("user", priority=BULK)
+        priorities = [call.args[1] for call in acquire.call_args_list]
+        self.assertEqual(priorities, [INTERACTIVE, INTERACTIVE, BULK, BULK])
+        self.assertEqual(scheduler.stats()["test.com"]["waits"], 4)
+        self.assertIsNone(Api._scheduler)
+
+    def test_streamed_response_keeps_slot(self):
+        scheduler = RequestScheduler(max_per_host=1)
+        ScheduledApi.use_scheduler(scheduler)
+        api = ScheduledApi()
+        api.config("http://test.com")
+
+        def get(url, **kargs):
+            r = Response()
+            r.status_code = 200
+            r.raw = io.BytesIO(b"data")
+            return r
+
+        with patch("requests.get", side_effect=get):
+            response = api._send("get", "file", "http://test.com/f", stream=True)
+            self.assertEqual(scheduler.stats()["test.com"]["active"], 1)
+            response.close()
+            response.close()
+            self.assertEqual(scheduler.stats()["test.com"]["active"], 0)
+
+            # released when an unclosed response is collected
+            api._send("get", "file", "http://test.com/f", stream=True)
+            gc.collect()
+            self.assertEqual(scheduler.stats()["test.com"]["active"], 0)
+
+    def test_queued_time_in_hooks(self):
+        ScheduledApi.use_scheduler(RequestScheduler())
+        api = ScheduledApi()
+        api.config("http://test.com")
+        infos = []
+        api.add_hook("after_response", infos.append)
+        r = Response()
+        r.status_code = 200
+        r._content = b'{"id": 1}'
+        r.request = MagicMock(method="GET", body=None)
+        with patch("requests.get", return_value=r):
+            api.get_instance("user", 1)
+        self.assertEqual(infos[0].queued, 0.0)
@@ -0,0 +1,51 @@
+import os
+import subprocess  # nosec
+import sys
+from pathlib import Path
+
+from api_consumer.model import Model
+
+from .base_test import BaseTestCase
+
+ROOT = Path(__file__).resolve().parents[2]
+# modules imported by the first request or the first use of a feature only
+DEFERRED = ("requests", "urllib3", "asyncio", "inspect", "sqlite3", "uuid")
+# cumulative import time of api_consumer.model, in milliseconds
+BUDGET = float(os.environ.get("API_CONSUMER_IMPORT_BUDGET_MS", 150))
+
+
+def import_times(module: str) -> dict:
+    """Cumulative import time in microseconds by module, from -X importtime"""
+    result = subprocess.run(  # nosec
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class Sample(Model):
+    """For testing only"""
+
+    _item = "samples"
+
+
+class TestStartup(BaseTestCase):
+    def test_import_is_cheap(self):
+        times = import_times("api_consumer.model")
+        imported = [name for name in DEFERRED if name in times]
+        self.assertEqual(imported, [])
+        self.assertLess(times["api_consumer.model"] / 1000, BUDGET)
+
+    def test_instances_do_not_change_their_class(self):
+        self.assertEqual(Sample("http://test.com")._item, "samples")
+        other = Sample("http://test.com", "other")
+        self.assertEqual((other._item, Sample._item), ("other", "samples"))
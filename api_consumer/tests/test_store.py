@@ -0,0 +1,195 @@
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+
+from requests import Response
+
+from api_consumer.exceptions import ModelConsumerException
+from api_consumer.model import Model
+from api_consumer.store import SQLiteStore
+
+from .base_test import BaseTestCase
+
+
+class Product(Model):
+    """For testing only"""
+
+
+class FakeApi:
+    """For testing only, list and detail endpoints of products"""
+
+    def __init__(self):
+        self.rows = [
+            {"id": i, "name": f"product {i}", "price": i * 10, "color": c}
+            for i, c in zip(range(1, 6), ("blue", "red", "blue", "green", "red"))
+        ]
+        self.urls = []
+
+    def get(self, url, **kargs):
+        self.urls.append(url)
+        parts = urlsplit(url)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        r = Response()
+        r.status_code = 200
+        segments = [s for s in parts.path.split("/") if s]
+        if segments[-1] != "product":
+            row = next(r for r in self.rows if str(r["id"]) == segments[-1])
+            r.json = lambda: row
+            return r
+        results = [
+            row
+            for row in self.rows
+            if "color" not in query or row["color"] == query["color"]
+        ]
+        r.json = lambda: {"count": len(results), "next": None, "results": results}
+        return r
+
+    def patch(self, url, json=None, **kargs):
+        row = next(r for r in self.rows if r["id"] == json["id"])
+        row.update(json)
+        r = Response()
+        r.status_code = 200
+        r.json = lambda: dict(row)
+        return r
+
+    def delete(self, url, **kargs):
+        self.rows = [r for r in self.rows if f"/product/{r['id']}" not in url]
+        r = Response()
+        r.status_code = 204
+        return r
+
+
+class TestSQLiteStore(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = SQLiteStore()
+        self.store.upsert("product", FakeApi().rows)
+
+    def tearDown(self):
+        self.store.close()
+        super().tearDown()
+
+    def ids(self, rows):
+        return [row["id"] for row in rows]
+
+    def test_filter_lookups(self):
+        self.assertEqual(
+            self.ids(self.store.filter("product", {"color": "blue"})), [1, 3]
+        )
+        self.assertEqual(
+            self.ids(self.store.filter("product", {"price__gte": 30})), [3, 4, 5]
+        )
+        self.assertEqual(
+            self.ids(
+                self.store.filter("product", {"price__lt": 40, "color__in": ["red"]})
+            ),
+            [2],
+        )
+
+    def test_filter_ordering_and_slice(self):
+        rows = self.store.filter(
+            "product", ordering=["-color", "price"], offset=1, limit=2
+        )
+        self.assertEqual(self.ids(rows), [5, 4])
+
+    def test_index(self):
+        self.store.index("product", "color", "price")
+        plan = self.store._db.execute(
+            "EXPLAIN QUERY PLAN SELECT data FROM records_product "
+            "WHERE json_extract(data, '$.color') = 'blue'"
+        ).fetchall()
+        self.assertIn("index_product_color", str(plan))
+
+    def test_invalid_lookups(self):
+        self.assertTrue(self.store.supports("price__gte"))
+        self.assertFalse(self.store.supports("name__icontains"))
+        with self.assertRaises(ModelConsumerException):
+            self.store.filter("product", {"name__icontains": "product"})
+        with self.assertRaises(ModelConsumerException):
+            self.store.filter("product", {"data') OR 1=1 --": 1})
+
+
+class TestReplica(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.api = FakeApi()
+        self.store = SQLiteStore()
+        Product.use_replica(self.store, indexes=("color",))
+        self.product = Product("http://test.com")
+
+    def tearDown(self):
+        Product.use_replica(None)
+        self.store.close()
+        super().tearDown()
+
+    def test_from_query_fills_the_replica(self):
+        with patch("requests.get", side_effect=self.api.get):
+            self.product.from_query(model_class=Product)
+        self.assertEqual(self.store.count("product"), 5)
+
+    def test_projection_is_not_replicated(self):
+        with patch("requests.get", side_effect=self.api.get):
+            self.product.from_query(model_class=Product, fields=["name"])
+        self.assertEqual(self.store.count("product"), 0)
+
+    def test_get_reads_the_replica_first(self):
+        with patch("requests.get", side_effect=self.api.get):
+            self.product.get(2)
+            self.assertEqual(len(self.api.urls), 1)
+            product = Product("http://test.com")
+            product.get(2)
+        self.assertEqual(len(self.api.urls), 1)
+        self.assertEqual(product.name, "product 2")
+
+    def test_queryset_answered_locally(self):
+        with patch("requests.get", side_effect=self.api.get):
+            list(Product.objects)
+            products = list(Product.objects.filter(color="red").order_by("-price"))
+            self.assertEqual([p.id for p in products], [5, 2])
+            self.assertEqual(len(self.api.urls), 1)
+
+            list(Product.objects.filter(color="red").remote())
+            list(Product.objects.filter(name__icontains="product"))
+        self.assertEqual(len(self.api.urls), 3)
+
+    def test_queryset_miss_falls_back_to_the_api(self):
+        with patch("requests.get", side_effect=self.api.get):
+            products = list(Product.objects.filter(color="green"))
+        self.assertEqual([p.id for p in products], [4])
+        self.assertEqual(len(self.api.urls), 1)
+        self.assertEqual(self.store.count("product"), 1)
+
+    def test_partial_replica_asks_the_api(self):
+        with patch("requests.get", side_effect=self.api.get):
+            self.product.get(2)
+            query = Product.objects.filter(color="red")
+            self.assertEqual([p.id for p in query], [2, 5])
+            self.assertEqual(query.count(), 2)
+        self.assertEqual(len(self.api.urls), 2)
+        self.assertFalse(self.store.is_complete("product"))
+
+    def test_complete_replica_answers_count_and_exists(self):
+        with patch("requests.get", side_effect=self.api.get):
+            list(Product.objects)
+            self.assertTrue(self.store.is_complete("product"))
+            self.assertEqual(Product.objects.filter(color="red").count(), 2)
+            self.assertTrue(Product.objects.filter(price__gte=50).exists())
+            self.assertEqual(list(Product.objects.filter(color="purple")), [])
+            self.assertFalse(Product.objects.filter(color="purple").exists())
+        self.assertEqual(len(self.api.urls), 1)
+
+    def test_writes_update_the_replica(self):
+        with (
+            patch("requests.get", side_effect=self.api.get),
+            patch("requests.patch", side_effect=self.api.patch),
+            patch("requests.delete", side_effect=self.api.delete),
+        ):
+            self.product.get(1)
+            self.product.name = "renamed"
+            self.product.save()
+            product = Product("http://test.com")
+            product.get(1)
+            self.assertEqual(product.name, "renamed")
+            self.assertEqual(len(self.api.urls), 1)
+
+            product.delete()
+        self.assertIsNone(self.store.get("product", 1))
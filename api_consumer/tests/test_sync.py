@@ -0,0 +1,94 @@
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+
+from requests import Response
+
+from api_consumer.model import Model
+from api_consumer.store import SQLiteStore
+
+from .base_test import BaseTestCase
+
+
+class Article(Model):
+    """For testing only"""
+
+
+class FakeApi:
+    """For testing only, list endpoints filtered by modified__gte"""
+
+    def __init__(self):
+        self.rows = {i: {"id": i, "modified": f"2023-01-0{i}"} for i in range(1, 4)}
+        self.deleted = []
+        self.urls = []
+
+    def get(self, url, **kargs):
+        self.urls.append(url)
+        parts = urlsplit(url)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        if "tombstone" in parts.path:
+            results = [{"id": i} for i in self.deleted]
+        else:
+            since = query.get("modified__gte", "")
+            results = sorted(
+                (r for r in self.rows.values() if r["modified"] >= since),
+                key=lambda r: r["modified"],
+            )
+        r = Response()
+        r.status_code = 200
+        r.json = lambda: {"count": len(results), "next": None, "results": results}
+        return r
+
+
+class TestSync(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.api = FakeApi()
+        self.store = SQLiteStore()
+        self.article = Article("http://test.com")
+
+    def tearDown(self):
+        self.store.close()
+        super().tearDown()
+
+    def test_incremental_sync(self):
+        with patch("requests.get", side_effect=self.api.get):
+            result = self.article.sync(self.store)
+            self.assertEqual(result.fetched, 3)
+            self.assertTrue(result.full)
+            self.assertEqual(result.high_water, "2023-01-03")
+            self.assertEqual(self.store.count("article"), 3)
+            self.assertTrue(self.store.is_complete("article"))
+
+            self.api.rows[2] = {"id": 2, "modified": "2023-01-05", "title": "new"}
+            self.api.rows[4] = {"id": 4, "modified": "2023-01-04"}
+            result = self.article.sync(self.store)
+
+        self.assertFalse(result.full)
+        self.assertIn("ordering=modified&modified__gte=2023-01-03", self.api.urls[-1])
+        # boundary row 3 fetched again, 2 and 4 changed
+        self.assertEqual(result.fetched, 3)
+        self.assertEqual(result.high_water, "2023-01-05")
+        self.assertEqual(self.store.count("article"), 4)
+        self.assertEqual(self.store.get("article", 2)["title"], "new")
+
+    def test_tombstones(self):
+        with patch("requests.get", side_effect=self.api.get):
+            self.article.sync(self.store, tombstone_item="tombstone")
+            del self.api.rows[1]
+            self.api.deleted.append(1)
+            result = self.article.sync(self.store, tombstone_item="tombstone")
+
+        self.assertEqual(result.deleted, 1)
+        self.assertIsNone(self.store.get("article", 1))
+        self.assertEqual(self.store.count("article"), 2)
+
+    def test_full_reconciliation(self):
+        with patch("requests.get", side_effect=self.api.get):
+            self.article.sync(self.store)
+            del self.api.rows[1]
+            self.assertEqual(self.article.sync(self.store).deleted, 0)
+            result = self.article.sync(self.store, reconcile_every=0.000001)
+
+        self.assertTrue(result.full)
+        self.assertEqual(result.deleted, 1)
+        self.assertEqual([r["id"] for r in self.store.all("article")], [2, 3])
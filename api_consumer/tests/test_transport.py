@@ -0,0 +1,119 @@
+import io
+import os
+import tempfile
+import time
+from unittest.mock import MagicMock
+
+from requests import Response
+
+from api_consumer.api import Api
+from api_consumer.exceptions import ApiConsumerException
+from api_consumer.transport import RecordingTransport, ReplayTransport, Transport
+
+from .base_test import BaseTestCase
+
+DATA = bytes(range(256)) * 40
+
+
+class FakeTransport(Transport):
+    """For testing only"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def request(self, method, url, **kargs):
+        self.calls += 1
+        r = Response()
+        r.status_code = 201 if method == "post" else 200
+        r.headers["content-type"] = "application/json"
+        r._content = f'{{"id": {self.calls}, "url": "{url}"}}'.encode()
+        r.request = MagicMock()
+        r.request.method = method
+        return r
+
+
+class FileTransport(Transport):
+    """For testing only, stream DATA"""
+
+    def request(self, method, url, **kargs):
+        r = Response()
+        r.status_code = 200
+        r.headers["content-length"] = str(len(DATA))
+        r.raw = io.BytesIO(DATA)
+        return r
+
+
+class TestTransport(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+        super().tearDown()
+
+    def test_api_use_configured_transport(self):
+        transport = FakeTransport()
+        api = Api()
+        api.config("http://test.com", transport=transport)
+        result = api.get_instance("item", 1)
+        self.assertEqual(transport.calls, 1)
+        self.assertDictEqual(
+            result, {"id": 1, "url": "http://test.com/item/1?format=json"}
+        )
+
+    def test_record_and_replay(self):
+        fake = FakeTransport()
+        api = Api()
+        with RecordingTransport(self.path, fake) as recorder:
+            api.config("http://test.com", transport=recorder)
+            first = api.get_instance("item", 1)
+            second = api.get_instance("item", 1)
+            api.post_instance("item", payload={"name": "a"})
+
+        with ReplayTransport(self.path) as replay:
+            self.assertEqual(len(replay), 3)
+            api.config("http://test.com", transport=replay)
+            self.assertDictEqual(api.get_instance("item", 1), first)
+            self.assertDictEqual(api.get_instance("item", 1), second)
+            # last recorded response is repeated
+            self.assertDictEqual(api.get_instance("item", 1), second)
+            self.assertEqual(api.post_instance("item", payload={"name": "a"})["id"], 3)
+        self.assertEqual(fake.calls, 3)
+
+    def test_replay_unknown_request(self):
+        with RecordingTransport(self.path, FakeTransport()) as recorder:
+            recorder.request("get", "http://test.com/a")
+
+        with ReplayTransport(self.path) as replay:
+            with self.assertRaises(ApiConsumerException):
+                replay.request("get", "http://test.com/b")
+            with self.assertRaises(ApiConsumerException):
+                replay.request("post", "http://test.com/a", json={"id": 1})
+
+    def test_replay_latency(self):
+        with RecordingTransport(self.path, FakeTransport()) as recorder:
+            recorder.request("get", "http://test.com/a")
+
+        with ReplayTransport(self.path, latency=0.05) as replay:
+            start = time.perf_counter()
+            r = replay.request("get", "http://test.com/a")
+            self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(r.headers["Content-Type"], "application/json")
+
+    def test_record_and_replay_streamed(self):
+        api = Api()
+        with RecordingTransport(self.path, FileTransport()) as recorder:
+            api.config("http://test.com", transport=recorder)
+            target = io.BytesIO()
+            api.download("http://test.com/f", target, chunk_size=1000)
+            self.assertEqual(target.getvalue(), DATA)
+
+        with ReplayTransport(self.path) as replay:
+            api.config("http://test.com", transport=replay)
+            buffer = bytearray(len(DATA))
+            transfer = api.download("http://test.com/f", buffer, chunk_size=1000)
+            self.assertEqual(bytes(buffer), DATA)
+            self.assertEqual(transfer.size, len(DATA))
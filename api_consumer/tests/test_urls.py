@@ -0,0 +1,73 @@
+from api_consumer.api import Api
+from api_consumer.exceptions import ApiConsumerException
+from api_consumer.urls import UrlBuilder
+
+from .base_test import BaseTestCase
+
+
+class TestUrlBuilder(BaseTestCase):
+    def test_default_format(self):
+        urls = UrlBuilder("http://test.com/")
+        self.assertEqual(urls.collection("user"), "http://test.com/user/?format=json")
+        self.assertEqual(
+            urls.instance("user", 5, ["limit=15"]),
+            "http://test.com/user/5?format=json&limit=15",
+        )
+
+    def test_trailing_slash(self):
+        self.assertEqual(
+            UrlBuilder("http://test.com", trailing_slash=True).instance("user", 5),
+            "http://test.com/user/5/?format=json",
+        )
+        urls = UrlBuilder("http://test.com", output="", trailing_slash=False)
+        self.assertEqual(urls.collection("user"), "http://test.com/user")
+        self.assertEqual(urls.instance("user", 5), "http://test.com/user/5")
+
+    def test_params_are_escaped(self):
+        urls = UrlBuilder("http://test.com")
+        self.assertEqual(
+            urls.instance("user", "a b/c", params={"q": "x&y", "id__in": [1, 2]}),
+            "http://test.com/user/a%20b%2Fc?format=json&q=x%26y&id__in=1&id__in=2",
+        )
+
+    def test_nested_template(self):
+        urls = UrlBuilder(
+            "http://test.com", templates={"order": "customers/{customer_id}/orders"}
+        )
+        self.assertEqual(
+            urls.collection("order", path={"customer_id": 3}),
+            "http://test.com/customers/3/orders/?format=json",
+        )
+        with self.assertRaises(ApiConsumerException):
+            urls.collection("order")
+
+    def test_instance_urls(self):
+        urls = UrlBuilder("http://test.com")
+        self.assertEqual(
+            urls.instance_urls("user", [1, "x"], ["fields=id"]),
+            [
+                "http://test.com/user/1?format=json&fields=id",
+                "http://test.com/user/x?format=json&fields=id",
+            ],
+        )
+
+    def test_shared(self):
+        self.assertIs(
+            UrlBuilder.shared("http://a.com"), UrlBuilder.shared("http://a.com")
+        )
+        self.assertIsNot(
+            UrlBuilder.shared("http://a.com"),
+            UrlBuilder.shared("http://a.com", trailing_slash=True),
+        )
+
+    def test_api_gen_url(self):
+        api = Api()
+        api.config("http://test.com")
+        self.assertEqual(
+            api._gen_url("user", 5, ["limit=15"]),
+            "http://test.com/user/5?format=json&limit=15",
+        )
+        api._trailing_slash = True
+        api.config("http://test.com")
+        self.assertEqual(api._gen_url("user"), "http://test.com/user/?format=json")
+        self.assertEqual(api._gen_url("user", 5), "http://test.com/user/5/?format=json")
@@ -0,0 +1,219 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from requests import ConnectionError, Response
+
+from api_consumer.model import Model
+from api_consumer.writeback import WriteBehind
+
+from .base_test import BaseTestCase
+
+
+class Counter(Model):
+    """For testing only"""
+
+    score: int = 0
+    label: str = ""
+
+
+class Tagged(Model):
+    """For testing only"""
+
+    tags: list = []
+
+
+class FakePatch:
+    """For testing only, echo patched fields, fail for ids in failing"""
+
+    def __init__(self, failing=()):
+        self.calls = []
+        self.failing = set(failing)
+        self.lock = threading.Lock()
+
+    def patch(self, url, **kargs):
+        with self.lock:
+            self.calls.append((url, kargs["json"]))
+        r = Response()
+        instance_id = int(url.split("?")[0].rstrip("/").split("/")[-1])
+        if instance_id in self.failing:
+            r.status_code = 503
+            r._content = b""
+            r.request = MagicMock(method="PATCH")
+            return r
+        r.status_code = 200
+        r.json = lambda: {"id": instance_id, **kargs["json"]}
+        return r
+
+
+def make_counter(instance_id: int) -> Counter:
+    return Counter("http://test.com").factory({"id": instance_id, "score": 0})
+
+
+class TestWriteBehind(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.api = FakePatch()
+
+    def tearDown(self):
+        Counter.use_write_behind(None)
+        super().tearDown()
+
+    def test_changes_are_merged(self):
+        buffer = WriteBehind(interval=None)
+        Counter.use_write_behind(buffer)
+        counter = make_counter(1)
+        with patch("requests.patch", side_effect=self.api.patch):
+            for i in range(10):
+                counter.score = i
+                counter.save()
+            counter.label = "done"
+            self.assertEqual(counter.save(), {"score": 9, "label": "done"})
+            self.assertEqual(len(buffer), 1)
+            self.assertEqual(self.api.calls, [])
+
+            self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(len(self.api.calls), 1)
+        self.assertEqual(self.api.calls[0][1], {"score": 9, "label": "done", "id": 1})
+        self.assertTrue(counter.is_up_to_date())
+        self.assertEqual(len(buffer), 0)
+
+    def test_copies_of_the_same_item_are_merged(self):
+        buffer = WriteBehind(interval=None)
+        Counter.use_write_behind(buffer)
+        first, second = make_counter(1), make_counter(1)
+        first.score = 1
+        first.save()
+        second.label = "copy"
+        second.save()
+        with patch("requests.patch", side_effect=self.api.patch):
+            buffer.flush()
+        self.assertEqual(self.api.calls[0][1], {"score": 1, "label": "copy", "id": 1})
+
+    def test_size_threshold_and_concurrent_flush(self):
+        buffer = WriteBehind(interval=None, max_pending=5)
+        Counter.use_write_behind(buffer)
+        with patch("requests.patch", side_effect=self.api.patch):
+            for i in range(1, 6):
+                counter = make_counter(i)
+                counter.score = i
+                counter.save()
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(
+            sorted(payload["score"] for _, payload in self.api.calls), [1, 2, 3, 4, 5]
+        )
+
+    def test_timer_and_context_exit(self):
+        with patch("requests.patch", side_effect=self.api.patch):
+            with WriteBehind(interval=0.01) as buffer:
+                Counter.use_write_behind(buffer)
+                counter = make_counter(1)
+                counter.score = 1
+                counter.save()
+                deadline = time.time() + 2
+                while not self.api.calls and time.time() < deadline:
+                    time.sleep(0.01)
+                self.assertEqual(len(self.api.calls), 1)
+                counter.score = 2
+                counter.save()
+        self.assertEqual(len(self.api.calls), 2)
+        self.assertEqual(self.api.calls[1][1], {"score": 2, "id": 1})
+
+    def test_failed_changes_are_kept(self):
+        api = FakePatch(failing=[2])
+        buffer = WriteBehind(interval=None)
+        Counter.use_write_behind(buffer)
+        for i in (1, 2):
+            counter = make_counter(i)
+            counter.score = 10
+            counter.save()
+        with patch("requests.patch", side_effect=api.patch):
+            self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(len(buffer), 1)
+
+        failures = []
+        buffer.on_failure = lambda instance, changes, e: failures.append(changes)
+        with patch("requests.patch", side_effect=api.patch):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(failures, [{"score": 10}])
+        self.assertEqual(len(buffer), 0)
+
+    def test_network_errors_keep_changes(self):
+        buffer = WriteBehind(interval=0.01)
+        Counter.use_write_behind(buffer)
+        counter = make_counter(1)
+        counter.score = 10
+        counter.save()
+        with patch("requests.patch", side_effect=ConnectionError("unreachable")):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(len(buffer), 1)
+
+        failures = []
+        buffer.on_failure = lambda instance, changes, e: failures.append(e)
+        with patch("requests.patch", side_effect=ConnectionError("unreachable")):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertIsInstance(failures[0], ConnectionError)
+
+        # the timer survives a failed flush
+        def fail(instance, changes, e):
+            raise RuntimeError("on_failure failed")
+
+        buffer.on_failure = fail
+        with patch("requests.patch", side_effect=ConnectionError("unreachable")):
+            with buffer:
+                counter.save()
+                time.sleep(0.05)
+                self.assertTrue(buffer._thread.is_alive())
+                buffer.on_failure = None
+            with patch("requests.patch", side_effect=self.api.patch):
+                self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(self.api.calls[0][1], {"score": 10, "id": 1})
+
+    def test_creation_is_not_buffered(self):
+        Counter.use_write_behind(WriteBehind(interval=None))
+        counter = Counter("http://test.com")
+        with patch("requests.post") as mock:
+            r = Response()
+            r.status_code = 201
+            r.json = lambda: {"id": 7}
+            mock.return_value = r
+            counter.save()
+        self.assertEqual(counter.id, 7)
+
+    def test_changes_during_flush_are_kept(self):
+        buffer = WriteBehind(interval=None)
+        Counter.use_write_behind(buffer)
+        counter = make_counter(1)
+        counter.score = 5
+        counter.save()
+        # changed again after save(), while the PATCH of score=5 is sent
+        counter.score = 7
+        with patch("requests.patch", side_effect=self.api.patch):
+            buffer.flush()
+            self.assertEqual((counter.score, counter._dirty), (7, {"score"}))
+            counter.save()
+            buffer.flush()
+        self.assertEqual(self.api.calls[-1][1], {"score": 7, "id": 1})
+        self.assertEqual(counter._dirty, set())
+
+    def test_unchanged_instance_is_not_sent(self):
+        buffer = WriteBehind(interval=None)
+        Counter.use_write_behind(buffer)
+        self.assertEqual(make_counter(1).save(), {})
+        self.assertEqual(len(buffer), 0)
+
+    def test_changes_in_place_are_sent(self):
+        Tagged.use_write_behind(WriteBehind(interval=None))
+        try:
+            tagged = Tagged("http://test.com").factory({"id": 3, "tags": ["a"]})
+            tagged.tags.append("b")
+            pending = tagged.save()
+            tagged.tags.append("c")
+            self.assertEqual(pending, {"tags": ["a", "b"]})
+            with patch("requests.patch", side_effect=self.api.patch):
+                Tagged._write_behind.flush()
+            self.assertEqual(self.api.calls[0][1], {"tags": ["a", "b"], "id": 3})
+            # not overwritten by the response
+            self.assertEqual(tagged.tags, ["a", "b", "c"])
+        finally:
+            Tagged.use_write_behind(None)
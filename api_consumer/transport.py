@@ -0,0 +1,299 @@
+import io
+import json
+import logging
+import mmap
+import os
+import random
+import shutil
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, BinaryIO, Optional
+
+from .exceptions import ApiConsumerException
+from .files import CHUNK_SIZE
+
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
+
+# key length, headers length, status code, body length
+_RECORD_HEADER = struct.Struct("<IIHI")
+
+
+class Transport:
+    """
+    Base class of the objects sending HTTP requests for an Api
+
+    A transport receive the HTTP method name and the same keyword
+    arguments as requests functions (url, headers, json, data...).
+    """
+
+    def request(self, method: str, url: str, **kargs) -> "requests.Response":
+        raise NotImplementedError
+
+    def warmup(self, url: str, connections: int = 1, timeout: float = 5.0) -> int:
+        """Open connections to the host of url before the first requests"""
+        return 0
+
+    def close(self) -> None:
+        """Release resources held by the transport"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RequestsTransport(Transport):
+    """
+    Default transport, send requests over the network with requests
+
+    Without session each request opens its own connection (requests.get...),
+    with a session (pool_size, use_session or warmup) up to pool_size
+    connections by host are kept alive and reused.
+    """
+
+    def __init__(self, pool_size: int = 0):
+        self._session = None
+        self._pool_size = 0
+        self._lock = threading.Lock()
+        if pool_size:
+            self.use_session(pool_size)
+
+    def use_session(self, pool_size: int = 10):
+        """Send next requests with a session keeping connections alive"""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with self._lock:
+            if self._session is None or self._pool_size < pool_size:
+                # a replaced session is left to requests in progress
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+                self._pool_size = pool_size
+            return self._session
+
+    def request(self, method: str, url: str, **kargs) -> "requests.Response":
+        session = self._session
+        if session is not None:
+            return session.request(method, url=url, **kargs)
+        # requests is imported by the first request, not with the package
+        import requests
+
+        return getattr(requests, method)(url=url, **kargs)
+
+    def warmup(self, url: str, connections: int = 1, timeout: float = 5.0) -> int:
+        """
+        Open connections to the host of url in parallel, kept in the
+        session pool for the next requests. Return the number opened.
+        """
+        if connections <= 0:
+            return 0
+        session = self.use_session(max(connections, self._pool_size, 10))
+        # hold every connection until all are open, or they would be reused
+        barrier = threading.Barrier(connections)
+
+        def connect(_) -> bool:
+            try:
+                r = session.head(url, timeout=timeout, stream=True)
+            except OSError as e:
+                logger.error(f"Warmup connection to {url} failed: {e}")
+                barrier.abort()
+                return False
+            try:
+                barrier.wait(timeout)
+            except threading.BrokenBarrierError:
+                pass
+            # read to the end: the connection goes back to the pool
+            r.content
+            return True
+
+        with ThreadPoolExecutor(connections, thread_name_prefix="warmup") as pool:
+            return sum(pool.map(connect, range(connections)))
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+            self._pool_size = 0
+
+
+def _record_key(method: str, url: str, kargs: dict) -> bytes:
+    """Identify a request by its method, URL and payload"""
+    payload = kargs.get("json", kargs.get("data"))
+    digest = ""
+    if payload is not None:
+        import hashlib
+
+        raw = json.dumps(payload, sort_keys=True, default=str).encode()
+        digest = hashlib.sha1(raw, usedforsecurity=False).hexdigest()
+    return f"{method.upper()} {url} {digest}".encode()
+
+
+class RecordingTransport(Transport):
+    """
+    Forward requests to another transport and save request/response
+    pairs in a compact binary file, to be replayed by ReplayTransport
+
+    Streamed bodies (stream=True) are copied by chunks to a temporary file,
+    recorded from it and then read by the caller from it: they are never
+    loaded in memory, but are fully received before the response is returned.
+    """
+
+    def __init__(self, path: str, transport: Optional[Transport] = None):
+        self._path = path
+        self._transport = transport or RequestsTransport()
+        self._lock = threading.Lock()
+        self._file = open(path, "ab")
+
+    def request(self, method: str, url: str, **kargs) -> "requests.Response":
+        r = self._transport.request(method, url, **kargs)
+        key = _record_key(method, url, kargs)
+        if kargs.get("stream"):
+            self._write_stream(key, r)
+        else:
+            self._write(key, r)
+        return r
+
+    def _write(
+        self, key: bytes, r: "requests.Response", body: Optional[BinaryIO] = None
+    ):
+        """body: file holding a streamed body, r.content is recorded without it"""
+        headers = json.dumps(dict(r.headers or {})).encode()
+        if body is None:
+            content = r.content or b""
+            size = len(content)
+        else:
+            content = b""
+            size = body.seek(0, os.SEEK_END)
+        header = _RECORD_HEADER.pack(len(key), len(headers), r.status_code, size)
+        with self._lock:
+            self._file.write(header + key + headers + content)
+            if body is not None:
+                body.seek(0)
+                shutil.copyfileobj(body, self._file, CHUNK_SIZE)
+            self._file.flush()
+
+    def _write_stream(self, key: bytes, r: "requests.Response"):
+        import tempfile
+
+        body = tempfile.TemporaryFile()
+        try:
+            for chunk in r.iter_content(CHUNK_SIZE):
+                body.write(chunk)
+        except BaseException:
+            body.close()
+            raise
+        finally:
+            r.close()
+        self._write(key, r, body)
+        # the caller streams the decoded body from the temporary file
+        body.seek(0)
+        r.raw = body
+        r._content = False
+        r._content_consumed = False
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class ReplayTransport(Transport):
+    """
+    Serve responses saved by RecordingTransport without any network
+
+    The record file is memory mapped and indexed once, bodies are read
+    on demand. When a request was recorded several times, responses are
+    served in the recorded order and the last one is repeated.
+
+    latency: artificial delay (seconds) added to each request
+    jitter: random extra delay (seconds) added to latency
+    """
+
+    def __init__(self, path: str, latency: float = 0.0, jitter: float = 0.0):
+        self._path = path
+        self.latency = latency
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._served: dict = {}
+        self._index: dict = {}
+        self._file = open(path, "rb")
+        self._mmap = None
+        if os.fstat(self._file.fileno()).st_size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._build_index()
+
+    def _build_index(self):
+        offset = 0
+        size = len(self._mmap)
+        while offset < size:
+            key_len, headers_len, status, body_len = _RECORD_HEADER.unpack_from(
+                self._mmap, offset
+            )
+            offset += _RECORD_HEADER.size
+            key_end = offset + key_len
+            key = bytes(self._mmap[offset:key_end])
+            offset = key_end
+            entry = (status, offset, headers_len, offset + headers_len, body_len)
+            self._index.setdefault(key, []).append(entry)
+            offset += headers_len + body_len
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._index.values())
+
+    def request(self, method: str, url: str, **kargs) -> "requests.Response":
+        import requests
+        from requests.structures import CaseInsensitiveDict
+
+        key = _record_key(method, url, kargs)
+        entries = self._index.get(key)
+        if not entries:
+            err = f"No recorded response for {method.upper()} {url}"
+            logger.error(err)
+            raise ApiConsumerException(err)
+
+        with self._lock:
+            position = self._served.get(key, 0)
+            self._served[key] = position + 1
+        status, headers_off, headers_len, body_off, body_len = entries[
+            min(position, len(entries) - 1)
+        ]
+
+        delay = self.latency
+        if self.jitter:
+            delay += random.uniform(0, self.jitter)  # nosec
+        if delay:
+            time.sleep(delay)
+
+        r = requests.Response()
+        r.status_code = status
+        r.url = url
+        headers_end = headers_off + headers_len
+        body_end = body_off + body_len
+        r.headers = CaseInsensitiveDict(json.loads(self._mmap[headers_off:headers_end]))
+        r._content = self._mmap[body_off:body_end]
+        # streamed responses (iter_content, close) read the content
+        r._content_consumed = True
+        r.raw = io.BytesIO(r._content)
+        r.encoding = "utf-8"
+        r.request = requests.Request(method.upper(), url).prepare()
+        return r
+
+    def rewind(self) -> None:
+        """Serve responses again from the first recorded ones"""
+        with self._lock:
+            self._served.clear()
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
@@ -0,0 +1,178 @@
+import logging
+from string import Formatter
+from typing import Iterable, List, Optional, Tuple, Union
+from urllib.parse import quote, urlencode
+
+from .exceptions import ApiConsumerException
+
+logger = logging.getLogger(__name__)
+
+# shared builders by configuration, see UrlBuilder.shared
+_BUILDERS: dict = {}
+_MAX_BUILDERS = 64
+
+
+def _quote(value) -> str:
+    """Path segment (id, path parameter), integers need no escaping"""
+    if type(value) is int:
+        return str(value)
+    return quote(str(value), safe="")
+
+
+class UrlBuilder:
+    """
+    Build endpoint URLs, paths of items are compiled once
+
+    url: base URL of the API
+    output: value of the format parameter, empty to not send it
+    trailing_slash: None for a slash after collections only (user/ and user/5),
+        True after collections and instances (user/ and user/5/), False never
+    templates: path by item, with {parameters} for nested routes, read once
+        ex: {"order": "customers/{customer_id}/orders"}
+
+    options are raw querystring strings (ex: "limit=10") sent as is,
+    params a dict of values escaped by the builder.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        output: str = "json",
+        trailing_slash: Optional[bool] = None,
+        templates: Optional[dict] = None,
+    ):
+        self.source = url
+        self.url = url.rstrip("/")
+        self.output = output
+        self.trailing_slash = trailing_slash
+        self.source_templates = templates
+        self.templates = dict(templates or {})
+        self._format = f"format={quote(output)}" if output else ""
+        # querystring without options, and its prefix when options are given
+        self._query = f"?{self._format}" if output else ""
+        self._options_prefix = f"?{self._format}&" if output else "?"
+        self._collection_end = "" if trailing_slash is False else "/"
+        self._instance_end = "/" if trailing_slash else ""
+        self._compiled: dict = {}
+
+    @classmethod
+    def shared(
+        cls,
+        url: str,
+        output: str = "json",
+        trailing_slash: Optional[bool] = None,
+        templates: Optional[dict] = None,
+    ) -> "UrlBuilder":
+        """Builder shared by all callers with the same configuration"""
+        key = (
+            url,
+            output,
+            trailing_slash,
+            tuple(templates.items()) if templates else (),
+        )
+        builder = _BUILDERS.get(key)
+        if builder is None:
+            if len(_BUILDERS) >= _MAX_BUILDERS:
+                _BUILDERS.clear()
+            builder = _BUILDERS[key] = cls(url, output, trailing_slash, templates)
+        return builder
+
+    def _compile(self, item: str) -> Tuple[str, Tuple[str, ...]]:
+        """URL of an item (a format template if nested) and its parameter names"""
+        compiled = self._compiled.get(item)
+        if compiled is None:
+            path = self.templates.get(item, item).strip("/")
+            names = tuple(name for _, name, _, _ in Formatter().parse(path) if name)
+            if names:
+                escaped = self.url.replace("{", "{{").replace("}", "}}")
+                compiled = (f"{escaped}/{path}", names)
+            else:
+                compiled = (f"{self.url}/{path}", names)
+            self._compiled[item] = compiled
+        return compiled
+
+    def parameters(self, item: str) -> Tuple[str, ...]:
+        """Names of the {parameters} in the path of item"""
+        return self._compile(item)[1]
+
+    def path(self, item: str, path: Optional[dict] = None) -> str:
+        """URL of the item collection, without trailing slash nor querystring"""
+        template, names = self._compile(item)
+        if not names:
+            return template
+        missing = [name for name in names if name not in (path or {})]
+        if missing:
+            err = f"Missing path parameter(s) {', '.join(missing)} for item {item}"
+            logger.error(err)
+            raise ApiConsumerException(err)
+        return template.format_map({name: _quote(path[name]) for name in names})
+
+    def query(
+        self, options: Optional[list] = None, params: Optional[dict] = None
+    ) -> str:
+        """Querystring, with the leading ?"""
+        if not params:
+            if not options:
+                return self._query
+            return self._options_prefix + "&".join(options)
+        parts = [self._format] if self._format else []
+        if options:
+            parts += options
+        if params:
+            parts.append(urlencode(params, doseq=True, quote_via=quote))
+        return ("?" + "&".join(parts)) if parts else ""
+
+    def collection(
+        self,
+        item: str,
+        options: Optional[list] = None,
+        params: Optional[dict] = None,
+        path: Optional[dict] = None,
+    ) -> str:
+        """URL of a list of items"""
+        url, names = self._compiled.get(item) or self._compile(item)
+        if names:
+            url = self.path(item, path)
+        if params:
+            query = self.query(options, params)
+        elif options:
+            query = self._options_prefix + "&".join(options)
+        else:
+            query = self._query
+        return url + self._collection_end + query
+
+    def instance(
+        self,
+        item: str,
+        id_instance: Union[int, str],
+        options: Optional[list] = None,
+        params: Optional[dict] = None,
+        path: Optional[dict] = None,
+    ) -> str:
+        """URL of an item"""
+        url, names = self._compiled.get(item) or self._compile(item)
+        if names:
+            url = self.path(item, path)
+        if type(id_instance) is not int:
+            id_instance = _quote(id_instance)
+        # query() inlined, this is called for each request
+        if params:
+            query = self.query(options, params)
+        elif options:
+            query = self._options_prefix + "&".join(options)
+        else:
+            query = self._query
+        return f"{url}/{id_instance}{self._instance_end}{query}"
+
+    def instance_urls(
+        self,
+        item: str,
+        ids: Iterable[Union[int, str]],
+        options: Optional[list] = None,
+        params: Optional[dict] = None,
+        path: Optional[dict] = None,
+    ) -> List[str]:
+        """URLs of many items, the common prefix and suffix are built once"""
+        prefix = self.path(item, path) + "/"
+        suffix = self._instance_end + self.query(options, params)
+        return [prefix + _quote(id_instance) + suffix for id_instance in ids]
@@ -0,0 +1,153 @@
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# called with the instance, the changes not sent and the exception
+FlushFailure = Callable[[object, dict, BaseException], None]
+
+
+class WriteBehind:
+    """
+    Buffer of changes saved later, with one PATCH by instance
+
+    with WriteBehind(interval=0.5, max_pending=500) as buffer:
+        User.use_write_behind(buffer)
+        user.score += 1
+        user.save()  # recorded, changes of the same (item, id) are merged
+
+    Changes are sent on a timer (every interval seconds once started), when
+    max_pending instances wait, on flush() and when the context exits.
+    Instances of a flush are sent concurrently on the shared pool.
+    Lists, dicts and sets of instances are always sent, in place changes
+    are not tracked. Fields changed again while a PATCH is sent keep their
+    new value for the next save.
+    on_failure: called for each instance which could not be saved (API or
+        network error), failed changes are kept for the next flush without
+        it or if it raises
+    """
+
+    def __init__(
+        self,
+        interval: Optional[float] = 1.0,
+        max_pending: int = 1000,
+        on_failure: Optional[FlushFailure] = None,
+    ):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.on_failure = on_failure
+        self._pending: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+        self._flushing = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, instance, changes: dict) -> dict:
+        """Record changes of instance, return all its changes waiting"""
+        key = (instance._url, instance._item, instance.id)
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                if not changes:
+                    return {}
+                entry = self._pending[key] = [instance, {}]
+            entry[0] = instance
+            entry[1].update(changes)
+            pending = dict(entry[1])
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self.flush()
+        return pending
+
+    def _take(self) -> List[list]:
+        with self._lock:
+            entries = list(self._pending.values())
+            self._pending = {}
+        return entries
+
+    def _requeue(self, instance, changes: dict) -> None:
+        """Keep changes not sent, newer changes of the same fields win"""
+        key = (instance._url, instance._item, instance.id)
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                self._pending[key] = [instance, dict(changes)]
+            else:
+                entry[1] = {**changes, **entry[1]}
+
+    def _send(self, entry: list) -> Optional[BaseException]:
+        instance, changes = entry
+        if not changes:
+            return None
+        try:
+            payload = {**changes, "id": instance.id}
+            data = instance.patch_instance(instance._item, payload=payload)
+            # fields changed again since add() keep their new value
+            instance._acknowledge(data or {}, changes)
+        except Exception as e:
+            # network errors (requests.ConnectionError...) too: changes are kept
+            logger.error(f"Write behind of {instance._item} {instance.id} failed: {e}")
+            return e
+        return None
+
+    def flush(self) -> int:
+        """Send waiting changes, return the number of instances saved"""
+        with self._flushing:
+            entries = self._take()
+            if not entries:
+                return 0
+            api = entries[0][0]
+            if len(entries) == 1 or api._in_pool():
+                errors = [self._send(entry) for entry in entries]
+            else:
+                errors = list(api._get_pool().map(self._send, entries))
+
+        saved = 0
+        for (instance, changes), error in zip(entries, errors):
+            if error is None:
+                saved += 1
+            elif self.on_failure is None:
+                self._requeue(instance, changes)
+            else:
+                try:
+                    self.on_failure(instance, changes, error)
+                except Exception as e:
+                    logger.error(f"Write behind on_failure failed: {e}")
+                    self._requeue(instance, changes)
+        return saved
+
+    def start(self) -> "WriteBehind":
+        """Flush every interval seconds in a background thread"""
+        if self.interval and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="write_behind", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                # the timer keeps flushing after an unexpected error
+                logger.error(f"Write behind flush failed: {e}")
+
+    def close(self) -> None:
+        """Stop the timer and send waiting changes"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def __enter__(self) -> "WriteBehind":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
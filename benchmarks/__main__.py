@@ -0,0 +1,48 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from .suite import BENCHMARKS, compare, run
+
+BASELINE = Path(__file__).parent / "baseline.json"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Api/Model benchmarks")
+    parser.add_argument("names", nargs="*", help=f"among {', '.join(BENCHMARKS)}")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument(
+        "--save", action="store_true", help="store results as new baseline"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    results = run(args.names)
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+
+    regressions = 0
+    print(f"{'benchmark':<32}{'value':>14} {'unit':<7}{'baseline':>14}{'change':>9}")
+    for result, reference, change, regression in compare(
+        results, baseline, args.tolerance
+    ):
+        regressions += regression
+        line = f"{result.name:<32}{result.value:>14.2f} {result.unit:<7}"
+        if reference is not None:
+            line += f"{reference:>14.2f}{change:>+9.1%}"
+        print(line + ("  REGRESSION" if regression else ""))
+
+    if args.save:
+        baseline.update({result.name: round(result.value, 3) for result in results})
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline saved in {args.baseline}")
+
+    print(f"{regressions} regression(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
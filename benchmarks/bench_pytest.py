@@ -0,0 +1,40 @@
+"""
+pytest-benchmark entry point, run with:
+python -m pytest benchmarks/bench_pytest.py
+"""
+
+import pytest
+
+from .server import StubServer, make_rows
+from .suite import User
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture(scope="module")
+def server():
+    with StubServer() as stub:
+        yield stub
+
+
+def test_get_instance(benchmark, server):
+    user = User(server.url)
+    benchmark(user.get_instance, "user", 1)
+
+
+@pytest.mark.parametrize("page_size", [10, 100, 1000])
+def test_paginated_results(benchmark, server, page_size):
+    user = User(server.url)
+    benchmark(user._paginated_results, "user", 2000, [f"limit={page_size}"])
+
+
+def test_factory_list(benchmark, server):
+    user = User(server.url)
+    rows = make_rows(2000)
+    benchmark(user.factory_list, rows)
+
+
+def test_build_dictionary(benchmark, server):
+    user = User(server.url)
+    user.from_json(make_rows(1)[0])
+    benchmark(user._build_dictionary)
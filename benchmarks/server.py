@@ -0,0 +1,108 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+
+def make_rows(count: int) -> list:
+    """Deterministic dataset looking like a DRF user list"""
+    return [
+        {
+            "id": i,
+            "username": f"user{i}",
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "email": f"user{i}@example.org",
+            "is_active": i % 7 != 0,
+            "score": i * 1.5,
+            "group": i % 10,
+            "created": "2023-01-01T00:00:00Z",
+            "tags": ["a", "b", "c"],
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal Django REST Framework like API (LimitOffsetPagination)"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, payload=None):
+        body = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        parts = urlsplit(self.path)
+        segments = [s for s in parts.path.split("/") if s]
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        return segments, query, parts.path
+
+    def do_GET(self):
+        segments, query, path = self._route()
+        rows = self.server.rows
+        if len(segments) == 2:
+            index = int(segments[1]) - 1
+            if 0 <= index < len(rows):
+                return self._reply(200, rows[index])
+            return self._reply(404, {"detail": "Not found."})
+
+        limit = min(
+            int(query.get("limit", self.server.page_size)), self.server.max_page
+        )
+        offset = int(query.get("offset", 0))
+        base = f"http://{self.headers['Host']}{path}?format=json&limit={limit}"
+        end = offset + limit
+        self._reply(
+            200,
+            {
+                "count": len(rows),
+                "next": f"{base}&offset={end}" if end < len(rows) else None,
+                "previous": f"{base}&offset={offset - limit}" if offset else None,
+                "results": rows[offset:end],
+            },
+        )
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        payload["id"] = len(self.server.rows) + 1
+        self._reply(201, payload)
+
+    def do_PATCH(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self._reply(200, json.loads(self.rfile.read(length) or b"{}"))
+
+
+class StubServer:
+    """Run the stub API in a background thread of the current process"""
+
+    def __init__(self, rows: int = 5000, page_size: int = 100, max_page: int = 1000):
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.rows = make_rows(rows)
+        self._httpd.page_size = page_size
+        self._httpd.max_page = max_page
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
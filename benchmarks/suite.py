@@ -0,0 +1,244 @@
+import statistics
+import subprocess  # nosec
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple
+
+from api_consumer.model import Model
+from api_consumer.pagination import OffsetPaginator
+
+from .server import StubServer, make_rows
+
+
+class User(Model):
+    """Benchmark model"""
+
+    username: str = ""
+    score: float = 0.0
+    is_active: bool = True
+
+
+class LazyUser(User):
+    """Benchmark model, fields are set on first access"""
+
+    _lazy_hydration = True
+
+
+class Result(NamedTuple):
+    name: str
+    value: float
+    unit: str
+    higher_is_better: bool
+
+
+BENCHMARKS: Dict[str, Callable[[StubServer], List[Result]]] = {}
+
+
+def benchmark(funct: Callable) -> Callable:
+    """Register a benchmark function"""
+    BENCHMARKS[funct.__name__] = funct
+    return funct
+
+
+def _rate(count: int, funct: Callable, *args) -> float:
+    """Number of funct calls per second"""
+    start = time.perf_counter()
+    for _ in range(count):
+        funct(*args)
+    return count / (time.perf_counter() - start)
+
+
+@benchmark
+def get_instance(server: StubServer) -> List[Result]:
+    user = User(server.url)
+    user.get_instance("user", 1)  # warm up
+    timings = []
+    for i in range(200):
+        start = time.perf_counter()
+        user.get_instance("user", i % 100 + 1)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return [
+        Result("get_instance.p50", statistics.median(timings), "ms", False),
+        Result("get_instance.p99", timings[int(len(timings) * 0.99) - 1], "ms", False),
+    ]
+
+
+@benchmark
+def paginated_results(server: StubServer) -> List[Result]:
+    user = User(server.url)
+    results = []
+    for page_size in (10, 100, 1000):
+        start = time.perf_counter()
+        rows = user._paginated_results("user", 2000, [f"limit={page_size}"])
+        elapsed = time.perf_counter() - start
+        results.append(
+            Result(
+                f"paginated_results.page_{page_size}",
+                len(rows) / elapsed,
+                "rows/s",
+                True,
+            )
+        )
+    # page size chosen from the limit
+    user._max_page_size = 1000
+    start = time.perf_counter()
+    rows = user._paginated_results("user", 2000, [])
+    elapsed = time.perf_counter() - start
+    results.append(
+        Result("paginated_results.auto", len(rows) / elapsed, "rows/s", True)
+    )
+
+    # remaining pages fetched in parallel once count is known
+    user = User(server.url)
+    user.config(server.url, paginator=OffsetPaginator())
+    start = time.perf_counter()
+    rows = user._paginated_results("user", 2000, ["limit=100"])
+    elapsed = time.perf_counter() - start
+    results.append(
+        Result("paginated_results.parallel_100", len(rows) / elapsed, "rows/s", True)
+    )
+    return results
+
+
+@benchmark
+def hydration(server: StubServer) -> List[Result]:
+    user = User(server.url)
+    rows = make_rows(2000)
+    return [
+        Result(
+            "from_json",
+            _rate(5, lambda: [User(server.url).from_json(r) for r in rows]) * len(rows),
+            "rows/s",
+            True,
+        ),
+        Result(
+            "factory_list",
+            _rate(5, user.factory_list, rows) * len(rows),
+            "rows/s",
+            True,
+        ),
+        # list instances to read only id and email
+        Result(
+            "factory_list.lazy",
+            _rate(
+                5,
+                lambda: [
+                    (u.id, u.email) for u in LazyUser(server.url).factory_list(rows)
+                ],
+            )
+            * len(rows),
+            "rows/s",
+            True,
+        ),
+    ]
+
+
+@benchmark
+def build_dictionary(server: StubServer) -> List[Result]:
+    user = User(server.url)
+    user.from_json(make_rows(1)[0])
+    return [
+        Result("build_dictionary", _rate(2000, user._build_dictionary), "ops/s", True)
+    ]
+
+
+@benchmark
+def url_building(server: StubServer) -> List[Result]:
+    user = User(server.url)
+    ids = range(10000)
+    options = ["fields=id,username"]
+    return [
+        Result(
+            "gen_url",
+            _rate(3, lambda: [user._gen_url("user", i, options) for i in ids])
+            * len(ids),
+            "urls/s",
+            True,
+        ),
+        Result(
+            "instance_urls",
+            _rate(3, user.url_builder().instance_urls, "user", ids, options) * len(ids),
+            "urls/s",
+            True,
+        ),
+    ]
+
+
+@benchmark
+def memory(server: StubServer) -> List[Result]:
+    user = User(server.url)
+    rows = make_rows(5000)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = user.factory_list(rows)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return [
+        Result("memory_per_instance", (after - before) / len(instances), "B", False)
+    ]
+
+
+@benchmark
+def concurrency(server: StubServer) -> List[Result]:
+    user = User(server.url)
+    calls = 200
+    results = []
+    for workers in (1, 4, 16):
+        with ThreadPoolExecutor(workers) as pool:
+            start = time.perf_counter()
+            list(
+                pool.map(lambda i: user.get_instance("user", i % 100 + 1), range(calls))
+            )
+            elapsed = time.perf_counter() - start
+        results.append(
+            Result(f"concurrency.workers_{workers}", calls / elapsed, "req/s", True)
+        )
+    return results
+
+
+@benchmark
+def startup(server: StubServer) -> List[Result]:
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        subprocess.run(  # nosec
+            [sys.executable, "-c", "import api_consumer.model"], check=True
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return [
+        # includes the interpreter startup
+        Result("startup.import", statistics.median(timings), "ms", False),
+        Result("startup.model_init", _rate(20000, User, server.url), "ops/s", True),
+    ]
+
+
+def run(names: List[str] = None) -> List[Result]:
+    """Run the selected benchmarks (all by default) against a stub server"""
+    results = []
+    with StubServer() as server:
+        for name, funct in BENCHMARKS.items():
+            if not names or name in names:
+                results += funct(server)
+    return results
+
+
+def compare(
+    results: List[Result], baseline: dict, tolerance: float = 0.25
+) -> List[tuple]:
+    """
+    Compare results to a baseline {name: value}
+    Return a list of (result, baseline value, relative change, regression)
+    """
+    report = []
+    for result in results:
+        reference = baseline.get(result.name)
+        if not reference:
+            report.append((result, None, None, False))
+            continue
+        change = (result.value - reference) / reference
+        worse = -change if result.higher_is_better else change
+        report.append((result, reference, change, worse > tolerance))
+    return report